@@ -0,0 +1,137 @@
+import random
+from pathlib import Path
+
+# Word used to plant matches in the generated text. It never occurs in the
+# filler words, so the match rate is exactly the one requested.
+MATCH_WORD = "needle"
+FILLER_WORDS = (
+    "lorem",
+    "ipsum",
+    "dolor",
+    "sit",
+    "amet",
+    "consectetur",
+    "adipiscing",
+    "elit",
+    "sed",
+    "do",
+    "eiusmod",
+    "tempor",
+    "incididunt",
+    "ut",
+    "labore",
+    "et",
+    "dolore",
+    "magna",
+    "aliqua",
+    "request_id=4711",
+    "status=200",
+    "GET",
+    "/api/v1/items",
+)
+
+
+def generate_text(
+    seed: int, number_of_lines: int, line_length: int, match_rate: float
+) -> str:
+    """Generate deterministic text with a given fraction of matching lines.
+
+    Parameters
+    ----------
+    seed : Seed of the random generator, the same seed gives the same text.
+    number_of_lines : Number of lines to generate.
+    line_length : Approximate length of each line.
+    match_rate : Fraction of lines containing MATCH_WORD.
+
+    Returns
+    -------
+    Generated text, with a newline after every line.
+    """
+    generator = random.Random(seed)
+    lines = []
+    for _ in range(number_of_lines):
+        words = []
+        length = 0
+        while length < line_length:
+            word = generator.choice(FILLER_WORDS)
+            words.append(word)
+            length += len(word) + 1
+        if generator.random() < match_rate:
+            words[generator.randrange(len(words))] = MATCH_WORD
+        lines.append(" ".join(words))
+    return "\n".join(lines) + "\n"
+
+
+def create_file(
+    path: Path, seed: int, number_of_lines: int, line_length: int, match_rate: float
+) -> int:
+    """Write a file generated with generate_text.
+
+    Parameters
+    ----------
+    path : Path of the file to write.
+    seed : Seed of the random generator.
+    number_of_lines : Number of lines to generate.
+    line_length : Approximate length of each line.
+    match_rate : Fraction of lines containing MATCH_WORD.
+
+    Returns
+    -------
+    Size of the file in bytes.
+    """
+    data = generate_text(seed, number_of_lines, line_length, match_rate).encode()
+    path.write_bytes(data)
+    return len(data)
+
+
+def create_tree(
+    directory: Path,
+    seed: int,
+    depth: int,
+    number_of_subdirectories: int,
+    number_of_files_per_directory: int,
+    number_of_lines_per_file: int,
+    match_rate: float,
+) -> tuple[int, int]:
+    """Create a deterministic directory tree of generated files.
+
+    Parameters
+    ----------
+    directory : Directory to create the tree in.
+    seed : Seed of the random generator.
+    depth : Number of directory levels below the directory.
+    number_of_subdirectories : Number of subdirectories of each directory.
+    number_of_files_per_directory : Number of files in each directory.
+    number_of_lines_per_file : Number of lines of each file.
+    match_rate : Fraction of lines containing MATCH_WORD.
+
+    Returns
+    -------
+    Number of files and their total size in bytes.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    number_of_files = 0
+    total_size = 0
+    for i in range(number_of_files_per_directory):
+        total_size += create_file(
+            directory / f"file_{i}.txt",
+            seed * 1000 + i,
+            number_of_lines_per_file,
+            80,
+            match_rate,
+        )
+        number_of_files += 1
+    if depth > 0:
+        for i in range(number_of_subdirectories):
+            subdirectory_files, subdirectory_size = create_tree(
+                directory / f"dir_{i}",
+                seed * number_of_subdirectories + i + 1,
+                depth - 1,
+                number_of_subdirectories,
+                number_of_files_per_directory,
+                number_of_lines_per_file,
+                match_rate,
+            )
+            number_of_files += subdirectory_files
+            total_size += subdirectory_size
+    return number_of_files, total_size
@@ -0,0 +1,542 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmarks.corpus import MATCH_WORD, create_file, create_tree
+from src.grep import _FileSearchOptions, _get_all_files_in_directory, _search_file
+from src.line import Line
+from src.matcher import create_matcher
+from src.printer import JsonPrinter, Printer
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+RESULTS_DIRECTORY = Path(__file__).parent / "results"
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """Generated files searched by the benchmarks.
+
+    Attributes
+    ----------
+    path : File or directory containing the files.
+    number_of_bytes : Total size of the files.
+    number_of_lines : Total number of lines of the files.
+    """
+
+    path: str
+    number_of_bytes: int
+    number_of_lines: int
+
+
+@dataclass(frozen=True)
+class Measurement:
+    """Measurement of a single run of a benchmark.
+
+    Attributes
+    ----------
+    seconds : Duration of the run.
+    time_to_first_match : Seconds until the first matching line was found, if any.
+    """
+
+    seconds: float
+    time_to_first_match: float | None = None
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """Result of a benchmark, for the fastest of its runs.
+
+    Attributes
+    ----------
+    name : Name of the benchmark.
+    description : What the benchmark measures.
+    seconds : Duration of the fastest run.
+    megabytes_per_second : Size of the corpus processed per second.
+    lines_per_second : Number of lines of the corpus processed per second.
+    peak_rss_kib : Peak resident set size of the process running the benchmark.
+    time_to_first_match : Seconds until the first matching line was found, if any.
+    """
+
+    name: str
+    description: str
+    seconds: float
+    megabytes_per_second: float
+    lines_per_second: float
+    peak_rss_kib: int | None
+    time_to_first_match: float | None
+
+
+def _create_file_corpus(
+    directory: Path,
+    scale: float,
+    number_of_files: int,
+    number_of_lines: int,
+    line_length: int,
+    match_rate: float,
+) -> Corpus:
+    directory.mkdir()
+    number_of_lines = max(int(number_of_lines * scale), 1)
+    number_of_bytes = sum(
+        create_file(
+            directory / f"file_{i}.txt", i, number_of_lines, line_length, match_rate
+        )
+        for i in range(number_of_files)
+    )
+    return Corpus(str(directory), number_of_bytes, number_of_lines * number_of_files)
+
+
+def _create_tree_corpus(
+    directory: Path,
+    depth: int,
+    number_of_subdirectories: int,
+    number_of_files_per_directory: int,
+    number_of_lines_per_file: int,
+) -> Corpus:
+    number_of_files, number_of_bytes = create_tree(
+        directory,
+        0,
+        depth,
+        number_of_subdirectories,
+        number_of_files_per_directory,
+        number_of_lines_per_file,
+        0.01,
+    )
+    return Corpus(
+        str(directory), number_of_bytes, number_of_files * number_of_lines_per_file
+    )
+
+
+# Functions creating each corpus in a directory, for a given scale.
+CORPORA: dict[str, Callable[[Path, float], Corpus]] = {
+    "sparse": lambda directory, scale: _create_file_corpus(
+        directory, scale, 1, 200_000, 80, 0.0005
+    ),
+    "medium": lambda directory, scale: _create_file_corpus(
+        directory, scale, 1, 200_000, 80, 0.02
+    ),
+    "dense": lambda directory, scale: _create_file_corpus(
+        directory, scale, 1, 200_000, 80, 0.5
+    ),
+    "long_lines": lambda directory, scale: _create_file_corpus(
+        directory, scale, 1, 2_000, 10_000, 0.01
+    ),
+    "huge_files": lambda directory, scale: _create_file_corpus(
+        directory, scale, 2, 500_000, 80, 0.001
+    ),
+    "small_files": lambda directory, scale: _create_tree_corpus(
+        directory, 2, 10, max(int(20 * scale), 1), 50
+    ),
+    "deep_tree": lambda directory, scale: _create_tree_corpus(
+        directory, max(int(8 * scale), 1), 2, 2, 10
+    ),
+    "tiny": lambda directory, scale: _create_file_corpus(
+        directory, 1.0, 1, 100, 80, 0.02
+    ),
+}
+
+
+def _search(
+    corpus: Corpus,
+    pattern: str,
+    number_of_lines_before_match: int = 0,
+    number_of_lines_after_match: int = 0,
+    find_intervals: bool = True,
+) -> Measurement:
+    options = _FileSearchOptions(
+        matcher=create_matcher(pattern),
+        number_of_lines_before_match=number_of_lines_before_match,
+        number_of_lines_after_match=number_of_lines_after_match,
+        binary_files="binary",
+        find_intervals=find_intervals,
+    )
+    time_to_first_match = None
+    start_time = time.perf_counter()
+    for file in _get_all_files_in_directory(Path(corpus.path)):
+        for result in _search_file(Path(file), options):
+            if (
+                time_to_first_match is None
+                and isinstance(result, Line)
+                and result.is_match
+            ):
+                time_to_first_match = time.perf_counter() - start_time
+    return Measurement(time.perf_counter() - start_time, time_to_first_match)
+
+
+def _walk(corpus: Corpus, number_of_threads: int) -> Measurement:
+    start_time = time.perf_counter()
+    for _ in _get_all_files_in_directory(Path(corpus.path), number_of_threads):
+        pass
+    return Measurement(time.perf_counter() - start_time)
+
+
+def _print(corpus: Corpus, create_printer: Callable[[], Printer]) -> Measurement:
+    options = _FileSearchOptions(
+        matcher=create_matcher(MATCH_WORD),
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        binary_files="binary",
+    )
+    lines = [
+        result
+        for file in _get_all_files_in_directory(Path(corpus.path))
+        for result in _search_file(Path(file), options)
+    ]
+    with open(os.devnull, "w") as output, redirect_stdout(output):
+        start_time = time.perf_counter()
+        printer = create_printer()
+        printer.set_file(Path(corpus.path))
+        for line in lines:
+            printer.print_line(line)
+        printer.flush()
+        return Measurement(time.perf_counter() - start_time)
+
+
+def _run_command_line(corpus: Corpus) -> Measurement:
+    # Most of the time of a search in a tiny corpus is spent starting the
+    # interpreter and importing modules.
+    start_time = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "src.main", "--no-daemon", "-c", "-r", MATCH_WORD]
+        + [corpus.path],
+        cwd=Path(__file__).parent.parent,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return Measurement(time.perf_counter() - start_time)
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """A benchmark run on one of the corpora.
+
+    Attributes
+    ----------
+    description : What the benchmark measures.
+    corpus : Name of the corpus in CORPORA.
+    run : Function running the benchmark once on the corpus.
+    """
+
+    description: str
+    corpus: str
+    run: Callable[[Corpus], Measurement]
+
+
+BENCHMARKS: dict[str, Benchmark] = {
+    "sparse_literal": Benchmark(
+        "literal search, 0.05% of lines match",
+        "sparse",
+        lambda corpus: _search(corpus, MATCH_WORD),
+    ),
+    "dense_literal": Benchmark(
+        "literal search, 50% of lines match",
+        "dense",
+        lambda corpus: _search(corpus, MATCH_WORD),
+    ),
+    "sparse_regex": Benchmark(
+        "regex search, 0.05% of lines match",
+        "sparse",
+        lambda corpus: _search(corpus, rf"{MATCH_WORD[:4]}\w+|status=5\d\d"),
+    ),
+    "many_matches_per_line": Benchmark(
+        "regex search matching every digit, finding the matching intervals",
+        "medium",
+        lambda corpus: _search(corpus, r"\d"),
+    ),
+    "many_matches_per_line_no_intervals": Benchmark(
+        "regex search matching every digit, only checking which lines match",
+        "medium",
+        lambda corpus: _search(corpus, r"\d", find_intervals=False),
+    ),
+    "long_lines": Benchmark(
+        "literal search in 10 000 character lines",
+        "long_lines",
+        lambda corpus: _search(corpus, MATCH_WORD),
+    ),
+    "large_context": Benchmark(
+        "literal search with -B 10 -A 10, 2% of lines match",
+        "medium",
+        lambda corpus: _search(corpus, MATCH_WORD, 10, 10),
+    ),
+    "huge_files": Benchmark(
+        "literal search in a few huge files",
+        "huge_files",
+        lambda corpus: _search(corpus, MATCH_WORD),
+    ),
+    "small_files": Benchmark(
+        "recursive literal search in many small files",
+        "small_files",
+        lambda corpus: _search(corpus, MATCH_WORD),
+    ),
+    "deep_tree_walk": Benchmark(
+        "listing a deep directory tree",
+        "deep_tree",
+        lambda corpus: _walk(corpus, 1),
+    ),
+    "deep_tree_walk_threads": Benchmark(
+        "listing a deep directory tree with 4 walker threads",
+        "deep_tree",
+        lambda corpus: _walk(corpus, 4),
+    ),
+    "print_color": Benchmark(
+        "printing matching lines with colors",
+        "dense",
+        lambda corpus: _print(
+            corpus,
+            lambda: Printer(print_line_number=True, line_buffered=False, color=True),
+        ),
+    ),
+    "print_color_matcher": Benchmark(
+        "printing matching lines with colors, highlighted by the matcher",
+        "dense",
+        lambda corpus: _print(
+            corpus,
+            lambda: Printer(
+                print_line_number=True,
+                line_buffered=False,
+                color=True,
+                matcher=create_matcher(MATCH_WORD),
+            ),
+        ),
+    ),
+    "print_plain": Benchmark(
+        "printing matching lines without colors",
+        "dense",
+        lambda corpus: _print(
+            corpus,
+            lambda: Printer(print_line_number=True, line_buffered=False, color=False),
+        ),
+    ),
+    "print_json": Benchmark(
+        "printing matching lines as JSON",
+        "dense",
+        lambda corpus: _print(corpus, lambda: JsonPrinter(line_buffered=False)),
+    ),
+    "startup": Benchmark(
+        "running the command line on a single small file",
+        "tiny",
+        _run_command_line,
+    ),
+}
+
+
+def _get_peak_rss_kib() -> int | None:
+    # On Linux, ru_maxrss survives exec, so it would include the memory used by
+    # the parent process before starting the benchmark process.
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kibibytes elsewhere.
+    return peak_rss // 1024 if sys.platform == "darwin" else peak_rss
+
+
+def run_benchmark(name: str, corpus: Corpus, repeat: int) -> BenchmarkResult:
+    """Run a benchmark several times and keep the fastest run.
+
+    Parameters
+    ----------
+    name : Name of the benchmark in BENCHMARKS.
+    corpus : Corpus of the benchmark, created with CORPORA.
+    repeat : Number of runs.
+
+    Returns
+    -------
+    Result of the fastest run.
+    """
+    benchmark = BENCHMARKS[name]
+    measurement = min(
+        (benchmark.run(corpus) for _ in range(repeat)),
+        key=lambda measurement: measurement.seconds,
+    )
+    seconds = max(measurement.seconds, 1e-9)
+    return BenchmarkResult(
+        name=name,
+        description=benchmark.description,
+        seconds=measurement.seconds,
+        megabytes_per_second=corpus.number_of_bytes / seconds / 1e6,
+        lines_per_second=corpus.number_of_lines / seconds,
+        peak_rss_kib=_get_peak_rss_kib(),
+        time_to_first_match=measurement.time_to_first_match,
+    )
+
+
+def run_benchmarks(
+    names: Iterable[str], scale: float, repeat: int
+) -> list[BenchmarkResult]:
+    """Create the corpora and run each benchmark in a fresh process.
+
+    A fresh process is used for each benchmark, so the peak memory usage of one
+    benchmark does not hide the one of the next.
+
+    Parameters
+    ----------
+    names : Names of the benchmarks to run.
+    scale : Factor applied to the size of the corpora.
+    repeat : Number of runs of each benchmark.
+
+    Returns
+    -------
+    Results of the benchmarks.
+    """
+    names = list(names)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        corpora = {}
+        for name in names:
+            corpus_name = BENCHMARKS[name].corpus
+            if corpus_name not in corpora:
+                corpora[corpus_name] = CORPORA[corpus_name](
+                    Path(directory) / corpus_name, scale
+                )
+        for name in names:
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+                results.append(
+                    executor.submit(
+                        run_benchmark, name, corpora[BENCHMARKS[name].corpus], repeat
+                    ).result()
+                )
+            _print_result(results[-1])
+    return results
+
+
+def _print_result(result: BenchmarkResult, previous: dict | None = None) -> None:
+    time_to_first_match = (
+        "-"
+        if result.time_to_first_match is None
+        else f"{result.time_to_first_match * 1000:.2f}"
+    )
+    line = (
+        f"{result.name:<24} {result.seconds:>9.4f} s {result.megabytes_per_second:>9.1f} MB/s "
+        f"{result.lines_per_second:>12.0f} lines/s {result.peak_rss_kib or 0:>8} KiB "
+        f"first match {time_to_first_match:>8} ms"
+    )
+    if previous is not None:
+        line += f" {previous['seconds'] / max(result.seconds, 1e-9):>6.2f}x"
+    print(line, flush=True)
+
+
+def _get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments.
+
+    Returns
+    -------
+    Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the benchmarks and save the results as JSON.\n\n"
+        "Example: python -m benchmarks.run --scale 0.5 --compare benchmarks/results/abc1234.json",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "benchmark",
+        nargs="*",
+        help="(optional) benchmarks to run, all by default; one of:\n"
+        + "\n".join(
+            # The help is a format string.
+            f"  {name} - {benchmark.description.replace('%', '%%')}"
+            for name, benchmark in BENCHMARKS.items()
+        ),
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="factor applied to the size of the generated corpora (default: 1.0)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        metavar="NUM",
+        help="run each benchmark NUM times and keep the fastest run (default: 3)",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="file to save the results to (default: benchmarks/results/COMMIT.json)",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="results of a previous run, to print the speedup of each benchmark",
+    )
+    args = parser.parse_args()
+    unknown_benchmarks = set(args.benchmark) - BENCHMARKS.keys()
+    if len(unknown_benchmarks) > 0:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown_benchmarks))}")
+    return args
+
+
+def main() -> None:
+    """Run the benchmarks from the command line."""
+    args = parse_arguments()
+    commit = _get_commit()
+    results = run_benchmarks(args.benchmark or BENCHMARKS, args.scale, args.repeat)
+
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as file:
+            previous_results = {
+                result["name"]: result for result in json.load(file)["results"]
+            }
+        print(f"\nCompared with {args.compare}:")
+        for result in results:
+            _print_result(result, previous_results.get(result.name))
+
+    output = (
+        Path(args.output)
+        if args.output is not None
+        else RESULTS_DIRECTORY / f"{commit or time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "commit": commit,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "scale": args.scale,
+                "repeat": args.repeat,
+                "results": [asdict(result) for result in results],
+            },
+            file,
+            indent=2,
+        )
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import marshal
+import os
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+from src.line import Interval, Line
+
+CACHE_FILE_NAME = "results.sqlite"
+# The least recently used results are evicted when the cache gets bigger.
+MAX_CACHE_SIZE = 256 * 1024 * 1024
+# Files modified this recently (in seconds) are not cached, since they may be
+# modified again without their modification time changing.
+MIN_FILE_AGE = 1.0
+
+# Version of the format of the stored results, part of every query, so results
+# stored by an older version are never replayed.
+RESULTS_FORMAT_VERSION = 2
+
+# Size, modification time, change time and inode of a file. The results of the
+# file are only replayed while they are the same.
+FileVersion = tuple[int, int, int, int]
+
+
+def _serialize_results(results: list[Line | str | int]) -> bytes:
+    # Lines are stored as tuples, so the results can be stored with marshal, which
+    # is faster than pickle and cannot run code when loading.
+    return marshal.dumps(
+        [
+            (
+                (
+                    result.text,
+                    [
+                        (interval.start, interval.end, interval.pattern_index)
+                        for interval in result.matching_intervals
+                    ],
+                    result.index,
+                    result.offset,
+                    result.has_only_empty_matches,
+                )
+                if isinstance(result, Line)
+                else result
+            )
+            for result in results
+        ]
+    )
+
+
+def _deserialize_results(data: bytes) -> list[Line | str | int]:
+    return [
+        (
+            Line(
+                result[0],
+                [Interval(*interval) for interval in result[1]],
+                result[2],
+                result[3],
+                result[4],
+            )
+            if isinstance(result, tuple)
+            else result
+        )
+        for result in marshal.loads(data)
+    ]
+
+
+class ResultCache:
+    """An on-disk cache of the results of searching files for a query.
+
+    The results of a file are replayed without reading it again as long as its
+    size, modification time, change time and inode have not changed. The cache is
+    shared by all the queries, and the least recently used results are evicted
+    when it gets bigger than max_size bytes. Changes are saved when it is closed.
+    """
+
+    def __init__(
+        self, directory: str, query: str, max_size: int = MAX_CACHE_SIZE
+    ) -> None:
+        """Open the cache in a directory, creating it if it does not exist.
+
+        Parameters
+        ----------
+        directory : Directory to store the cache in.
+        query : Description of the pattern and of all the options which change the
+            results of a file. Results are only replayed for the same query.
+        max_size : Maximum total size of the cached results, in bytes.
+        """
+        import hashlib
+        import sqlite3
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.max_size: int = max_size
+        self._query: str = hashlib.sha256(
+            f"{marshal.version}\n{RESULTS_FORMAT_VERSION}\n{query}".encode(
+                "utf-8", "surrogatepass"
+            )
+        ).hexdigest()
+        self._time: int = int(time.time())
+        self._used_paths: list[str] = []
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            Path(directory) / CACHE_FILE_NAME
+        )
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (query TEXT NOT NULL, "
+                "path TEXT NOT NULL, size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, ctime_ns INTEGER NOT NULL, "
+                "inode INTEGER NOT NULL, results BLOB NOT NULL, "
+                "last_used INTEGER NOT NULL, PRIMARY KEY (query, path))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    def get_file_version(self, file: str | Path) -> FileVersion | None:
+        """Get the version of a file, to be taken before searching it.
+
+        Parameters
+        ----------
+        file : Path of the file.
+
+        Returns
+        -------
+        Version of the file, or None if the file cannot be cached because it does
+        not exist, was modified too recently or its path is not valid UTF-8.
+        """
+        try:
+            # Paths are stored as UTF-8, without the surrogates of undecodable bytes.
+            os.fspath(file).encode("utf-8")
+            file_stat = os.stat(file)
+        except (OSError, UnicodeEncodeError):
+            return None
+        if time.time_ns() - file_stat.st_mtime_ns < MIN_FILE_AGE * 1e9:
+            return None
+        return (
+            file_stat.st_size,
+            file_stat.st_mtime_ns,
+            file_stat.st_ctime_ns,
+            file_stat.st_ino,
+        )
+
+    def get(
+        self, file: str | Path, version: FileVersion
+    ) -> list[Line | str | int] | None:
+        """Get the cached results of a file.
+
+        Parameters
+        ----------
+        file : Path of the file.
+        version : Current version of the file, from get_file_version.
+
+        Returns
+        -------
+        Results of the file, or None if they are not cached for this version.
+        """
+        path = os.path.abspath(file)
+        row = self._connection.execute(
+            "SELECT size, mtime_ns, ctime_ns, inode, results FROM results "
+            "WHERE query = ? AND path = ?",
+            (self._query, path),
+        ).fetchone()
+        if row is None or tuple(row[:4]) != version:
+            return None
+        self._used_paths.append(path)
+        return _deserialize_results(row[4])
+
+    def put(
+        self,
+        file: str | Path,
+        version: FileVersion,
+        results: Iterable[Line | str | int],
+    ) -> None:
+        """Cache the results of a file.
+
+        Parameters
+        ----------
+        file : Path of the file.
+        version : Version of the file before it was searched, from get_file_version.
+        results : All the results of the file.
+        """
+        self._connection.execute(
+            "INSERT OR REPLACE INTO results (query, path, size, mtime_ns, ctime_ns, "
+            "inode, results, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self._query,
+                os.path.abspath(file),
+                *version,
+                _serialize_results(list(results)),
+                self._time,
+            ),
+        )
+
+    def _evict(self) -> None:
+        total_size = self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(results)), 0) FROM results"
+        ).fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        evicted_keys = []
+        for query, path, size in self._connection.execute(
+            "SELECT query, path, LENGTH(results) FROM results ORDER BY last_used"
+        ):
+            evicted_keys.append((query, path))
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+        self._connection.executemany(
+            "DELETE FROM results WHERE query = ? AND path = ?", evicted_keys
+        )
+
+    def close(self) -> None:
+        """Save the changes and close the cache."""
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE results SET last_used = ? WHERE query = ? AND path = ?",
+                    ((self._time, self._query, path) for path in self._used_paths),
+                )
+                self._evict()
+        finally:
+            self._connection.close()
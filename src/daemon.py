@@ -0,0 +1,248 @@
+import _thread
+import json
+import os
+import socket
+import stat
+import sys
+from collections.abc import Callable
+from threading import Lock, Thread
+
+# Environment variable with the path of the socket of the daemon.
+SOCKET_PATH_VARIABLE = "GREPD_SOCKET"
+
+
+def get_socket_path() -> str:
+    """Get the path of the socket of the daemon of the current user.
+
+    Returns
+    -------
+    Path given by the GREPD_SOCKET environment variable, or grepd.sock in the
+    runtime directory of the user if there is one, or a socket named after the user
+    id in the temporary directory.
+    """
+    socket_path = os.environ.get(SOCKET_PATH_VARIABLE)
+    if socket_path:
+        return socket_path
+    runtime_directory = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_directory:
+        return os.path.join(runtime_directory, "grepd.sock")
+    # Unix domain sockets are only used on Unix, where tempfile would find the
+    # same directory, but is slow to import.
+    temporary_directory = os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(temporary_directory, f"grepd-{os.getuid()}.sock")
+
+
+def _is_own_socket(socket_path: str) -> bool:
+    # Another user could create a socket at the path in a shared directory, to be
+    # sent the standard streams of the clients.
+    try:
+        socket_stat = os.stat(socket_path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(socket_stat.st_mode) and socket_stat.st_uid == os.getuid()
+
+
+def _connect(socket_path: str) -> socket.socket | None:
+    if not _is_own_socket(socket_path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def forward(socket_path: str, arguments: list[str]) -> int | None:
+    """Run a command line in the daemon, if it is running.
+
+    The standard streams of this process are sent to the daemon, which writes the
+    output to them directly, so it is streamed as it is found.
+
+    Parameters
+    ----------
+    socket_path : Path of the socket of the daemon.
+    arguments : Command line arguments, without the program name.
+
+    Returns
+    -------
+    Exit status of the command, or None if the daemon is not running.
+    """
+    if not hasattr(socket, "send_fds"):
+        # Not on Unix.
+        return None
+    client = _connect(socket_path)
+    if client is None:
+        return None
+    with client:
+        request = {"arguments": arguments, "working_directory": os.getcwd()}
+        # Standard input, output and error.
+        socket.send_fds(client, [b"\0"], [0, 1, 2])
+        client.sendall(json.dumps(request).encode() + b"\n")
+        # The daemon sends the exit status once the command is done.
+        with client.makefile("rb") as response:
+            exit_status = response.read()
+    try:
+        return int(exit_status)
+    except ValueError:
+        print("grepd: the daemon stopped before the end of the search", file=sys.stderr)
+        return 2
+
+
+class _ClientWatcher:
+    # Interrupts the command when the client disconnects, e.g. when the client is
+    # interrupted. The client sends nothing after the request, so receiving only
+    # returns when it disconnects, or once the connection is shut down after the
+    # command.
+
+    def __init__(self, connection: socket.socket) -> None:
+        self.is_client_disconnected: bool = False
+        self._connection = connection
+        self._lock = Lock()
+        self._is_command_finished = False
+        self._thread = Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def _watch(self) -> None:
+        try:
+            self._connection.recv(1)
+        except OSError:
+            pass
+        with self._lock:
+            if not self._is_command_finished:
+                self.is_client_disconnected = True
+                _thread.interrupt_main()
+
+    def finish_command(self) -> None:
+        with self._lock:
+            self._is_command_finished = True
+
+    def stop(self) -> None:
+        try:
+            self._connection.shutdown(socket.SHUT_RD)
+        except OSError:
+            # The client already disconnected.
+            pass
+        self._thread.join()
+
+
+def _run_client_command(
+    connection: socket.socket,
+    request: dict,
+    file_descriptors: list[int],
+    run_command: Callable[[list[str]], int],
+) -> int:
+    # Runs the command in the working directory and with the standard streams of
+    # the client, and returns its exit status.
+    streams = [
+        open(
+            file_descriptor,
+            mode,
+            encoding=standard_stream.encoding,
+            errors=standard_stream.errors,
+        )
+        for file_descriptor, mode, standard_stream in zip(
+            file_descriptors, ["r", "w", "w"], [sys.stdin, sys.stdout, sys.stderr]
+        )
+    ]
+    original_streams = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = streams
+
+    client_watcher = _ClientWatcher(connection)
+    try:
+        try:
+            os.chdir(request["working_directory"])
+            exit_status = run_command(request["arguments"])
+        finally:
+            client_watcher.finish_command()
+    except KeyboardInterrupt:
+        # The daemon itself is stopped when it is interrupted.
+        if not client_watcher.is_client_disconnected:
+            raise
+        exit_status = 130
+    except SystemExit as error:
+        # Raised by argparse, for usage errors and --help.
+        if error.code is None or isinstance(error.code, int):
+            exit_status = 0 if error.code is None else error.code
+        else:
+            print(error.code, file=sys.stderr)
+            exit_status = 1
+    except BrokenPipeError:
+        # The output of the client was closed, e.g. by head.
+        exit_status = 1
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+        exit_status = 1
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = original_streams
+        for stream in streams:
+            try:
+                stream.close()
+            except OSError:
+                pass
+        client_watcher.stop()
+    return exit_status
+
+
+def _serve_client(
+    connection: socket.socket, run_command: Callable[[list[str]], int]
+) -> None:
+    try:
+        _, file_descriptors, _, _ = socket.recv_fds(connection, 1, 3)
+        with connection.makefile("rb") as request_file:
+            request = json.loads(request_file.readline())
+    except (OSError, ValueError):
+        return
+    if len(file_descriptors) != 3:
+        for file_descriptor in file_descriptors:
+            os.close(file_descriptor)
+        return
+    exit_status = _run_client_command(
+        connection, request, file_descriptors, run_command
+    )
+    try:
+        connection.sendall(f"{exit_status}\n".encode())
+    except OSError:
+        pass
+
+
+def serve(socket_path: str, run_command: Callable[[list[str]], int]) -> None:
+    """Run the command lines sent by forward, until interrupted.
+
+    The commands are run one at a time in this process, so everything which is
+    kept in memory between them, like compiled patterns and directory listings,
+    is reused. The socket can only be used by the current user. OSError is raised
+    if the socket cannot be created, e.g. if the daemon is already running.
+
+    Parameters
+    ----------
+    socket_path : Path of the socket to listen on.
+    run_command : Function running a command line, given without the program
+        name, and returning its exit status.
+    """
+    client = _connect(socket_path)
+    if client is not None:
+        client.close()
+        raise OSError(f"{socket_path}: the daemon is already running")
+    # The socket of a daemon which did not stop cleanly is left behind.
+    if _is_own_socket(socket_path):
+        os.unlink(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(umask)
+    try:
+        server.listen()
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                _serve_client(connection, run_command)
+    finally:
+        server.close()
+        os.unlink(socket_path)
@@ -0,0 +1,104 @@
+import io
+from typing import BinaryIO
+
+# Compression formats recognized by the magic bytes at the start of a file, like
+# in the file command, so compressed files do not need a particular extension.
+MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bzip2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+
+class DecompressionError(Exception):
+    """Raised when a compressed file cannot be decompressed."""
+
+
+class _DecompressedStream(io.RawIOBase):
+    # Decompressed data of a file, raising DecompressionError for invalid data.
+    # Unlike the file, it has no file descriptor, so it is never memory mapped.
+
+    def __init__(self, stream: BinaryIO, errors: tuple[type[Exception], ...]) -> None:
+        self._stream = stream
+        self._errors = errors
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        try:
+            return self._stream.readinto(buffer)
+        except self._errors as error:
+            raise DecompressionError(f"invalid compressed data ({error})") from error
+
+    def close(self) -> None:
+        self._stream.close()
+        super().close()
+
+
+def get_compression_format(file: BinaryIO) -> str | None:
+    """Get the compression format of a file from its magic bytes.
+
+    Parameters
+    ----------
+    file : File to check, opened with a buffer. Peeking does not consume anything.
+
+    Returns
+    -------
+    Compression format, one of the keys of MAGIC_BYTES, or None if the file is not
+    compressed.
+    """
+    start = file.peek(max(len(magic_bytes) for magic_bytes in MAGIC_BYTES.values()))
+    for compression_format, magic_bytes in MAGIC_BYTES.items():
+        if start.startswith(magic_bytes):
+            return compression_format
+    return None
+
+
+def open_decompressed(file: BinaryIO, buffer_size: int) -> BinaryIO:
+    """Open the decompressed data of a file, if it is compressed.
+
+    The decompression modules are only imported when a compressed file is found.
+    zstd requires the optional zstandard package, DecompressionError is raised
+    for zstd compressed files without it.
+
+    Parameters
+    ----------
+    file : File to decompress, opened with a buffer.
+    buffer_size : Size of the buffer of the decompressed data.
+
+    Returns
+    -------
+    Buffered decompressed data, or the file itself if it is not compressed.
+    """
+    compression_format = get_compression_format(file)
+    if compression_format is None:
+        return file
+
+    if compression_format == "gzip":
+        import gzip
+
+        stream = gzip.GzipFile(fileobj=file)
+        errors = (OSError, EOFError)
+    elif compression_format == "bzip2":
+        import bz2
+
+        stream = bz2.BZ2File(file)
+        errors = (OSError, EOFError)
+    elif compression_format == "xz":
+        import lzma
+
+        stream = lzma.LZMAFile(file)
+        errors = (lzma.LZMAError, EOFError)
+    else:
+        try:
+            import zstandard
+        except ImportError:
+            raise DecompressionError(
+                "file is zstd compressed, install zstandard to search it"
+            )
+
+        stream = zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+        errors = (zstandard.ZstdError,)
+    return io.BufferedReader(_DecompressedStream(stream, errors), buffer_size)
@@ -0,0 +1,136 @@
+import os
+import select
+import time
+from collections.abc import Callable, Generator
+
+from src.watch import (
+    IN_ATTRIB,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MODIFY,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    DirectoryWatcher,
+)
+
+READ_SIZE = 64 * 1024
+# Without inotify, the file is checked for new data at this interval (in seconds).
+POLL_INTERVAL = 0.05
+# Even with inotify, the file is checked for rotation at this interval, in case
+# an event was missed.
+CHECK_INTERVAL = 1.0
+
+# inotify events of the directory of the followed file: data written to a file,
+# and files created, moved or deleted (when the log is rotated).
+_WATCHED_EVENTS = (
+    IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+
+
+class _InotifyWaiter:
+    # Waits for changes in the directory of the file with inotify (Linux only).
+
+    def __init__(self, path: str) -> None:
+        self._watcher = DirectoryWatcher()
+        try:
+            self._watcher.add(os.path.dirname(os.path.abspath(path)), _WATCHED_EVENTS)
+        except OSError:
+            self._watcher.close()
+            raise
+
+    def wait(self) -> None:
+        select.select([self._watcher], [], [], CHECK_INTERVAL)
+        # The events are only used to wake up, so they are discarded.
+        self._watcher.read_events()
+
+    def close(self) -> None:
+        self._watcher.close()
+
+
+class _PollingWaiter:
+    # Waits for a fixed interval, used when inotify is not available.
+
+    def wait(self) -> None:
+        time.sleep(POLL_INTERVAL)
+
+    def close(self) -> None:
+        pass
+
+
+def _create_waiter(path: str) -> _InotifyWaiter | _PollingWaiter:
+    try:
+        return _InotifyWaiter(path)
+    except (OSError, AttributeError):
+        # Not on Linux, or no inotify instances or watches left.
+        return _PollingWaiter()
+
+
+def _is_rotated(file_descriptor: int, path: str) -> bool:
+    # The path refers to another file once the followed one is rotated. If the
+    # path does not exist yet, the old file is followed until it is recreated.
+    try:
+        path_stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    file_stat = os.fstat(file_descriptor)
+    return (path_stat.st_dev, path_stat.st_ino) != (file_stat.st_dev, file_stat.st_ino)
+
+
+def follow_lines(
+    path: str,
+    encoding: str,
+    should_stop: Callable[[], bool] | None = None,
+) -> Generator[str, None, None]:
+    """Generate the lines of a file, then the lines appended to it as it grows.
+
+    Like tail -F, a file which is truncated is read again from the start, and
+    when the file is rotated (moved or deleted, and recreated), the rest of the
+    old file is read before following the new one. A line is only generated once
+    its line terminator has been written.
+
+    Parameters
+    ----------
+    path : Path of the file to follow.
+    encoding : Encoding of the file. Invalid data is replaced.
+    should_stop : Called when all the data written so far has been read. The
+        generator stops if it returns True, otherwise it waits for more data.
+
+    Returns
+    -------
+    Generator of lines, without line terminators.
+    """
+    file = open(path, "rb", buffering=0)
+    waiter = _create_waiter(path)
+    # Data after the last line terminator, until the rest of the line is written.
+    incomplete_line = b""
+    try:
+        while True:
+            data = file.read(READ_SIZE)
+            if data:
+                lines = (incomplete_line + data).split(b"\n")
+                incomplete_line = lines.pop()
+                for line in lines:
+                    yield line.decode(encoding, "replace")
+                continue
+
+            if _is_rotated(file.fileno(), path):
+                if incomplete_line:
+                    yield incomplete_line.decode(encoding, "replace")
+                    incomplete_line = b""
+                file.close()
+                file = open(path, "rb", buffering=0)
+                continue
+            if os.fstat(file.fileno()).st_size < file.tell():
+                # Truncated, the incomplete line will never be completed.
+                incomplete_line = b""
+                file.seek(0)
+                continue
+
+            if should_stop is not None and should_stop():
+                if incomplete_line:
+                    yield incomplete_line.decode(encoding, "replace")
+                return
+            waiter.wait()
+    finally:
+        waiter.close()
+        file.close()
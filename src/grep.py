@@ -1,87 +1,1415 @@
+import codecs
+import io
+import locale
+import mmap
+import os
+import stat
 import sys
-from collections import deque
-from collections.abc import Generator
+from collections import OrderedDict, deque
+from collections.abc import AsyncGenerator, Callable, Generator, Iterable, Iterator
+from contextlib import closing
+from dataclasses import dataclass
 from pathlib import Path
+from queue import Full, Queue
+from threading import Event, Lock
+from typing import BinaryIO, Literal, TypeVar
 
-from src.printer import Printer
-from src.search import find_matching_lines
+from src.cache import FileVersion, ResultCache
+from src.decompress import DecompressionError, open_decompressed
+from src.follow import follow_lines
+from src.ignore import (
+    ALWAYS_IGNORED_DIRECTORY_NAMES,
+    ALWAYS_IGNORED_FILE_NAMES,
+    IGNORE_FILE_NAMES,
+    IgnoreRules,
+    load_ignore_rules,
+)
+from src.index import TrigramIndex
+from src.line import Interval, Line
+from src.matcher import Matcher, create_matcher
+from src.printer import JsonPrinter, Printer
+from src.search import (
+    count_matching_lines,
+    count_matching_lines_in_blocks,
+    find_matching_lines,
+    find_matching_lines_in_blocks,
+)
+from src.stats import Stats
+from src.watch import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_DELETE_SELF,
+    IN_MOVE_SELF,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    DirectoryWatcher,
+)
 
+T = TypeVar("T")
 
-def _read_file_by_line(path: Path) -> Generator[str, None, None]:
-    with open(path, "r") as file:
-        for line in file:
+BLOCK_SIZE = 1024 * 1024
+# Maximum number of directories listed ahead of the search by a parallel walk.
+WALKER_QUEUE_SIZE = 1024
+# Number of bytes checked for NUL bytes and invalid encoding to detect binary files.
+BINARY_SNIFF_SIZE = 32 * 1024
+# Number of files opened and read ahead of the file being searched, so waiting for
+# the disk overlaps with matching, and maximum number of bytes read ahead in total.
+READ_AHEAD_FILES = 8
+READ_AHEAD_BYTES = 64 * 1024 * 1024
+# Maximum number of directory listings kept by a DirectoryListingCache.
+LISTING_CACHE_SIZE = 16
+
+# How binary files are handled: reported as binary without being searched,
+# skipped, searched as text, or reported as binary only if they match.
+BinaryFilesMode = Literal["binary", "skip", "text", "match"]
+# Message printed for a binary file which matches, instead of its lines.
+BINARY_FILE_MATCHES_MESSAGE = "binary file matches"
+
+# When the output is colored: only when writing to a terminal, always or never.
+ColorMode = Literal["auto", "always", "never"]
+
+# What is printed for each file: the matching lines, the number of matching lines,
+# the name of the file if it matches or if it does not match, or nothing at all.
+OutputMode = Literal[
+    "lines", "count", "files_with_matches", "files_without_match", "quiet"
+]
+
+# Files are decoded with the locale encoding, like in text mode. They can only be
+# searched as bytes when the locale encoding is UTF-8.
+_LOCALE_ENCODING = locale.getpreferredencoding(False)
+_IS_LOCALE_ENCODING_UTF8 = codecs.lookup(_LOCALE_ENCODING).name == "utf-8"
+
+
+@dataclass(frozen=True)
+class _FileSearchOptions:
+    # Options needed to search a single file, also sent to worker processes.
+    matcher: Matcher
+    number_of_lines_before_match: int
+    number_of_lines_after_match: int
+    binary_files: BinaryFilesMode
+    output_mode: OutputMode = "lines"
+    max_count: int | None = None
+    search_zip: bool = False
+    # Only the JSON output and the library API need the matching intervals.
+    find_intervals: bool = True
+
+
+# Like in bytes blocks, lines only end with "\n" (a "\r" before it is stripped
+# with the terminator), so all the ways of reading a file give the same lines.
+_NEWLINE = "\n"
+
+
+def _read_file_by_line(file: BinaryIO, errors: str) -> Generator[str, None, None]:
+    with io.TextIOWrapper(
+        file, encoding=_LOCALE_ENCODING, errors=errors, newline=_NEWLINE
+    ) as text_file:
+        for line in text_file:
             yield line
 
 
-def _get_all_files_in_directory(directory: Path) -> Generator[Path, None, None]:
+def _read_file_by_block(
+    file: BinaryIO, errors: str, block_size: int = BLOCK_SIZE
+) -> Generator[str, None, None]:
+    with io.TextIOWrapper(
+        file, encoding=_LOCALE_ENCODING, errors=errors, newline=_NEWLINE
+    ) as text_file:
+        while True:
+            block = text_file.read(block_size)
+            if len(block) == 0:
+                return
+            # Blocks must end on a line boundary.
+            if block[-1] != "\n":
+                block += text_file.readline()
+            yield block
+
+
+def _read_file_by_binary_block(
+    file: BinaryIO, block_size: int = BLOCK_SIZE
+) -> Generator[bytes, None, None]:
+    try:
+        file_stat = os.fstat(file.fileno())
+    except io.UnsupportedOperation:
+        # Decompressed data is not backed by a file.
+        file_stat = None
+    mapped_file = None
+    if (
+        file_stat is not None
+        and stat.S_ISREG(file_stat.st_mode)
+        and file_stat.st_size > 0
+    ):
+        try:
+            mapped_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Files of pseudo file systems, like sysfs, look like regular files
+            # but cannot be mapped.
+            pass
+    if mapped_file is not None:
+        yield from _read_mapped_file_by_block(mapped_file, block_size)
+    else:
+        yield from _read_buffered_file_by_block(file, block_size)
+
+
+def _read_mapped_file_by_block(
+    mapped_file: mmap.mmap, block_size: int
+) -> Generator[bytes, None, None]:
+    with mapped_file:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped_file.madvise(mmap.MADV_SEQUENTIAL)
+        size = len(mapped_file)
+        start = 0
+        while start < size:
+            # Blocks must end on a line boundary.
+            end = mapped_file.find(b"\n", min(start + block_size, size) - 1)
+            end = size if end == -1 else end + 1
+            yield mapped_file[start:end]
+            start = end
+
+
+def _read_buffered_file_by_block(
+    file: BinaryIO, block_size: int
+) -> Generator[bytes, None, None]:
+    while True:
+        block = file.read(block_size)
+        if len(block) == 0:
+            return
+        # Blocks must end on a line boundary.
+        if block[-1:] != b"\n":
+            block += file.readline()
+        yield block
+
+
+def _is_binary(file: BinaryIO) -> bool:
+    # Like GNU grep, only the beginning of the file is checked for NUL bytes and
+    # invalid encoding. The file must be opened with a buffer of at least
+    # BINARY_SNIFF_SIZE bytes, so peeking does not consume anything.
+    start = file.peek(BINARY_SNIFF_SIZE)[:BINARY_SNIFF_SIZE]
+    if b"\0" in start:
+        return True
+    try:
+        # A character cut off at the end is fine.
+        codecs.getincrementaldecoder(_LOCALE_ENCODING)().decode(start)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def _count_read_data(
+    stats: Stats, chunks: Iterable[T], newline: str | bytes | None
+) -> Generator[T, None, None]:
+    # Counts the data read in blocks (ending with a newline, but the last one) or
+    # in lines (when newline is None).
+    for chunk in chunks:
+        stats.number_of_bytes += len(chunk)
+        if newline is None:
+            stats.number_of_lines += 1
+        else:
+            stats.number_of_lines += chunk.count(newline)
+            if not chunk.endswith(newline):
+                stats.number_of_lines += 1
+        yield chunk
+
+
+def _count_found_matching_lines(
+    stats: Stats, lines: Iterable[Line]
+) -> Generator[Line, None, None]:
+    for line in lines:
+        if line.is_match:
+            stats.number_of_matching_lines += 1
+        yield line
+
+
+def _read_file(
+    matcher: Matcher, file: BinaryIO, errors: str, stats: Stats | None
+) -> tuple[Iterable[str] | Iterable[bytes], bool]:
+    # Returns the chunks of the file to search, and whether they are blocks of
+    # lines (searched as a whole) rather than single lines.
+    if matcher.supports_bytes_search and _IS_LOCALE_ENCODING_UTF8:
+        chunks, newline = _read_file_by_binary_block(file), b"\n"
+    elif matcher.supports_buffer_search:
+        chunks, newline = _read_file_by_block(file, errors), "\n"
+    else:
+        chunks, newline = _read_file_by_line(file, errors), None
+    if stats is not None:
+        chunks = stats.time_iterator("reader", _count_read_data(stats, chunks, newline))
+    return chunks, newline is not None
+
+
+def _find_matching_lines_in_file(
+    matcher: Matcher,
+    file: BinaryIO,
+    number_of_lines_before_match: int,
+    number_of_lines_after_match: int,
+    errors: str,
+    max_count: int | None,
+    stats: Stats | None,
+    find_intervals: bool = True,
+) -> Iterable[Line]:
+    chunks, are_blocks = _read_file(matcher, file, errors, stats)
+    if are_blocks:
+        lines = find_matching_lines_in_blocks(
+            matcher,
+            chunks,
+            number_of_lines_before_match,
+            number_of_lines_after_match,
+            errors=errors,
+            max_count=max_count,
+            find_intervals=find_intervals,
+        )
+    else:
+        lines = find_matching_lines(
+            matcher,
+            chunks,
+            number_of_lines_before_match,
+            number_of_lines_after_match,
+            max_count=max_count,
+            find_intervals=find_intervals,
+        )
+    if stats is not None:
+        lines = stats.time_iterator(
+            "matcher", _count_found_matching_lines(stats, lines)
+        )
+    return lines
+
+
+def _count_matching_lines_in_file(
+    matcher: Matcher,
+    file: BinaryIO,
+    errors: str,
+    max_count: int | None,
+    stats: Stats | None,
+) -> int:
+    chunks, are_blocks = _read_file(matcher, file, errors, stats)
+    if stats is not None:
+        stats.start("matcher")
+    try:
+        if are_blocks:
+            number_of_matching_lines = count_matching_lines_in_blocks(
+                matcher, chunks, errors=errors, max_count=max_count
+            )
+        else:
+            number_of_matching_lines = count_matching_lines(
+                matcher, chunks, max_count=max_count
+            )
+    finally:
+        if stats is not None:
+            stats.stop()
+    if stats is not None:
+        stats.number_of_matching_lines += number_of_matching_lines
+    return number_of_matching_lines
+
+
+def _get_directory_id(entry: os.DirEntry | str) -> tuple[int, int]:
+    directory_stat = entry.stat() if isinstance(entry, os.DirEntry) else os.stat(entry)
+    return directory_stat.st_dev, directory_stat.st_ino
+
+
+def _scan_directory(
+    directory: str,
+    ignore_rules: IgnoreRules | None,
+    use_ignore_files: bool,
+    visited_directories: set[tuple[int, int]],
+    lock: Lock,
+    watch_directory: Callable[[str], None] | None = None,
+) -> tuple[list[str], list[tuple[str, IgnoreRules | None]]]:
+    # DirEntry caches the file type returned by the OS, so files and directories
+    # are told apart without extra stat calls (except for symlinks). The directory
+    # is watched before it is listed, so no change is missed.
+    if watch_directory is not None:
+        watch_directory(directory)
+    try:
+        with os.scandir(directory) as iterator:
+            entries = list(iterator)
+    except OSError:
+        return [], []
+
+    if use_ignore_files:
+        ignore_rules = load_ignore_rules(
+            directory,
+            [entry.name for entry in entries if entry.name in IGNORE_FILE_NAMES],
+            ignore_rules,
+        )
+
+    files = []
+    subdirectories = []
+    for entry in entries:
+        try:
+            if entry.is_file():
+                if use_ignore_files and (
+                    entry.name in ALWAYS_IGNORED_FILE_NAMES
+                    or (
+                        ignore_rules is not None
+                        and ignore_rules.is_ignored(entry.path, is_directory=False)
+                    )
+                ):
+                    continue
+                files.append(entry.path)
+            elif entry.is_dir():
+                # Ignored directories are pruned, so they are never listed.
+                if use_ignore_files and (
+                    entry.name in ALWAYS_IGNORED_DIRECTORY_NAMES
+                    or (
+                        ignore_rules is not None
+                        and ignore_rules.is_ignored(entry.path, is_directory=True)
+                    )
+                ):
+                    continue
+                # Directories are identified by device and inode, so symlink
+                # loops are never followed.
+                directory_id = _get_directory_id(entry)
+                with lock:
+                    if directory_id in visited_directories:
+                        continue
+                    visited_directories.add(directory_id)
+                subdirectories.append((entry.path, ignore_rules))
+        except OSError:
+            continue
+    return files, subdirectories
+
+
+def _walk_directory_in_parallel(
+    directory: str,
+    use_ignore_files: bool,
+    visited_directories: set[tuple[int, int]],
+    number_of_threads: int,
+    watch_directory: Callable[[str], None] | None = None,
+) -> Generator[str, None, None]:
+    # Each directory is scanned by a separate task. The files found are put on
+    # a bounded queue, so the walk does not get too far ahead of the search.
+    from concurrent.futures import ThreadPoolExecutor
+
+    lock = Lock()
+    stop_event = Event()
+    file_queue: Queue[list[str] | None] = Queue(maxsize=WALKER_QUEUE_SIZE)
+    number_of_pending_directories = 1
+
+    def put(item: list[str] | None) -> None:
+        while not stop_event.is_set():
+            try:
+                file_queue.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def scan(current_directory: str, ignore_rules: IgnoreRules | None) -> None:
+        nonlocal number_of_pending_directories
+        try:
+            if stop_event.is_set():
+                return
+            files, subdirectories = _scan_directory(
+                current_directory,
+                ignore_rules,
+                use_ignore_files,
+                visited_directories,
+                lock,
+                watch_directory,
+            )
+            with lock:
+                number_of_pending_directories += len(subdirectories)
+            for subdirectory, subdirectory_ignore_rules in subdirectories:
+                executor.submit(scan, subdirectory, subdirectory_ignore_rules)
+            if len(files) > 0:
+                put(files)
+        finally:
+            with lock:
+                number_of_pending_directories -= 1
+                is_walk_finished = number_of_pending_directories == 0
+            if is_walk_finished:
+                put(None)
+
+    executor = ThreadPoolExecutor(max_workers=number_of_threads)
+    try:
+        executor.submit(scan, directory, None)
+        while (files := file_queue.get()) is not None:
+            yield from files
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_all_files_in_directory(
+    directory: Path,
+    number_of_threads: int = 1,
+    use_ignore_files: bool = False,
+    watch_directory: Callable[[str], None] | None = None,
+) -> Generator[str, None, None]:
+    # watch_directory is called with each directory before it is listed.
     if not directory.is_dir():
         raise ValueError(f"Directory {directory} does not exist")
 
-    directory_queue = deque([directory])
+    visited_directories = {_get_directory_id(str(directory))}
+
+    if number_of_threads > 1:
+        yield from _walk_directory_in_parallel(
+            str(directory),
+            use_ignore_files,
+            visited_directories,
+            number_of_threads,
+            watch_directory,
+        )
+        return
+
+    lock = Lock()
+    directory_queue: deque[tuple[str, IgnoreRules | None]] = deque(
+        [(str(directory), None)]
+    )
 
     while len(directory_queue) > 0:
-        current_dir = directory_queue.popleft()
-        for path in current_dir.iterdir():
-            if path.is_file():
-                yield path
-            elif path.is_dir():
-                directory_queue.append(path)
+        current_dir, ignore_rules = directory_queue.popleft()
+        files, subdirectories = _scan_directory(
+            current_dir,
+            ignore_rules,
+            use_ignore_files,
+            visited_directories,
+            lock,
+            watch_directory,
+        )
+        yield from files
+        directory_queue.extend(subdirectories)
+
+
+# Events of the listed directories which change a listing: files or directories
+# created, deleted or moved, and ignore files written.
+_DIRECTORY_CHANGE_EVENTS = (
+    IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+)
+_LISTING_EVENTS = _DIRECTORY_CHANGE_EVENTS | IN_CLOSE_WRITE
+
+
+def _is_listing_changed(events: list[tuple[str | None, int, str]]) -> bool:
+    for _, mask, name in events:
+        # Events were lost when the queue overflowed.
+        if mask & (_DIRECTORY_CHANGE_EVENTS | IN_Q_OVERFLOW):
+            return True
+        if mask & IN_CLOSE_WRITE and name in IGNORE_FILE_NAMES:
+            return True
+    return False
+
+
+class DirectoryListingCache:
+    """Listings of recursively searched directories, kept until they change.
+
+    Every listed directory is watched with inotify, and a listing is dropped as
+    soon as a file or directory is created, deleted or moved in one of its
+    directories, or one of its ignore files is written. Without inotify, nothing
+    is cached. Used by the daemon, which searches the same directories again and
+    again.
+    """
+
+    def __init__(self, max_size: int = LISTING_CACHE_SIZE) -> None:
+        """Create an empty cache.
+
+        Parameters
+        ----------
+        max_size : Maximum number of listings. The least recently used listings
+            are dropped when there are more.
+        """
+        self.max_size: int = max_size
+        self._listings: OrderedDict[
+            tuple[str, str, bool], tuple[list[str], DirectoryWatcher]
+        ] = OrderedDict()
+
+    def get_files(
+        self, directory: Path, number_of_threads: int, use_ignore_files: bool
+    ) -> Iterable[str]:
+        """Get all the files in a directory, in the order of a recursive search.
+
+        Parameters
+        ----------
+        directory : Directory to list.
+        number_of_threads : Number of threads listing directories, if the
+            directory is not cached.
+        use_ignore_files : Whether to skip the files listed in ignore files.
+
+        Returns
+        -------
+        Iterable of the paths of the files. A listing which is not cached is
+        generated as the directories are listed, and cached once it is complete.
+        """
+        # Paths are relative to the directory as given, and to the current
+        # directory if it is relative.
+        key = (str(directory), os.path.abspath(directory), use_ignore_files)
+        listing = self._listings.get(key)
+        if listing is not None:
+            files, watcher = listing
+            if not _is_listing_changed(watcher.read_events()):
+                self._listings.move_to_end(key)
+                return files
+            del self._listings[key]
+            watcher.close()
+        try:
+            watcher = DirectoryWatcher()
+        except (OSError, AttributeError):
+            # Not on Linux, or no inotify instances left.
+            return _get_all_files_in_directory(
+                directory, number_of_threads, use_ignore_files
+            )
+        return self._list_directory(
+            key, directory, number_of_threads, use_ignore_files, watcher
+        )
+
+    def _list_directory(
+        self,
+        key: tuple[str, str, bool],
+        directory: Path,
+        number_of_threads: int,
+        use_ignore_files: bool,
+        watcher: DirectoryWatcher,
+    ) -> Generator[str, None, None]:
+        is_watched = True
+
+        def watch_directory(path: str) -> None:
+            nonlocal is_watched
+            try:
+                watcher.add(path, _LISTING_EVENTS)
+            except OSError:
+                # No inotify watches left, or the directory was just deleted.
+                is_watched = False
+
+        files = []
+        is_cached = False
+        try:
+            for file in _get_all_files_in_directory(
+                directory, number_of_threads, use_ignore_files, watch_directory
+            ):
+                files.append(file)
+                yield file
+            # The listing may be out of date if the directories changed while
+            # they were listed.
+            if is_watched and not _is_listing_changed(watcher.read_events()):
+                self._listings[key] = (files, watcher)
+                is_cached = True
+                while len(self._listings) > self.max_size:
+                    _, (_, evicted_watcher) = self._listings.popitem(last=False)
+                    evicted_watcher.close()
+        finally:
+            if not is_cached:
+                watcher.close()
+
+    def close(self) -> None:
+        """Drop all the listings and stop watching their directories."""
+        for _, watcher in self._listings.values():
+            watcher.close()
+        self._listings.clear()
+
+
+def _read_ahead(file: str | Path, max_bytes: int) -> None:
+    # The kernel is asked to read the start of the file into the page cache in
+    # the background. Special files are opened without blocking, and fail to be
+    # read ahead.
+    try:
+        file_descriptor = os.open(file, os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(file_descriptor, 0, max_bytes, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(file_descriptor)
+
+
+def _read_files_ahead(
+    files: Iterable[str | Path], number_of_files: int, max_bytes: int
+) -> Generator[str | Path, None, None]:
+    # Generates the files, once the next number_of_files files have been read
+    # ahead. Reading ahead only starts reading in the background, so it is done
+    # right away rather than in threads, which would compete with the search for
+    # the GIL. Each file is read ahead by its share of max_bytes at most.
+    if not hasattr(os, "posix_fadvise"):
+        # Not available on Windows and macOS.
+        yield from files
+        return
+    max_bytes_per_file = max(max_bytes // number_of_files, 1)
+    pending: deque[str | Path] = deque()
+    for file in files:
+        _read_ahead(file, max_bytes_per_file)
+        pending.append(file)
+        if len(pending) > number_of_files:
+            yield pending.popleft()
+    yield from pending
+
+
+def _get_max_count(options: _FileSearchOptions) -> int | None:
+    # Whether a file matches is known after the first matching line.
+    if options.output_mode in ("files_with_matches", "files_without_match", "quiet"):
+        return 1 if options.max_count is None else min(options.max_count, 1)
+    return options.max_count
+
+
+def _search_file(
+    file_path: Path, options: _FileSearchOptions, stats: Stats | None = None
+) -> Generator[Line | str | int, None, None]:
+    # Generates the lines to be printed for the file, and messages (as str). When
+    # no lines are printed, the number of matching lines is generated instead.
+    try:
+        file = open(file_path, "rb", buffering=BINARY_SNIFF_SIZE)
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        yield f"{file_path}: file does not exist"
+        return
+
+    if stats is not None:
+        stats.number_of_files += 1
+    with file:
+        if options.search_zip:
+            try:
+                file = open_decompressed(file, BINARY_SNIFF_SIZE)
+                # Peeking at the start decompresses it.
+                is_binary = options.binary_files != "text" and _is_binary(file)
+            except DecompressionError as error:
+                yield f"{file_path}: {error}"
+                return
+        else:
+            is_binary = options.binary_files != "text" and _is_binary(file)
+        if is_binary and options.binary_files == "skip":
+            return
+        # Binary files are only a problem when their lines are printed.
+        if (
+            is_binary
+            and options.binary_files == "binary"
+            and options.output_mode == "lines"
+        ):
+            yield f"{file_path}: file is binary"
+            return
+
+        errors = (
+            "replace"
+            if is_binary or options.binary_files in ("text", "match")
+            else "strict"
+        )
+        try:
+            if options.output_mode != "lines":
+                yield _count_matching_lines_in_file(
+                    options.matcher, file, errors, _get_max_count(options), stats
+                )
+            elif is_binary:
+                if (
+                    _count_matching_lines_in_file(
+                        options.matcher, file, errors, 1, stats
+                    )
+                    > 0
+                ):
+                    yield f"{file_path}: {BINARY_FILE_MATCHES_MESSAGE}"
+            else:
+                yield from _find_matching_lines_in_file(
+                    options.matcher,
+                    file,
+                    options.number_of_lines_before_match,
+                    options.number_of_lines_after_match,
+                    errors,
+                    _get_max_count(options),
+                    stats,
+                    options.find_intervals,
+                )
+        except UnicodeDecodeError:
+            # Invalid data after the part checked upfront.
+            if options.binary_files != "skip":
+                yield f"{file_path}: file is binary"
+        except DecompressionError as error:
+            yield f"{file_path}: {error}"
+
+
+# Options of the search run by a worker process, set once when it starts.
+_worker_options: _FileSearchOptions | None = None
+
+
+def _initialize_worker(options: _FileSearchOptions) -> None:
+    # The options, with the compiled matcher, can be large (e.g. thousands of
+    # patterns given with -f), so they are sent once per worker, not per file.
+    global _worker_options
+    _worker_options = options
+
+
+def _search_file_in_worker(
+    file_path: Path, collect_stats: bool
+) -> tuple[list[Line | str | int], Stats | None]:
+    stats = Stats() if collect_stats else None
+    return list(_search_file(file_path, _worker_options, stats)), stats
+
+
+def _search_files_in_parallel(
+    files: Iterable[str | Path],
+    options: _FileSearchOptions,
+    number_of_jobs: int,
+    preserve_file_order: bool,
+    stats: Stats | None = None,
+    cache: ResultCache | None = None,
+) -> Generator[tuple[Path, list[Line | str | int]], None, None]:
+    from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+    # Limit the number of files in flight, so results are streamed back while
+    # the files are still being listed.
+    max_pending_files = number_of_jobs * 4
+    pending: deque[tuple[Path, Future[tuple[list[Line | str | int], Stats | None]]]] = (
+        deque()
+    )
+    # Versions of the files searched by the workers, to cache their results.
+    file_versions: dict[
+        Future[tuple[list[Line | str | int], Stats | None]], FileVersion
+    ] = {}
+
+    def get_results(
+        file_path: Path,
+        future: Future[tuple[list[Line | str | int], Stats | None]],
+    ) -> list[Line | str | int]:
+        results, worker_stats = future.result()
+        if stats is not None and worker_stats is not None:
+            stats.merge(worker_stats)
+        file_version = file_versions.pop(future, None)
+        if file_version is not None:
+            cache.put(file_path, file_version, results)
+        return results
+
+    def pop_results(
+        block: bool,
+    ) -> Generator[tuple[Path, list[Line | str | int]], None, None]:
+        if preserve_file_order:
+            while len(pending) > 0 and (block or pending[0][1].done()):
+                file_path, future = pending.popleft()
+                yield file_path, get_results(file_path, future)
+                block = False
+        else:
+            if block:
+                wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+            for file_path, future in [item for item in pending if item[1].done()]:
+                pending.remove((file_path, future))
+                yield file_path, get_results(file_path, future)
+
+    with ProcessPoolExecutor(
+        max_workers=number_of_jobs,
+        initializer=_initialize_worker,
+        initargs=(options,),
+    ) as executor:
+        try:
+            for file in files:
+                file_path = Path(file)
+                file_version = (
+                    None if cache is None else cache.get_file_version(file_path)
+                )
+                cached_results = (
+                    None if file_version is None else cache.get(file_path, file_version)
+                )
+                if cached_results is not None:
+                    future = Future()
+                    future.set_result((cached_results, None))
+                else:
+                    future = executor.submit(
+                        _search_file_in_worker, file_path, stats is not None
+                    )
+                    if file_version is not None:
+                        file_versions[future] = file_version
+                pending.append((file_path, future))
+                yield from pop_results(block=len(pending) >= max_pending_files)
+
+            while len(pending) > 0:
+                yield from pop_results(block=True)
+        finally:
+            # Files which have not been searched yet are dropped if the caller
+            # stops early, e.g. after the first match in quiet mode.
+            executor.shutdown(cancel_futures=True)
+
+
+def _print_search_results(
+    printer: Printer, results: Iterable[Line | str | int], output_mode: OutputMode
+) -> bool:
+    # Returns True if any line matched.
+    has_match = False
+    for result in results:
+        if isinstance(result, str):
+            printer.print_message(result)
+            has_match = has_match or result.endswith(BINARY_FILE_MATCHES_MESSAGE)
+        elif isinstance(result, int):
+            has_match = has_match or result > 0
+            if output_mode == "count":
+                printer.print_count(result)
+            elif (output_mode == "files_with_matches" and result > 0) or (
+                output_mode == "files_without_match" and result == 0
+            ):
+                printer.print_file_name()
+        else:
+            printer.print_line(result)
+            has_match = has_match or result.is_match
+    return has_match
+
+
+def build_index(
+    directory: str, use_ignore_files: bool = True, number_of_walker_threads: int = 1
+) -> None:
+    """Build or update the trigram index of a directory, used to speed up searches.
+
+    Parameters
+    ----------
+    directory : Directory to index.
+    use_ignore_files : Indicates whether files listed in ignore files are skipped.
+    number_of_walker_threads : Number of threads used to list the directory.
+    """
+    directory_path = Path(directory)
+    if not directory_path.is_dir():
+        print(f"{directory}: directory does not exist or is not a directory")
+        return
+
+    index = TrigramIndex(str(directory_path))
+    try:
+        number_of_files, number_of_updated_files, number_of_removed_files = (
+            index.update(
+                _get_all_files_in_directory(
+                    directory_path, number_of_walker_threads, use_ignore_files
+                )
+            )
+        )
+    finally:
+        index.close()
+    print(
+        f"{directory}: {number_of_files} files in the index, "
+        f"{number_of_updated_files} indexed, {number_of_removed_files} removed"
+    )
+
+
+def _get_files_to_search(
+    files: list[str],
+    recursive: bool,
+    matcher: Matcher,
+    number_of_walker_threads: int,
+    use_ignore_files: bool,
+    use_index: bool,
+    search_zip: bool,
+    stats: Stats | None,
+    directory_listing_cache: DirectoryListingCache | None = None,
+) -> Iterable[str | Path] | str:
+    # Returns the files to search, or a message if they cannot be searched.
+    if not recursive:
+        return files
+    if len(files) > 1:
+        return "Only one directory can be searched in recursive mode!"
+    directory = files[0] if len(files) > 0 else "."
+    directory_path = Path(directory)
+    if not directory_path.is_dir():
+        return f"{directory}: directory does not exist or is not a directory"
+    if directory_listing_cache is not None:
+        files_to_search = directory_listing_cache.get_files(
+            directory_path, number_of_walker_threads, use_ignore_files
+        )
+    else:
+        files_to_search = _get_all_files_in_directory(
+            directory_path, number_of_walker_threads, use_ignore_files
+        )
+    if stats is not None:
+        files_to_search = stats.time_iterator("walker", files_to_search)
+    if use_index:
+        if not TrigramIndex.exists(str(directory_path)):
+            return (
+                f"{directory}: index does not exist, build it with: "
+                f"python -m src.main index build {directory}"
+            )
+        # The index stores the trigrams of the UTF-8 encoding of the files, as they
+        # are on disk, so not those of the decompressed data of compressed files.
+        if _IS_LOCALE_ENCODING_UTF8 and not search_zip:
+            index = TrigramIndex(str(directory_path))
+            try:
+                files_to_search = index.filter_candidate_files(
+                    files_to_search, matcher.required_literals
+                )
+            finally:
+                index.close()
+    return files_to_search
+
+
+def _get_cache_query(options: _FileSearchOptions) -> str:
+    # Everything which changes the results of a file, except the file itself.
+    return repr(
+        (
+            type(options.matcher).__name__,
+            options.matcher.pattern,
+            options.number_of_lines_before_match,
+            options.number_of_lines_after_match,
+            options.binary_files,
+            options.output_mode,
+            _get_max_count(options),
+            options.search_zip,
+            options.find_intervals,
+            _LOCALE_ENCODING,
+        )
+    )
+
+
+def _get_cached_results(
+    cache: ResultCache,
+    file_path: Path,
+    results: Generator[Line | str | int, None, None],
+) -> Iterable[Line | str | int]:
+    # The version is taken before searching the file, so a file modified during
+    # the search is searched again next time.
+    file_version = cache.get_file_version(file_path)
+    if file_version is None:
+        return results
+    cached_results = cache.get(file_path, file_version)
+    if cached_results is not None:
+        results.close()
+        return cached_results
+    return _cache_results(cache, file_path, file_version, results)
+
+
+def _cache_results(
+    cache: ResultCache,
+    file_path: Path,
+    file_version: FileVersion,
+    results: Iterable[Line | str | int],
+) -> Generator[Line | str | int, None, None]:
+    # Results are only cached once they have all been generated, not when the
+    # search of the file is stopped early.
+    all_results = []
+    for result in results:
+        all_results.append(result)
+        yield result
+    cache.put(file_path, file_version, all_results)
+
+
+def _search_files(
+    files: list[str],
+    options: _FileSearchOptions,
+    recursive: bool,
+    number_of_jobs: int = 1,
+    preserve_file_order: bool = True,
+    number_of_walker_threads: int = 1,
+    use_ignore_files: bool = True,
+    use_index: bool = False,
+    follow: bool = False,
+    number_of_files_read_ahead: int = READ_AHEAD_FILES,
+    stats: Stats | None = None,
+    cache_directory: str | None = None,
+    directory_listing_cache: DirectoryListingCache | None = None,
+) -> Generator[tuple[Path | None, Iterable[Line | str | int]], None, None]:
+    # Generates the path of each searched file with its results, as generated by
+    # _search_file. Standard input is searched if there are no files, with a path
+    # of None, like the messages which are not about a file. The results of files
+    # are cached in the cache directory, if given; standard input and followed
+    # files are never cached.
+    if follow:
+        if recursive or len(files) != 1:
+            yield None, ["Only one file can be followed!"]
+            return
+        if not Path(files[0]).is_file():
+            yield None, [f"{files[0]}: file does not exist"]
+            return
+
+    files_to_search = _get_files_to_search(
+        files,
+        recursive,
+        options.matcher,
+        number_of_walker_threads,
+        use_ignore_files,
+        use_index,
+        options.search_zip,
+        stats,
+        directory_listing_cache,
+    )
+    if isinstance(files_to_search, str):
+        yield None, [files_to_search]
+        return
+
+    if not follow and (recursive or len(files) > 0):
+        cache = None
+        if cache_directory is not None:
+            cache = ResultCache(cache_directory, _get_cache_query(options))
+        try:
+            if number_of_jobs > 1 and (recursive or len(files) > 1):
+                yield from _search_files_in_parallel(
+                    files_to_search,
+                    options,
+                    number_of_jobs,
+                    preserve_file_order,
+                    stats,
+                    cache,
+                )
+            else:
+                if number_of_files_read_ahead > 0 and (recursive or len(files) > 1):
+                    files_to_search = _read_files_ahead(
+                        files_to_search, number_of_files_read_ahead, READ_AHEAD_BYTES
+                    )
+                for file in files_to_search:
+                    file_path = Path(file)
+                    results = _search_file(file_path, options, stats)
+                    if cache is not None:
+                        results = _get_cached_results(cache, file_path, results)
+                    yield file_path, results
+        finally:
+            if cache is not None:
+                cache.close()
+
+    else:
+        if follow:
+            file_path = Path(files[0])
+            lines = follow_lines(files[0], _LOCALE_ENCODING)
+        else:
+            file_path = None
+            lines = sys.stdin
+            try:
+                lines.reconfigure(newline=_NEWLINE)
+            except (AttributeError, io.UnsupportedOperation):
+                # Not a text file, e.g. replaced by a StringIO, or already read
+                # from, e.g. for the patterns given with -f -.
+                pass
+        if stats is not None:
+            lines = stats.time_iterator("reader", _count_read_data(stats, lines, None))
+        if options.output_mode == "lines":
+            results = find_matching_lines(
+                options.matcher,
+                lines,
+                options.number_of_lines_before_match,
+                options.number_of_lines_after_match,
+                max_count=_get_max_count(options),
+                find_intervals=options.find_intervals,
+            )
+            if stats is not None:
+                results = stats.time_iterator(
+                    "matcher", _count_found_matching_lines(stats, results)
+                )
+        else:
+            results = [
+                count_matching_lines(
+                    options.matcher, lines, max_count=_get_max_count(options)
+                )
+            ]
+        yield file_path, results
 
 
 def grep(
-    pattern: str,
+    pattern: str | list[str],
     files: list[str],
     recursive: bool,
     print_line_number: bool,
     number_of_lines_before_match: int,
     number_of_lines_after_match: int,
-) -> None:
-    printer = Printer(print_line_number=print_line_number)
+    number_of_jobs: int = 1,
+    preserve_file_order: bool = True,
+    number_of_walker_threads: int = 1,
+    use_ignore_files: bool = True,
+    binary_files: BinaryFilesMode = "binary",
+    use_index: bool = False,
+    line_buffered: bool | None = None,
+    color: ColorMode = "always",
+    output_mode: OutputMode = "lines",
+    max_count: int | None = None,
+    stats: Stats | None = None,
+    follow: bool = False,
+    search_zip: bool = False,
+    number_of_files_read_ahead: int = READ_AHEAD_FILES,
+    print_json: bool = False,
+    cache_directory: str | None = None,
+    directory_listing_cache: DirectoryListingCache | None = None,
+) -> bool:
+    # Lines found while following a file are printed as soon as they are found.
+    if follow:
+        line_buffered = True
+    matcher = create_matcher(pattern)
+    printer: Printer
+    if print_json:
+        # Only matching lines and context lines are printed as JSON.
+        output_mode = "lines"
+        printer = JsonPrinter(line_buffered=line_buffered)
+    else:
+        # Matches are highlighted by the matcher, only in the printed lines.
+        printer = Printer(
+            print_line_number=print_line_number,
+            line_buffered=line_buffered,
+            color=color == "always" or (color == "auto" and sys.stdout.isatty()),
+            matcher=matcher,
+        )
+    # Everything which is not attributed to another stage is printing.
+    if stats is not None:
+        stats.start("printer")
+    try:
+        options = _FileSearchOptions(
+            matcher=matcher,
+            number_of_lines_before_match=number_of_lines_before_match,
+            number_of_lines_after_match=number_of_lines_after_match,
+            binary_files=binary_files,
+            output_mode=output_mode,
+            max_count=max_count,
+            search_zip=search_zip,
+            find_intervals=print_json,
+        )
+        # File names are printed if they are the output, or to tell files apart.
+        # No need to set file if there is only one file to be searched.
+        is_file_set = (
+            recursive
+            or len(files) > 1
+            or output_mode in ("files_with_matches", "files_without_match")
+            or print_json
+        )
 
-    if recursive:
-        if len(files) > 1:
-            printer.print_message(
-                "Only one directory can be searched in recursive mode!"
+        has_match = False
+        # Closed explicitly, so the cache is saved when stopping early.
+        with closing(
+            _search_files(
+                files,
+                options,
+                recursive,
+                number_of_jobs,
+                preserve_file_order,
+                number_of_walker_threads,
+                use_ignore_files,
+                use_index,
+                follow,
+                number_of_files_read_ahead,
+                stats,
+                cache_directory,
+                directory_listing_cache,
             )
-            return
-        directory = files[0] if len(files) > 0 else "."
-        directory_path = Path(directory)
-        if not directory_path.is_dir():
-            printer.print_message(
-                f"{directory}: directory does not exist or is not a directory"
+        ) as search_results:
+            for file_path, results in search_results:
+                if is_file_set:
+                    printer.set_file(
+                        Path("(standard input)") if file_path is None else file_path
+                    )
+                if _print_search_results(printer, results, output_mode):
+                    has_match = True
+                    if output_mode == "quiet":
+                        break
+        if isinstance(printer, JsonPrinter):
+            printer.print_summary()
+        return has_match
+    finally:
+        printer.flush()
+        if stats is not None:
+            stats.stop()
+
+
+@dataclass(frozen=True)
+class SearchOptions:
+    """Options of a search with search or agrep.
+
+    Attributes
+    ----------
+    recursive : Whether to search all the files in the directory given as the
+        only path.
+    number_of_lines_before_match : Number of context lines before each match.
+    number_of_lines_after_match : Number of context lines after each match.
+    binary_files : How binary files are handled.
+    max_count : Maximum number of matching lines of each file.
+    use_ignore_files : Whether to skip the files listed in ignore files.
+    use_index : Whether to only search the files which may match according to the
+        trigram index of the directory. All the files are searched with search_zip,
+        as the index does not have the trigrams of the decompressed data.
+    search_zip : Whether to search the decompressed data of compressed files.
+    number_of_jobs : Number of processes searching files in parallel.
+    number_of_walker_threads : Number of threads listing directories.
+    number_of_files_read_ahead : Number of files read ahead of the one being
+        searched. agrep searches this many files at once.
+    cache_directory : Directory of the cache of the results of files, so unchanged
+        files are not searched again, or None to not cache results. Not used by
+        agrep.
+    """
+
+    recursive: bool = False
+    number_of_lines_before_match: int = 0
+    number_of_lines_after_match: int = 0
+    binary_files: BinaryFilesMode = "binary"
+    max_count: int | None = None
+    use_ignore_files: bool = True
+    use_index: bool = False
+    search_zip: bool = False
+    number_of_jobs: int = 1
+    number_of_walker_threads: int = 1
+    number_of_files_read_ahead: int = READ_AHEAD_FILES
+    cache_directory: str | None = None
+
+
+@dataclass(slots=True)
+class Match:
+    """A line found by search or agrep: a matching line or a context line.
+
+    Attributes
+    ----------
+    path : Path of the file, or None for standard input.
+    line_number : Number of the line in the file, starting at 1.
+    byte_offset : Byte offset of the start of the line in the file, if the file was
+        searched as bytes (with a UTF-8 locale, for most patterns), otherwise None.
+    text : Text of the line, without the line terminator.
+    matching_intervals : Intervals of the line matching the patterns, empty for
+        context lines.
+    has_only_empty_matches : Indicates whether the line matches, but only with
+        empty matches (e.g. an empty line for ^$), so it has no matching intervals.
+    """
+
+    path: Path | None
+    line_number: int
+    byte_offset: int | None
+    text: str
+    matching_intervals: list[Interval]
+    has_only_empty_matches: bool = False
+
+    @property
+    def is_context(self) -> bool:
+        """Whether the line is a context line before or after a matching line."""
+        return len(self.matching_intervals) == 0 and not self.has_only_empty_matches
+
+
+@dataclass(slots=True)
+class Message:
+    """A message of search or agrep, e.g. for a file which is binary or missing.
+
+    Attributes
+    ----------
+    path : Path of the file, or None if the message is not about a file.
+    text : Text of the message, including the path of the file.
+    """
+
+    path: Path | None
+    text: str
+
+
+def _get_search_results(
+    file_path: Path | None, results: Iterable[Line | str]
+) -> Generator[Match | Message, None, None]:
+    for result in results:
+        if isinstance(result, str):
+            yield Message(file_path, result)
+        else:
+            yield Match(
+                file_path,
+                result.index + 1,
+                result.offset,
+                result.text,
+                result.matching_intervals,
+                result.has_only_empty_matches,
             )
+
+
+def _get_file_search_options(
+    pattern: str | list[str], options: SearchOptions
+) -> _FileSearchOptions:
+    return _FileSearchOptions(
+        matcher=create_matcher(pattern),
+        number_of_lines_before_match=options.number_of_lines_before_match,
+        number_of_lines_after_match=options.number_of_lines_after_match,
+        binary_files=options.binary_files,
+        max_count=options.max_count,
+        search_zip=options.search_zip,
+    )
+
+
+def search(
+    pattern: str | list[str],
+    paths: list[str | Path],
+    options: SearchOptions = SearchOptions(),
+) -> Generator[Match | Message, None, None]:
+    """Search files and generate the results instead of printing them.
+
+    This is the search done by grep, with the same handling of files, but the
+    results are generated as objects instead of being printed, so the search can
+    be embedded in a program.
+
+    Parameters
+    ----------
+    pattern : Pattern to search for, or list of patterns to search for any of.
+    paths : Files to search, or the directory to search in recursive mode.
+        Standard input is searched if there are no paths.
+    options : Options of the search.
+
+    Returns
+    -------
+    Generator of the matching and context lines of each file, in the order of the
+    files, and of messages, e.g. if a file does not exist or is binary.
+    """
+    file_search_options = _get_file_search_options(pattern, options)
+    for file_path, results in _search_files(
+        [str(path) for path in paths],
+        file_search_options,
+        options.recursive,
+        number_of_jobs=options.number_of_jobs,
+        number_of_walker_threads=options.number_of_walker_threads,
+        use_ignore_files=options.use_ignore_files,
+        use_index=options.use_index,
+        number_of_files_read_ahead=options.number_of_files_read_ahead,
+        cache_directory=options.cache_directory,
+    ):
+        yield from _get_search_results(file_path, results)
+
+
+async def agrep(
+    pattern: str | list[str],
+    paths: list[str | Path],
+    options: SearchOptions = SearchOptions(),
+) -> AsyncGenerator[Match | Message, None]:
+    """Search files like search, without blocking the event loop.
+
+    The directory is listed and the files are searched in threads, with up to
+    options.number_of_files_read_ahead files searched ahead of the results being
+    consumed. The results are generated in the order of the files.
+
+    Parameters
+    ----------
+    pattern : Pattern to search for, or list of patterns to search for any of.
+    paths : Files to search, or the directory to search in recursive mode.
+    options : Options of the search. The files are not searched in processes.
+
+    Returns
+    -------
+    Async generator of the matching and context lines of each file, in the order of
+    the files, and of messages, e.g. if a file does not exist or is binary.
+    """
+    import asyncio
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    file_search_options = _get_file_search_options(pattern, options)
+    loop = asyncio.get_running_loop()
+    number_of_files_searched_at_once = max(options.number_of_files_read_ahead, 1)
+    files_iterator: Iterator[str | Path] = iter([])
+    listing: Future[str | Path | None] | None = None
+    pending: deque[tuple[Path, asyncio.Future[list[Line | str]]]] = deque()
+    # One more thread lists the files while the others search them.
+    executor = ThreadPoolExecutor(max_workers=number_of_files_searched_at_once + 1)
+    try:
+        # Like listing the files, querying the index would block the event loop.
+        files = await loop.run_in_executor(
+            executor,
+            _get_files_to_search,
+            [str(path) for path in paths],
+            options.recursive,
+            file_search_options.matcher,
+            options.number_of_walker_threads,
+            options.use_ignore_files,
+            options.use_index,
+            options.search_zip,
+            None,
+        )
+        if isinstance(files, str):
+            yield Message(None, files)
             return
-        files = _get_all_files_in_directory(directory_path)
 
-    if recursive or len(files) > 0:
-        for file in files:
+        files_iterator = iter(files)
+        while True:
+            listing = executor.submit(next, files_iterator, None)
+            file = await asyncio.wrap_future(listing)
+            if file is None:
+                break
             file_path = Path(file)
-            # No need to set file if there is only one file to be searched.
-            if recursive or len(files) > 1:
-                printer.set_file(file_path)
-            if not file_path.is_file():
-                printer.print_message(f"{file_path}: file does not exist")
-                continue
-
-            line_iterator = _read_file_by_line(file_path)
-            matching_lines_iterator = find_matching_lines(
-                pattern,
-                line_iterator,
-                number_of_lines_before_match,
-                number_of_lines_after_match,
+            future = loop.run_in_executor(
+                executor, list, _search_file(file_path, file_search_options)
             )
-            try:
-                for line in matching_lines_iterator:
-                    printer.print_line(line)
-            except UnicodeDecodeError:
-                printer.print_message(f"{file_path}: file is binary")
+            pending.append((file_path, future))
+            if len(pending) >= number_of_files_searched_at_once:
+                file_path, future = pending.popleft()
+                for result in _get_search_results(file_path, await future):
+                    yield result
 
-    else:
-        matching_lines_iterator = find_matching_lines(
-            pattern,
-            sys.stdin,
-            number_of_lines_before_match,
-            number_of_lines_after_match,
-        )
-        for line in matching_lines_iterator:
-            printer.print_line(line)
+        while len(pending) > 0:
+            file_path, future = pending.popleft()
+            for result in _get_search_results(file_path, await future):
+                yield result
+    finally:
+        for _, future in pending:
+            future.cancel()
+        # The files are listed by a generator, e.g. walking the directory with
+        # threads, which is closed once it is not running in a thread anymore.
+        if isinstance(files_iterator, Generator):
+            close_files_iterator = files_iterator.close
+            if listing is None:
+                close_files_iterator()
+            else:
+                listing.add_done_callback(lambda _: close_files_iterator())
+        # Waiting for the threads would block the event loop, files which are
+        # being searched when the caller stops early are searched to the end.
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,210 @@
+import os
+import re
+from collections.abc import Iterable
+
+from src.index import INDEX_FILE_NAME
+
+# Rules from later files take precedence over rules from earlier ones.
+IGNORE_FILE_NAMES = (".gitignore", ".ignore", ".grepignore")
+ALWAYS_IGNORED_DIRECTORY_NAMES = frozenset({".git"})
+ALWAYS_IGNORED_FILE_NAMES = frozenset({INDEX_FILE_NAME, f"{INDEX_FILE_NAME}-journal"})
+
+
+def _translate_glob(glob: str) -> str:
+    result = []
+    i = 0
+    while i < len(glob):
+        character = glob[i]
+        if character == "*":
+            is_segment_start = i == 0 or glob[i - 1] == "/"
+            if glob.startswith("**", i) and is_segment_start:
+                if i + 2 == len(glob):
+                    # A trailing "**" matches everything inside.
+                    result.append(".*")
+                    i += 2
+                    continue
+                if glob[i + 2] == "/":
+                    # "**/" matches zero or more directories.
+                    result.append("(?:.*/)?")
+                    i += 3
+                    continue
+            result.append("[^/]*")
+        elif character == "?":
+            result.append("[^/]")
+        elif character == "[":
+            end = i + 1
+            if end < len(glob) and glob[end] in "!^":
+                end += 1
+            if end < len(glob) and glob[end] == "]":
+                end += 1
+            end = glob.find("]", end)
+            if end == -1:
+                result.append(re.escape(character))
+            else:
+                content = glob[i + 1 : end]
+                is_negated = content[0] in "!^"
+                if is_negated:
+                    content = content[1:]
+                escaped_content = "".join(
+                    c if c == "-" else re.escape(c) for c in content
+                )
+                result.append(f"[{'^' if is_negated else ''}{escaped_content}]")
+                i = end
+        elif character == "\\" and i + 1 < len(glob):
+            i += 1
+            result.append(re.escape(glob[i]))
+        else:
+            result.append(re.escape(character))
+        i += 1
+    return "".join(result)
+
+
+def _parse_rule(line: str) -> tuple[str, bool, bool] | None:
+    # Returns the regex for the path relative to the ignore file, whether the
+    # rule is negated and whether the rule only applies to directories.
+    line = line.rstrip("\r\n")
+    stripped_line = line.rstrip(" ")
+    # Trailing spaces are ignored unless escaped with a backslash.
+    if stripped_line.endswith("\\") and len(stripped_line) < len(line):
+        stripped_line += " "
+    line = stripped_line
+    if line == "" or line.startswith("#"):
+        return None
+
+    is_negated = line.startswith("!")
+    if is_negated:
+        line = line[1:]
+    is_directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if line == "":
+        return None
+
+    # A rule with a slash in the beginning or middle is relative to the
+    # directory of the ignore file, otherwise it matches at any depth.
+    is_anchored = "/" in line
+    regex = _translate_glob(line.lstrip("/"))
+    if not is_anchored:
+        regex = "(?:.*/)?" + regex
+    return regex, is_negated, is_directory_only
+
+
+def _compile_rules(
+    rules: list[tuple[str, bool, bool]],
+) -> tuple[re.Pattern[str] | None, list[bool]]:
+    # All rules are compiled into a single regex. The rules are added in reverse
+    # order, so the first matching alternative is the last rule in the file,
+    # which is the one that takes precedence.
+    if len(rules) == 0:
+        return None, []
+    alternatives = [
+        f"(?P<r{i}>{regex})" for i, (regex, _, _) in reversed(list(enumerate(rules)))
+    ]
+    return re.compile("|".join(alternatives)), [
+        is_negated for _, is_negated, _ in rules
+    ]
+
+
+class IgnoreRules:
+    """Rules of the ignore files in a directory, in the .gitignore format.
+
+    Rules of a directory take precedence over the rules of its parent directories.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        rules: list[tuple[str, bool, bool]],
+        parent: "IgnoreRules | None",
+    ) -> None:
+        """Create a new IgnoreRules instance.
+
+        Parameters
+        ----------
+        directory : Directory containing the ignore files.
+        rules : Parsed rules, in the order in which they appear in the ignore files.
+        parent : Ignore rules of the parent directories.
+        """
+        self.directory: str = directory
+        self.parent: IgnoreRules | None = parent
+        self._prefix_length: int = len(os.path.join(directory, ""))
+        self._file_regex, self._file_rule_negations = _compile_rules(
+            [rule for rule in rules if not rule[2]]
+        )
+        self._directory_regex, self._directory_rule_negations = _compile_rules(rules)
+
+    def _match(self, path: str, is_directory: bool) -> bool | None:
+        if is_directory:
+            regex, rule_negations = (
+                self._directory_regex,
+                self._directory_rule_negations,
+            )
+        else:
+            regex, rule_negations = self._file_regex, self._file_rule_negations
+        if regex is None:
+            return None
+
+        relative_path = path[self._prefix_length :]
+        if os.sep != "/":
+            relative_path = relative_path.replace(os.sep, "/")
+        match = regex.fullmatch(relative_path)
+        if match is None:
+            return None
+        return not rule_negations[int(match.lastgroup[1:])]
+
+    def is_ignored(self, path: str, is_directory: bool) -> bool:
+        """Check whether the given path is ignored.
+
+        Parameters
+        ----------
+        path : Path inside the directory of the rules, as listed by os.scandir.
+        is_directory : Indicates whether the path is a directory.
+
+        Returns
+        -------
+        True if the path is ignored.
+        """
+        rules = self
+        while rules is not None:
+            is_ignored = rules._match(path, is_directory)
+            if is_ignored is not None:
+                return is_ignored
+            rules = rules.parent
+        return False
+
+
+def load_ignore_rules(
+    directory: str, file_names: Iterable[str], parent: IgnoreRules | None
+) -> IgnoreRules | None:
+    """Load the rules of the ignore files in a directory.
+
+    Parameters
+    ----------
+    directory : Directory to load the rules for.
+    file_names : Names of the files in the directory. Only the ignore files among
+        them are read, so no extra system calls are needed for the other directories.
+    parent : Ignore rules of the parent directories.
+
+    Returns
+    -------
+    Ignore rules for the directory, or the rules of the parent directories if the
+    directory does not contain any rules.
+    """
+    file_names = set(file_names)
+    rules = []
+    for file_name in IGNORE_FILE_NAMES:
+        if file_name not in file_names:
+            continue
+        try:
+            with open(
+                os.path.join(directory, file_name), encoding="utf-8", errors="replace"
+            ) as file:
+                for line in file:
+                    rule = _parse_rule(line)
+                    if rule is not None:
+                        rules.append(rule)
+        except OSError:
+            continue
+
+    if len(rules) == 0:
+        return parent
+    return IgnoreRules(directory, rules, parent)
@@ -0,0 +1,251 @@
+import os
+from collections.abc import Generator, Iterable
+from pathlib import Path
+
+INDEX_FILE_NAME = ".grepindex"
+# Bigger files are not indexed, so they are always searched.
+MAX_INDEXED_FILE_SIZE = 64 * 1024 * 1024
+# Files with a NUL byte in the beginning are binary and are not indexed.
+BINARY_SNIFF_SIZE = 32 * 1024
+
+
+def get_trigrams(literals: Iterable[str]) -> set[bytes]:
+    """Get the trigrams of the UTF-8 encoding of the given literals.
+
+    Parameters
+    ----------
+    literals : Literals to get the trigrams of.
+
+    Returns
+    -------
+    Set of all trigrams of the literals.
+    """
+    trigrams = set()
+    for literal in literals:
+        try:
+            data = literal.encode("utf-8")
+        except UnicodeEncodeError:
+            continue
+        trigrams.update(data[i : i + 3] for i in range(len(data) - 2))
+    return trigrams
+
+
+def _get_file_trigrams(path: str, size: int) -> set[bytes] | None:
+    # Returns None if the file cannot be indexed.
+    if size > MAX_INDEXED_FILE_SIZE:
+        return None
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    if b"\0" in data[:BINARY_SNIFF_SIZE]:
+        return None
+    return {data[i : i + 3] for i in range(len(data) - 2)}
+
+
+class TrigramIndex:
+    """An on-disk index of the trigrams contained in the files of a directory.
+
+    The index maps trigrams to the files containing them, so the files which may
+    contain a set of literals can be found without reading them. Files are
+    identified by their path relative to the directory, and re-indexed only when
+    their size or modification time changes.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Open the index of a directory, creating it if it does not exist.
+
+        Parameters
+        ----------
+        directory : Directory whose files are indexed. The index is stored in it.
+        """
+        import sqlite3
+
+        self.directory: str = directory
+        self._prefix_length: int = len(os.path.join(directory, ""))
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            Path(directory) / INDEX_FILE_NAME
+        )
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, "
+                "path TEXT UNIQUE NOT NULL, size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, is_indexed INTEGER NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS trigrams (trigram BLOB NOT NULL, "
+                "file_id INTEGER NOT NULL, PRIMARY KEY (trigram, file_id)) "
+                "WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS trigrams_file_id ON trigrams (file_id)"
+            )
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """Check whether the directory has an index.
+
+        Parameters
+        ----------
+        directory : Directory to check.
+
+        Returns
+        -------
+        True if the index exists.
+        """
+        return (Path(directory) / INDEX_FILE_NAME).is_file()
+
+    def close(self) -> None:
+        """Close the index."""
+        self._connection.close()
+
+    def _get_relative_path(self, path: str) -> str:
+        return path[self._prefix_length :]
+
+    def _get_file_records(self) -> dict[str, tuple[int, int, int, bool]]:
+        return {
+            path: (file_id, size, mtime_ns, bool(is_indexed))
+            for file_id, path, size, mtime_ns, is_indexed in self._connection.execute(
+                "SELECT id, path, size, mtime_ns, is_indexed FROM files"
+            )
+        }
+
+    def update(self, files: Iterable[str]) -> tuple[int, int, int]:
+        """Update the index with the current content of the directory.
+
+        Only new and modified files are read; files which no longer exist are
+        removed from the index.
+
+        Parameters
+        ----------
+        files : Paths of all files in the directory (starting with the directory).
+
+        Returns
+        -------
+        Number of files in the index, number of files (re-)indexed and number of
+        files removed.
+        """
+        file_records = self._get_file_records()
+        seen_paths = set()
+        number_of_updated_files = 0
+
+        with self._connection:
+            for file in files:
+                path = self._get_relative_path(file)
+                if path == INDEX_FILE_NAME:
+                    continue
+                try:
+                    file_stat = os.stat(file)
+                except OSError:
+                    continue
+                seen_paths.add(path)
+
+                file_record = file_records.get(path)
+                if file_record is not None and file_record[1:3] == (
+                    file_stat.st_size,
+                    file_stat.st_mtime_ns,
+                ):
+                    continue
+
+                trigrams = _get_file_trigrams(file, file_stat.st_size)
+                values = (
+                    file_stat.st_size,
+                    file_stat.st_mtime_ns,
+                    trigrams is not None,
+                )
+                if file_record is None:
+                    file_id = self._connection.execute(
+                        "INSERT INTO files (size, mtime_ns, is_indexed, path) "
+                        "VALUES (?, ?, ?, ?)",
+                        (*values, path),
+                    ).lastrowid
+                else:
+                    file_id = file_record[0]
+                    self._connection.execute(
+                        "UPDATE files SET size = ?, mtime_ns = ?, is_indexed = ? "
+                        "WHERE id = ?",
+                        (*values, file_id),
+                    )
+                    self._connection.execute(
+                        "DELETE FROM trigrams WHERE file_id = ?", (file_id,)
+                    )
+                if trigrams is not None:
+                    self._connection.executemany(
+                        "INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)",
+                        ((trigram, file_id) for trigram in trigrams),
+                    )
+                number_of_updated_files += 1
+
+            removed_paths = file_records.keys() - seen_paths
+            for path in removed_paths:
+                file_id = file_records[path][0]
+                self._connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                self._connection.execute(
+                    "DELETE FROM trigrams WHERE file_id = ?", (file_id,)
+                )
+
+        return len(seen_paths), number_of_updated_files, len(removed_paths)
+
+    def _get_file_ids_with_trigrams(self, trigrams: set[bytes]) -> set[int]:
+        file_ids = None
+        for trigram in trigrams:
+            trigram_file_ids = {
+                file_id
+                for (file_id,) in self._connection.execute(
+                    "SELECT file_id FROM trigrams WHERE trigram = ?", (trigram,)
+                )
+            }
+            file_ids = (
+                trigram_file_ids if file_ids is None else file_ids & trigram_file_ids
+            )
+            if len(file_ids) == 0:
+                break
+        return file_ids
+
+    def filter_candidate_files(
+        self, files: Iterable[str], literals: list[str]
+    ) -> Iterable[str]:
+        """Filter out the files which cannot contain all the given literals.
+
+        Files which are not in the index, cannot be indexed or have changed since
+        they were indexed are always candidates, so no matches are lost when the
+        index is out of date. The index is queried upfront, so it can be closed
+        before the returned files are consumed.
+
+        Parameters
+        ----------
+        files : Paths of files in the directory (starting with the directory).
+        literals : Literals which every matching line contains.
+
+        Returns
+        -------
+        Iterable of the candidate files.
+        """
+        trigrams = get_trigrams(literals)
+        if len(trigrams) == 0:
+            return files
+        return self._filter_candidate_files(
+            files, self._get_file_records(), self._get_file_ids_with_trigrams(trigrams)
+        )
+
+    def _filter_candidate_files(
+        self,
+        files: Iterable[str],
+        file_records: dict[str, tuple[int, int, int, bool]],
+        candidate_file_ids: set[int],
+    ) -> Generator[str, None, None]:
+        for file in files:
+            file_record = file_records.get(self._get_relative_path(file))
+            if file_record is None:
+                yield file
+                continue
+            file_id, size, mtime_ns, is_indexed = file_record
+            if is_indexed and file_id not in candidate_file_ids:
+                try:
+                    file_stat = os.stat(file)
+                except OSError:
+                    continue
+                if (file_stat.st_size, file_stat.st_mtime_ns) == (size, mtime_ns):
+                    continue
+            yield file
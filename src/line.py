@@ -1,7 +1,13 @@
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
 
+# Validating every Interval and Line is too slow for the hot path, so it is only
+# enabled when the GREP_VALIDATE_LINES environment variable is set to 1 before
+# this module is imported, like in the tests.
+IS_VALIDATION_ENABLED = os.environ.get("GREP_VALIDATE_LINES") == "1"
 
-@dataclass
+
+@dataclass(slots=True)
 class Interval:
     """An interval indicated by start and end indices.
 
@@ -9,19 +15,23 @@ class Interval:
     ----------
     start : Start index (inclusive).
     end : End index (exclusive).
+    pattern_index : Index of the pattern that matched, when searching for several.
     """
 
     start: int
     end: int
+    pattern_index: int = 0
+
+    if IS_VALIDATION_ENABLED:
 
-    def __post_init__(self):
-        if self.start >= self.end:
-            raise ValueError("Start index must be before end index!")
-        if self.start < 0:
-            raise ValueError("Start index must be non-negative!")
+        def __post_init__(self):
+            if self.start >= self.end:
+                raise ValueError("Start index must be before end index!")
+            if self.start < 0:
+                raise ValueError("Start index must be non-negative!")
 
 
-@dataclass
+@dataclass(slots=True)
 class Line:
     """A line of text.
 
@@ -30,15 +40,31 @@ class Line:
     text : Text of the line.
     matching_intervals : List of intervals in the line that match the given pattern.
     index : Index of the line in the file or input stream.
+    offset : Byte offset of the start of the line in the file, if the file was
+        searched as bytes. It is not compared, so lines found by the different
+        search functions are equal.
+    has_only_empty_matches : Indicates whether the line matches, but only with
+        empty matches (e.g. an empty line for ^$), so it has no matching intervals.
     """
 
     text: str
     matching_intervals: list[Interval]
     index: int
+    offset: int | None = field(default=None, compare=False)
+    has_only_empty_matches: bool = False
+
+    @property
+    def is_match(self) -> bool:
+        """Whether the line matches, rather than being a context line."""
+        return len(self.matching_intervals) > 0 or self.has_only_empty_matches
+
+    if IS_VALIDATION_ENABLED:
 
-    def __post_init__(self):
-        for interval in self.matching_intervals:
-            if interval.end > len(self.text):
-                raise ValueError("Interval index is out of bounds!")
-        if self.index < 0:
-            raise ValueError("Index must be non-negative!")
+        def __post_init__(self):
+            for interval in self.matching_intervals:
+                if interval.end > len(self.text):
+                    raise ValueError("Interval index is out of bounds!")
+            if self.index < 0:
+                raise ValueError("Index must be non-negative!")
+            if self.offset is not None and self.offset < 0:
+                raise ValueError("Offset must be non-negative!")
@@ -1,15 +1,33 @@
-import argparse
+from __future__ import annotations
 
-from src.grep import grep
+import sys
+from typing import TYPE_CHECKING
 
+# Modules are only imported when they are needed, so forwarding a search to the
+# daemon does not even import argparse, and --help and usage errors do not import
+# the modules doing the search. For the same reason, slow modules which only some
+# searches need, like asyncio, concurrent.futures, sqlite3 and ctypes, are
+# imported where they are used throughout src.
+if TYPE_CHECKING:
+    import argparse
 
-def parse_arguments() -> argparse.Namespace:
+    from src.grep import DirectoryListingCache
+
+
+def parse_arguments(arguments: list[str] | None = None) -> argparse.Namespace:
     """Parse command line arguments.
 
+    Parameters
+    ----------
+    arguments : Command line arguments, without the program name. By default, the
+        arguments of the program.
+
     Returns
     -------
     Parsed command line arguments.
     """
+    import argparse
+
     parser = argparse.ArgumentParser(
         description="Search for PATTERN in each FILE.\n\n"
         "Example: python -m src.main test test_data/test  -A 2 -B 0 -n",
@@ -18,7 +36,11 @@ def parse_arguments() -> argparse.Namespace:
     )
 
     # Positional arguments
-    parser.add_argument("pattern", help="pattern to search")
+    parser.add_argument(
+        "pattern",
+        nargs="?",
+        help="pattern to search (taken as the first FILE when -e or -f is given)",
+    )
     parser.add_argument(
         "file",
         nargs="*",
@@ -27,15 +49,79 @@ def parse_arguments() -> argparse.Namespace:
     )
 
     # Options
+    parser.add_argument(
+        "-e",
+        "--regexp",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="pattern to search (can be given multiple times to search for any of\n"
+        "the patterns)",
+    )
+    parser.add_argument(
+        "-f",
+        "--file-patterns",
+        action="append",
+        default=[],
+        metavar="FILE",
+        help="search for the patterns listed in FILE, one per line",
+    )
     parser.add_argument(
         "-r", "--recursive", action="store_true", help="search recursively"
     )
+    parser.add_argument(
+        "--no-ignore",
+        action="store_true",
+        help="when searching recursively, do not skip files and directories listed in\n"
+        ".gitignore, .ignore and .grepignore files, and do not skip .git directories",
+    )
     parser.add_argument(
         "-n",
         "--line-number",
         action="store_true",
         help="print line number with output lines",
     )
+    parser.add_argument(
+        "-c",
+        "--count",
+        dest="output_mode",
+        action="store_const",
+        const="count",
+        default="lines",
+        help="print only the number of matching lines of each file",
+    )
+    parser.add_argument(
+        "-l",
+        "--files-with-matches",
+        dest="output_mode",
+        action="store_const",
+        const="files_with_matches",
+        help="print only the names of files with matching lines",
+    )
+    parser.add_argument(
+        "-L",
+        "--files-without-match",
+        dest="output_mode",
+        action="store_const",
+        const="files_without_match",
+        help="print only the names of files without matching lines",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        dest="output_mode",
+        action="store_const",
+        const="quiet",
+        help="print nothing, exit with status 0 as soon as a match is found",
+    )
+    parser.add_argument(
+        "-m",
+        "--max-count",
+        type=int,
+        default=None,
+        metavar="NUM",
+        help="stop searching a file after NUM matching lines",
+    )
     parser.add_argument(
         "-B",
         "--before-context",
@@ -52,17 +138,335 @@ def parse_arguments() -> argparse.Namespace:
         metavar="NUM",
         help="print NUM lines of trailing context",
     )
+    parser.add_argument(
+        "--binary-files",
+        choices=["binary", "skip", "text", "match"],
+        default="binary",
+        metavar="TYPE",
+        help="how to handle binary files; TYPE is one of:\n"
+        "  binary - report the file as binary without searching it (default)\n"
+        "  skip   - silently skip the file\n"
+        "  text   - search the file as if it was text\n"
+        "  match  - report the file as binary only if it matches",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="NUM",
+        help="search NUM files in parallel",
+    )
+    parser.add_argument(
+        "--read-ahead",
+        type=int,
+        metavar="NUM",
+        help="when searching files one at a time, open and read NUM files ahead of\n"
+        "the one being searched (default: 8, 0 to disable)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="cache the results of each file in DIR, and print the cached results of\n"
+        "the files which have not changed since instead of searching them again",
+    )
+    parser.add_argument(
+        "--walker-threads",
+        type=int,
+        default=1,
+        metavar="NUM",
+        help="list directories with NUM threads when searching recursively\n"
+        "(the order of the files is not deterministic with more than one thread)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="when searching files in parallel, print the results of each file as soon as\n"
+        "it has been searched instead of in the order of the files",
+    )
+    parser.add_argument(
+        "--color",
+        choices=["auto", "always", "never"],
+        default="auto",
+        metavar="WHEN",
+        help="when to color the output; WHEN is one of:\n"
+        "  auto   - only when writing to a terminal (default)\n"
+        "  always - always\n"
+        "  never  - never",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print the matching and context lines as JSON objects, one per line,\n"
+        "between begin and end objects for each file, and a summary object at the end",
+    )
+    parser.add_argument(
+        "-z",
+        "--search-zip",
+        action="store_true",
+        help="search the decompressed data of gzip, bzip2, xz and zstd compressed\n"
+        "files (zstd requires the zstandard package)",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="keep searching the lines appended to FILE until interrupted, like tail -F\n"
+        "(the file is read again when it is truncated or rotated, and line numbers\n"
+        "keep counting the lines read since the start)",
+    )
+    parser.add_argument(
+        "--line-buffered",
+        action="store_true",
+        default=None,
+        help="write the output after every line (by default, the output is buffered\n"
+        "unless it is written to a terminal)",
+    )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="search in this process even if the daemon is running (see:\n"
+        "python -m src.main daemon start --help)",
+    )
+    parser.add_argument(
+        "--use-index",
+        action="store_true",
+        help="when searching recursively, only search the files which may match\n"
+        "according to the index built with: python -m src.main index build DIR",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print the number of files, bytes, lines and matching lines searched and\n"
+        "the time spent listing directories, reading, matching and printing to\n"
+        "standard error (with -j, the times of all the processes are added up)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="profile the search with cProfile and save the profile to FILE\n"
+        "(e.g. to be read with: python -m pstats FILE)",
+    )
+
+    args = parser.parse_args(arguments)
+    if len(args.regexp) > 0 or len(args.file_patterns) > 0:
+        if args.pattern is not None:
+            args.file.insert(0, args.pattern)
+        args.pattern = args.regexp
+        for pattern_file in args.file_patterns:
+            try:
+                args.pattern.extend(read_patterns(pattern_file))
+            except OSError as error:
+                parser.error(f"{pattern_file}: {error.strerror}")
+    elif args.pattern is None:
+        parser.error("the following arguments are required: pattern")
+    if args.json and args.output_mode != "lines":
+        parser.error("--json cannot be used with -c, -l, -L or -q")
+    # The lines of a followed file never end, so they could never be counted.
+    if args.follow and args.output_mode in (
+        "count",
+        "files_with_matches",
+        "files_without_match",
+    ):
+        parser.error("--follow cannot be used with -c, -l or -L")
+    return args
+
+
+def read_patterns(file: str) -> list[str]:
+    """Read patterns from a file, one pattern per line.
+
+    Parameters
+    ----------
+    file : Path of the file to read, or "-" to read standard input.
+
+    Returns
+    -------
+    List of the patterns in the file.
+    """
+    if file == "-":
+        return sys.stdin.read().splitlines()
+    with open(file, encoding="utf-8") as pattern_file:
+        return pattern_file.read().splitlines()
+
+
+def parse_index_arguments(arguments: list[str]) -> argparse.Namespace:
+    """Parse command line arguments of the index command.
+
+    Parameters
+    ----------
+    arguments : Command line arguments following the index command.
+
+    Returns
+    -------
+    Parsed command line arguments.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main index",
+        description="Build or update the trigram index of DIR, used by --use-index.\n\n"
+        "Example: python -m src.main index build test_data",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("command", choices=["build"], help="index command to run")
+    parser.add_argument(
+        "directory", nargs="?", default=".", help="(optional) directory to index"
+    )
+    parser.add_argument(
+        "--no-ignore",
+        action="store_true",
+        help="do not skip files and directories listed in ignore files",
+    )
+    parser.add_argument(
+        "--walker-threads",
+        type=int,
+        default=1,
+        metavar="NUM",
+        help="list directories with NUM threads",
+    )
+
+    return parser.parse_args(arguments)
+
+
+def parse_daemon_arguments(arguments: list[str]) -> argparse.Namespace:
+    """Parse command line arguments of the daemon command.
+
+    Parameters
+    ----------
+    arguments : Command line arguments following the daemon command.
+
+    Returns
+    -------
+    Parsed command line arguments.
+    """
+    import argparse
+
+    from src.daemon import SOCKET_PATH_VARIABLE, get_socket_path
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main daemon",
+        description="Start the daemon, which runs the searches of this user while it is\n"
+        "running, keeping compiled patterns and directory listings in memory.\n"
+        "Searches are forwarded to it, unless --no-daemon or --follow is given.\n\n"
+        "Example: python -m src.main daemon start &",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("command", choices=["start"], help="daemon command to run")
+    parser.add_argument(
+        "--socket",
+        default=get_socket_path(),
+        metavar="PATH",
+        help=f"path of the socket to listen on (default: ${SOCKET_PATH_VARIABLE}, or a\n"
+        "socket of the user in the runtime or temporary directory)",
+    )
+
+    return parser.parse_args(arguments)
+
+
+def run_search(
+    arguments: list[str],
+    directory_listing_cache: DirectoryListingCache | None = None,
+) -> int:
+    """Run a search with the given command line arguments.
+
+    Parameters
+    ----------
+    arguments : Command line arguments, without the program name.
+    directory_listing_cache : Cache of the directories searched recursively, kept
+        between searches by the daemon.
+
+    Returns
+    -------
+    Exit status: 0 if a line matched, 1 otherwise.
+    """
+    args = parse_arguments(arguments)
+    from src.grep import READ_AHEAD_FILES, grep
+    from src.stats import Stats
+
+    stats = Stats() if args.stats else None
+    profile = None
+    if args.profile is not None:
+        import cProfile
 
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        has_match = grep(
+            pattern=args.pattern,
+            files=args.file,
+            recursive=args.recursive,
+            print_line_number=args.line_number,
+            number_of_lines_before_match=args.before_context,
+            number_of_lines_after_match=args.after_context,
+            number_of_jobs=args.jobs,
+            preserve_file_order=not args.unordered,
+            number_of_walker_threads=args.walker_threads,
+            use_ignore_files=not args.no_ignore,
+            binary_files=args.binary_files,
+            use_index=args.use_index,
+            line_buffered=args.line_buffered,
+            color=args.color,
+            output_mode=args.output_mode,
+            max_count=args.max_count,
+            stats=stats,
+            follow=args.follow,
+            search_zip=args.search_zip,
+            number_of_files_read_ahead=(
+                READ_AHEAD_FILES if args.read_ahead is None else args.read_ahead
+            ),
+            print_json=args.json,
+            cache_directory=args.cache_dir,
+            directory_listing_cache=directory_listing_cache,
+        )
+        # Like in grep, the exit status is 0 if a line matched and 1 otherwise.
+        exit_status = 0 if has_match else 1
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile)
+        if stats is not None:
+            stats.print_report(sys.stderr)
+    return exit_status
 
-if __name__ == "__main__":
-    args = parse_arguments()
-    grep(
-        pattern=args.pattern,
-        files=args.file,
-        recursive=args.recursive,
-        print_line_number=args.line_number,
-        number_of_lines_before_match=args.before_context,
-        number_of_lines_after_match=args.after_context,
+
+if __name__ == "__main__" and sys.argv[1:3] == ["index", "build"]:
+    args = parse_index_arguments(sys.argv[2:])
+    from src.grep import build_index
+
+    build_index(
+        directory=args.directory,
+        use_ignore_files=not args.no_ignore,
+        number_of_walker_threads=args.walker_threads,
     )
+elif __name__ == "__main__" and sys.argv[1:3] == ["daemon", "start"]:
+    args = parse_daemon_arguments(sys.argv[2:])
+    from src.daemon import serve
+    from src.grep import DirectoryListingCache
+
+    directory_listing_cache = DirectoryListingCache()
+    try:
+        serve(
+            args.socket,
+            lambda arguments: run_search(arguments, directory_listing_cache),
+        )
+    except OSError as error:
+        sys.exit(str(error))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        directory_listing_cache.close()
+elif __name__ == "__main__":
+    try:
+        exit_status = None
+        # Followed files are searched until interrupted, which would keep the
+        # daemon from running other searches.
+        if "--no-daemon" not in sys.argv and "--follow" not in sys.argv:
+            from src.daemon import forward, get_socket_path
+
+            exit_status = forward(get_socket_path(), sys.argv[1:])
+        if exit_status is None:
+            exit_status = run_search(sys.argv[1:])
+    except KeyboardInterrupt:
+        # Following a file only stops when interrupted.
+        exit_status = 130
+    sys.exit(exit_status)
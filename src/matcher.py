@@ -0,0 +1,780 @@
+import functools
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Generator, Iterable
+from typing import Any
+
+try:  # Python 3.11+
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_constants
+    import sre_parse
+
+from src.line import Interval
+
+# Matchers of recently used patterns are kept, so a long-running process, like the
+# daemon, compiles each pattern once. Matchers are never modified once created.
+MATCHER_CACHE_SIZE = 128
+
+
+class Matcher(ABC):
+    """A pattern compiled once and used to search many lines.
+
+    Attributes
+    ----------
+    pattern : Pattern the matcher was created from.
+    supports_buffer_search : Indicates whether search_buffer can be used to find
+        candidate lines in a multi-line buffer.
+    supports_bytes_search : Indicates whether search_bytes can be used to find
+        candidate lines in a multi-line UTF-8 encoded buffer.
+    required_literals : Literals which every matching line contains.
+    can_match_empty : Indicates whether the pattern can match an empty string, so
+        a line may match without any matching intervals, e.g. an empty line for ^$.
+    """
+
+    def __init__(self, pattern: str) -> None:
+        self.pattern: str = pattern
+        self.required_literals: list[str] = []
+        self.supports_buffer_search: bool = False
+        self.supports_bytes_search: bool = False
+        self.can_match_empty: bool = False
+
+    @abstractmethod
+    def find_intervals(self, line: str) -> list[Interval]:
+        """Find all non-empty matches in the given line.
+
+        Empty matches are not intervals, so a line which only has empty matches
+        has no matching intervals, but matches anyway (see matches).
+
+        Parameters
+        ----------
+        line : Line to search (without the line terminator).
+
+        Returns
+        -------
+        List of matching intervals, ordered by start index.
+        """
+
+    def highlight(self, line: str, colors: tuple[str, ...], default_color: str) -> str:
+        """Wrap every match in the given line in color codes.
+
+        Parameters
+        ----------
+        line : Line to highlight (without the line terminator).
+        colors : Codes of the colors of the matches of each pattern. The colors are
+            reused when there are more patterns than colors.
+        default_color : Code restoring the default color after each match.
+
+        Returns
+        -------
+        Highlighted line, the same as highlight_intervals gives for the intervals
+        found by find_intervals.
+        """
+        return highlight_intervals(
+            line, self.find_intervals(line), colors, default_color
+        )
+
+    def matches(self, line: str) -> bool:
+        """Check whether the given line contains a match.
+
+        Parameters
+        ----------
+        line : Line to search (without the line terminator).
+
+        Returns
+        -------
+        True if the line contains at least one match, even an empty one.
+        """
+        return len(self.find_intervals(line)) > 0
+
+    def search_buffer(self, buffer: str, start: int) -> int:
+        """Find the first candidate match in a buffer containing many lines.
+
+        Every line that matches on its own contains a candidate, but a candidate
+        may also be found on a line that does not match (e.g. when the match
+        spans a line break), so the line must be verified with find_intervals.
+
+        It is never called unless supports_buffer_search is set. The default
+        implementation, for matchers which never set it, finds no candidates.
+
+        Parameters
+        ----------
+        buffer : Buffer to search.
+        start : Index in the buffer to start searching from.
+
+        Returns
+        -------
+        Index of the first candidate at or after start, or -1 if there is none.
+        """
+        return -1
+
+    def search_bytes(self, buffer: bytes, start: int) -> int:
+        """Find the first candidate match in a UTF-8 encoded buffer of many lines.
+
+        The same rules as for search_buffer apply, but indices are byte offsets.
+        It is never called unless supports_bytes_search is set.
+
+        Parameters
+        ----------
+        buffer : Buffer to search.
+        start : Byte offset in the buffer to start searching from.
+
+        Returns
+        -------
+        Byte offset of the first candidate at or after start, or -1 if there is none.
+        """
+        return -1
+
+
+def highlight_intervals(
+    line: str, intervals: list[Interval], colors: tuple[str, ...], default_color: str
+) -> str:
+    """Wrap the given intervals of a line in color codes.
+
+    Parameters
+    ----------
+    line : Line to highlight.
+    intervals : Intervals to highlight, ordered by start index and not overlapping.
+    colors : Codes of the colors of the intervals of each pattern. The colors are
+        reused when there are more patterns than colors.
+    default_color : Code restoring the default color after each interval.
+
+    Returns
+    -------
+    Highlighted line.
+    """
+    output = []
+    previous_interval_end = 0
+    for interval in intervals:
+        if interval.start > previous_interval_end:
+            output.append(line[previous_interval_end : interval.start])
+        output.append(colors[interval.pattern_index % len(colors)])
+        output.append(line[interval.start : interval.end])
+        output.append(default_color)
+        previous_interval_end = interval.end
+    if previous_interval_end < len(line):
+        output.append(line[previous_interval_end:])
+    return "".join(output)
+
+
+class LiteralMatcher(Matcher):
+    """A matcher for patterns without any special characters, using str.find."""
+
+    def __init__(self, pattern: str, literal: str) -> None:
+        super().__init__(pattern)
+        self._literal: str = literal
+        self._length: int = len(literal)
+        self.required_literals = [literal]
+        self.supports_buffer_search = True
+        try:
+            self._encoded_literal: bytes = literal.encode("utf-8")
+            self.supports_bytes_search = True
+        except UnicodeEncodeError:
+            # E.g. a lone surrogate, which can never appear in decoded text.
+            self._encoded_literal = b""
+
+    def matches(self, line: str) -> bool:
+        return self._literal in line
+
+    def search_buffer(self, buffer: str, start: int) -> int:
+        return buffer.find(self._literal, start)
+
+    def search_bytes(self, buffer: bytes, start: int) -> int:
+        return buffer.find(self._encoded_literal, start)
+
+    def highlight(self, line: str, colors: tuple[str, ...], default_color: str) -> str:
+        # Like the intervals, the occurrences are replaced from left to right
+        # without overlapping.
+        return line.replace(self._literal, colors[0] + self._literal + default_color)
+
+    def find_intervals(self, line: str) -> list[Interval]:
+        intervals = []
+        start = line.find(self._literal)
+        while start != -1:
+            end = start + self._length
+            intervals.append(Interval(start, end))
+            start = line.find(self._literal, end)
+        return intervals
+
+
+# Deeper tries are searched for with a flat alternation instead, as the regex
+# parser recurses into every nested group.
+_MAX_TRIE_GROUP_DEPTH = 100
+
+
+def _get_literal_alternation_pattern(literals: Iterable[str]) -> str:
+    # Literals sharing a prefix are merged into a trie, so the regex engine does
+    # not backtrack into every literal at every position.
+    unique_literals = list(dict.fromkeys(literals))
+    trie: dict[str, dict] = {}
+    for literal in unique_literals:
+        node = trie
+        for character in literal:
+            node = node.setdefault(character, {})
+        node[""] = {}  # Marks the end of a literal.
+
+    # The patterns are built from the leaves up, without recursion, as literals
+    # can be longer than the recursion limit. Parents come before their children.
+    nodes = [trie]
+    for node in nodes:
+        nodes.extend(child for character, child in node.items() if character != "")
+    # The pattern of each node, with the depth of its nested groups.
+    node_patterns: dict[int, tuple[str, int]] = {}
+    for node in reversed(nodes):
+        children = [
+            (character, node_patterns[id(child)])
+            for character, child in node.items()
+            if character != ""
+        ]
+        if len(children) == 0:
+            node_patterns[id(node)] = ("", 0)
+            continue
+        pattern = "|".join(
+            re.escape(character) + child_pattern
+            for character, (child_pattern, _) in children
+        )
+        depth = max(child_depth for _, (_, child_depth) in children)
+        if len(children) > 1:
+            pattern = f"(?:{pattern})"
+            depth += 1
+        if "" in node:
+            # Longer literals are tried first.
+            pattern = f"(?:{pattern})?"
+            depth += 1
+        node_patterns[id(node)] = (pattern, depth)
+
+    pattern, depth = node_patterns[id(trie)]
+    if depth > _MAX_TRIE_GROUP_DEPTH:
+        # Like in the trie, the longest literal starting at a position wins.
+        return "|".join(
+            re.escape(literal)
+            for literal in sorted(unique_literals, key=len, reverse=True)
+        )
+    return pattern
+
+
+class LiteralPrefilter:
+    """A fast check for literals of which at least one is in every matching line.
+
+    A single literal is searched for with str.find, several literals with a single
+    regex built from a trie of the literals.
+    """
+
+    def __init__(self, literals: list[str]) -> None:
+        """Create a new LiteralPrefilter instance.
+
+        Parameters
+        ----------
+        literals : Non-empty literals, at least one of which is in every matching line.
+        """
+        self.literals: list[str] = literals
+        self._literal: str | None = None
+        self._regex: re.Pattern[str] | None = None
+        self._bytes_regex: re.Pattern[bytes] | None = None
+
+        encoded_literals = [literal.encode("utf-8", "replace") for literal in literals]
+        if len(literals) == 1:
+            self._literal = literals[0]
+            self._encoded_literal: bytes = encoded_literals[0]
+        else:
+            self._regex = re.compile(_get_literal_alternation_pattern(literals))
+            # Each byte is mapped to a single character to build the trie.
+            self._bytes_regex = re.compile(
+                _get_literal_alternation_pattern(
+                    literal.decode("latin-1") for literal in encoded_literals
+                ).encode("latin-1")
+            )
+
+    def matches(self, line: str) -> bool:
+        """Check whether the given line may match."""
+        if self._literal is not None:
+            return self._literal in line
+        return self._regex.search(line) is not None
+
+    def search_buffer(self, buffer: str, start: int) -> int:
+        """Find the first literal in the buffer, like Matcher.search_buffer."""
+        if self._literal is not None:
+            return buffer.find(self._literal, start)
+        match = self._regex.search(buffer, start)
+        return -1 if match is None else match.start()
+
+    def search_bytes(self, buffer: bytes, start: int) -> int:
+        """Find the first literal in the buffer, like Matcher.search_bytes."""
+        if self._literal is not None:
+            return buffer.find(self._encoded_literal, start)
+        match = self._bytes_regex.search(buffer, start)
+        return -1 if match is None else match.start()
+
+
+class _CompiledRegexMatcher(Matcher):
+    # Common part of the matchers running a compiled regex. Lines are searched
+    # with the regex only if they pass the literal prefilter.
+
+    def __init__(
+        self,
+        pattern: str,
+        regex: re.Pattern[str],
+        buffer_regex: re.Pattern[str] | None,
+        prefilter: LiteralPrefilter | None,
+    ) -> None:
+        super().__init__(pattern)
+        self._regex: re.Pattern[str] = regex
+        self._buffer_regex: re.Pattern[str] | None = buffer_regex
+        self._prefilter: LiteralPrefilter | None = prefilter
+        # With a prefilter, candidates are occurrences of the literals, which are
+        # found on every matching line regardless of the rest of the pattern.
+        self.supports_buffer_search = buffer_regex is not None or prefilter is not None
+        self.supports_bytes_search = prefilter is not None
+
+    def search_buffer(self, buffer: str, start: int) -> int:
+        if self._prefilter is not None:
+            return self._prefilter.search_buffer(buffer, start)
+        match = self._buffer_regex.search(buffer, start)
+        return -1 if match is None else match.start()
+
+    def search_bytes(self, buffer: bytes, start: int) -> int:
+        return self._prefilter.search_bytes(buffer, start)
+
+    def highlight(self, line: str, colors: tuple[str, ...], default_color: str) -> str:
+        # A single substitution finds the same matches as find_intervals, without
+        # creating an Interval for each of them. Empty matches are left as they are.
+        color = colors[0]
+
+        def highlight_match(match: re.Match[str]) -> str:
+            text = match.group()
+            return color + text + default_color if text else text
+
+        return self._regex.sub(highlight_match, line)
+
+
+class RegexMatcher(_CompiledRegexMatcher):
+    """A matcher for general regex patterns.
+
+    A single search is used as a gate, so lines without a match never pay for
+    building a match iterator.
+    """
+
+    def __init__(
+        self,
+        pattern: str,
+        regex: re.Pattern[str],
+        buffer_regex: re.Pattern[str] | None,
+        prefilter: LiteralPrefilter | None,
+        can_match_empty: bool,
+    ) -> None:
+        super().__init__(pattern, regex, buffer_regex, prefilter)
+        self.can_match_empty = can_match_empty
+
+    def matches(self, line: str) -> bool:
+        if self._prefilter is not None and not self._prefilter.matches(line):
+            return False
+        return self._regex.search(line) is not None
+
+    def find_intervals(self, line: str) -> list[Interval]:
+        if self._prefilter is not None and not self._prefilter.matches(line):
+            return []
+        first_match = self._regex.search(line)
+        if first_match is None:
+            return []
+        return [
+            Interval(match.start(), match.end())
+            for match in self._regex.finditer(line, first_match.start())
+            if match.end() > match.start()
+        ]
+
+
+class AnchoredMatcher(_CompiledRegexMatcher):
+    """A matcher for patterns anchored at the start of the line.
+
+    Such a pattern can match at most once per line, so re.match is enough.
+    """
+
+    def matches(self, line: str) -> bool:
+        if self._prefilter is not None and not self._prefilter.matches(line):
+            return False
+        return self._regex.match(line) is not None
+
+    def find_intervals(self, line: str) -> list[Interval]:
+        if self._prefilter is not None and not self._prefilter.matches(line):
+            return []
+        match = self._regex.match(line)
+        if match is None or match.end() == match.start():
+            return []
+        return [Interval(match.start(), match.end())]
+
+
+class LiteralSetMatcher(Matcher):
+    """A matcher for a set of literal patterns, searched for in a single pass.
+
+    The literals are compiled into one regex shaped like a trie of the literals,
+    which works like an Aho-Corasick automaton, so the time to search a line
+    hardly depends on the number of literals. The longest literal starting at a
+    position wins.
+    """
+
+    def __init__(self, pattern: str, literals: list[str]) -> None:
+        super().__init__(pattern)
+        # Duplicate literals are reported as the first pattern they appear in.
+        self._pattern_indices: dict[str, int] = {}
+        for i, literal in enumerate(literals):
+            self._pattern_indices.setdefault(literal, i)
+        self._regex: re.Pattern[str] = re.compile(
+            _get_literal_alternation_pattern(self._pattern_indices)
+        )
+        self._prefilter: LiteralPrefilter = LiteralPrefilter(
+            list(self._pattern_indices)
+        )
+        self.supports_buffer_search = True
+        self.supports_bytes_search = True
+
+    def matches(self, line: str) -> bool:
+        return self._prefilter.matches(line)
+
+    def search_buffer(self, buffer: str, start: int) -> int:
+        return self._prefilter.search_buffer(buffer, start)
+
+    def search_bytes(self, buffer: bytes, start: int) -> int:
+        return self._prefilter.search_bytes(buffer, start)
+
+    def highlight(self, line: str, colors: tuple[str, ...], default_color: str) -> str:
+        def highlight_match(match: re.Match[str]) -> str:
+            text = match.group()
+            color = colors[self._pattern_indices[text] % len(colors)]
+            return color + text + default_color
+
+        return self._regex.sub(highlight_match, line)
+
+    def find_intervals(self, line: str) -> list[Interval]:
+        return [
+            Interval(match.start(), match.end(), self._pattern_indices[match.group()])
+            for match in self._regex.finditer(line)
+        ]
+
+
+class RegexSetMatcher(RegexMatcher):
+    """A matcher for a set of regex patterns, combined into a single alternation.
+
+    Every pattern is wrapped in a named group, so the pattern of a match is known
+    from the group that matched. The first pattern matching at a position wins.
+    """
+
+    def find_intervals(self, line: str) -> list[Interval]:
+        if self._prefilter is not None and not self._prefilter.matches(line):
+            return []
+        first_match = self._regex.search(line)
+        if first_match is None:
+            return []
+        return [
+            Interval(match.start(), match.end(), int(match.lastgroup[2:]))
+            for match in self._regex.finditer(line, first_match.start())
+            if match.end() > match.start()
+        ]
+
+    def highlight(self, line: str, colors: tuple[str, ...], default_color: str) -> str:
+        def highlight_match(match: re.Match[str]) -> str:
+            text = match.group()
+            if not text:
+                return text
+            color = colors[int(match.lastgroup[2:]) % len(colors)]
+            return color + text + default_color
+
+        return self._regex.sub(highlight_match, line)
+
+
+class CombinedMatcher(Matcher):
+    """A matcher running a separate matcher for each pattern of a set.
+
+    Used for pattern sets which cannot be combined into a single regex, e.g.
+    because of backreferences or global flags.
+    """
+
+    def __init__(self, pattern: str, matchers: list[Matcher]) -> None:
+        super().__init__(pattern)
+        self._matchers: list[Matcher] = matchers
+        self.can_match_empty = any(matcher.can_match_empty for matcher in matchers)
+        self.supports_buffer_search = all(
+            matcher.supports_buffer_search for matcher in matchers
+        )
+        self.supports_bytes_search = all(
+            matcher.supports_bytes_search for matcher in matchers
+        )
+
+    def matches(self, line: str) -> bool:
+        return any(matcher.matches(line) for matcher in self._matchers)
+
+    def search_buffer(self, buffer: str, start: int) -> int:
+        return _get_first_position(
+            matcher.search_buffer(buffer, start) for matcher in self._matchers
+        )
+
+    def search_bytes(self, buffer: bytes, start: int) -> int:
+        return _get_first_position(
+            matcher.search_bytes(buffer, start) for matcher in self._matchers
+        )
+
+    def find_intervals(self, line: str) -> list[Interval]:
+        all_intervals = sorted(
+            (
+                Interval(interval.start, interval.end, pattern_index)
+                for pattern_index, matcher in enumerate(self._matchers)
+                for interval in matcher.find_intervals(line)
+            ),
+            key=lambda interval: (interval.start, -interval.end),
+        )
+        # Overlapping matches are dropped, the earliest and longest one is kept.
+        intervals = []
+        for interval in all_intervals:
+            if len(intervals) == 0 or interval.start >= intervals[-1].end:
+                intervals.append(interval)
+        return intervals
+
+
+def _get_first_position(positions: Iterable[int]) -> int:
+    return min((position for position in positions if position != -1), default=-1)
+
+
+# Constructs which can make a pattern fail on a multi-line buffer at a position
+# where it matches the line on its own, so the buffer search would miss lines.
+# In a buffer, $ does not match before the "\r" of a "\r\n" terminator, which is
+# stripped from lines.
+_LINE_LOCAL_OPCODES = {"ASSERT_NOT", "ATOMIC_GROUP", "POSSESSIVE_REPEAT"}
+_LINE_LOCAL_ANCHORS = {
+    sre_constants.AT_BEGINNING_STRING,
+    sre_constants.AT_END,
+    sre_constants.AT_END_LINE,
+    sre_constants.AT_END_STRING,
+}
+
+
+def _walk_parsed_pattern(
+    parsed: sre_parse.SubPattern,
+) -> Generator[tuple[Any, Any], None, None]:
+    for op, value in parsed:
+        yield op, value
+        stack = [value]
+        while len(stack) > 0:
+            item = stack.pop()
+            if isinstance(item, sre_parse.SubPattern):
+                yield from _walk_parsed_pattern(item)
+            elif isinstance(item, (tuple, list)):
+                stack.extend(item)
+
+
+def _supports_buffer_search(parsed: sre_parse.SubPattern) -> bool:
+    for op, value in _walk_parsed_pattern(parsed):
+        if str(op) in _LINE_LOCAL_OPCODES:
+            return False
+        if op is sre_constants.AT and value in _LINE_LOCAL_ANCHORS:
+            return False
+    return True
+
+
+_REPEAT_OPCODES = {"MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"}
+
+
+def _get_required_literals(parsed: sre_parse.SubPattern) -> list[str]:
+    # Only a conservative subset is extracted: runs of literals in the sequence of
+    # the pattern, in groups and in repeats which have to match at least once.
+    literals = []
+    current_literal = []
+    for op, value in parsed:
+        if op is sre_constants.LITERAL:
+            current_literal.append(chr(value))
+            continue
+        if len(current_literal) > 0:
+            literals.append("".join(current_literal))
+            current_literal = []
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, _, subpattern = value
+            if not add_flags & re.IGNORECASE:
+                literals.extend(_get_required_literals(subpattern))
+        elif str(op) in _REPEAT_OPCODES:
+            min_count, _, subpattern = value
+            if min_count > 0:
+                literals.extend(_get_required_literals(subpattern))
+    if len(current_literal) > 0:
+        literals.append("".join(current_literal))
+    return literals
+
+
+def _get_prefilter_literals(parsed: sre_parse.SubPattern) -> list[str] | None:
+    # Returns literals of which at least one is in every match, or None if there
+    # are no such literals. Among the items of the sequence, the one with the
+    # longest shortest literal is picked, as it is likely to be the rarest.
+    best_literals = None
+    current_literal = []
+
+    def pick(literals: list[str] | None) -> None:
+        nonlocal best_literals
+        if literals is None or len(literals) == 0:
+            return
+        if best_literals is None or min(map(len, literals)) > min(
+            map(len, best_literals)
+        ):
+            best_literals = literals
+
+    for op, value in parsed:
+        if op is sre_constants.LITERAL:
+            current_literal.append(chr(value))
+            continue
+        if len(current_literal) > 0:
+            pick(["".join(current_literal)])
+            current_literal = []
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, _, subpattern = value
+            if not add_flags & re.IGNORECASE:
+                pick(_get_prefilter_literals(subpattern))
+        elif str(op) in _REPEAT_OPCODES:
+            min_count, _, subpattern = value
+            if min_count > 0:
+                pick(_get_prefilter_literals(subpattern))
+        elif op is sre_constants.BRANCH:
+            _, branches = value
+            branch_literals = [_get_prefilter_literals(branch) for branch in branches]
+            if all(literals is not None for literals in branch_literals):
+                pick([literal for literals in branch_literals for literal in literals])
+    if len(current_literal) > 0:
+        pick(["".join(current_literal)])
+    return best_literals
+
+
+def _get_literal(parsed: sre_parse.SubPattern) -> str | None:
+    # Returns the literal matched by the pattern, or None if it is not a literal.
+    items = list(parsed)
+    if (
+        len(items) > 0
+        and not parsed.state.flags & re.IGNORECASE
+        and all(op is sre_constants.LITERAL for op, _ in items)
+    ):
+        return "".join(chr(value) for _, value in items)
+    return None
+
+
+def _get_any_prefilter_literals(parsed: sre_parse.SubPattern) -> list[str] | None:
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    literal = _get_literal(parsed)
+    if literal is not None:
+        return [literal]
+    return _get_prefilter_literals(parsed)
+
+
+def _create_prefilter(literals: list[str] | None) -> LiteralPrefilter | None:
+    if literals is None:
+        return None
+    return LiteralPrefilter(list(dict.fromkeys(literals)))
+
+
+_GROUP_REFERENCE_OPCODES = {"GROUPREF", "GROUPREF_EXISTS"}
+
+
+def _create_pattern_set_matcher(patterns: tuple[str, ...]) -> Matcher:
+    pattern = "\n".join(patterns)
+    parsed_patterns = [sre_parse.parse(pattern) for pattern in patterns]
+
+    literals = [_get_literal(parsed) for parsed in parsed_patterns]
+    if all(literal is not None for literal in literals):
+        return LiteralSetMatcher(pattern, literals)
+
+    # Group numbers would be shifted in the combined regex and global flags would
+    # apply to all the patterns, so such patterns are searched for separately.
+    if any(
+        parsed.state.flags & ~re.UNICODE
+        or any(
+            str(op) in _GROUP_REFERENCE_OPCODES
+            for op, _ in _walk_parsed_pattern(parsed)
+        )
+        for parsed in parsed_patterns
+    ):
+        return CombinedMatcher(pattern, [create_matcher(p) for p in patterns])
+
+    # The group names cannot clash with valid group names of the patterns.
+    combined_pattern = "|".join(
+        f"(?P<__{i}>{pattern})" for i, pattern in enumerate(patterns)
+    )
+    try:
+        regex = re.compile(combined_pattern)
+    except re.error:
+        return CombinedMatcher(pattern, [create_matcher(p) for p in patterns])
+
+    prefilter_literals = [
+        _get_any_prefilter_literals(parsed) for parsed in parsed_patterns
+    ]
+    prefilter = None
+    if all(literals is not None for literals in prefilter_literals):
+        prefilter = _create_prefilter(
+            [literal for literals in prefilter_literals for literal in literals]
+        )
+    buffer_regex = None
+    if all(_supports_buffer_search(parsed) for parsed in parsed_patterns):
+        buffer_regex = re.compile(combined_pattern, re.MULTILINE)
+    return RegexSetMatcher(
+        pattern,
+        regex,
+        buffer_regex,
+        prefilter,
+        can_match_empty=any(parsed.getwidth()[0] == 0 for parsed in parsed_patterns),
+    )
+
+
+def create_matcher(pattern: str | list[str]) -> Matcher:
+    """Compile the pattern and pick the fastest matching strategy for it.
+
+    Parameters
+    ----------
+    pattern : Regex pattern to search for, or a list of patterns to search for at
+        once. A line matches if it matches any of the patterns.
+
+    Returns
+    -------
+    Matcher for the given pattern. Matchers are cached, so the same matcher may be
+    returned for the same pattern.
+    """
+    if not isinstance(pattern, str):
+        pattern = tuple(pattern)
+    return _create_matcher(pattern)
+
+
+@functools.lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def _create_matcher(pattern: str | tuple[str, ...]) -> Matcher:
+    if not isinstance(pattern, str):
+        if len(pattern) == 0:
+            # Nothing matches an empty set of patterns.
+            return create_matcher("(?!)")
+        if len(pattern) == 1:
+            return create_matcher(pattern[0])
+        return _create_pattern_set_matcher(pattern)
+
+    regex = re.compile(pattern)
+    parsed = sre_parse.parse(pattern)
+    items = list(parsed)
+
+    literal = _get_literal(parsed)
+    if literal is not None:
+        return LiteralMatcher(pattern, literal)
+
+    prefilter = _create_prefilter(_get_any_prefilter_literals(parsed))
+
+    # The buffer regex uses MULTILINE so that ^ and $ match at line boundaries.
+    buffer_regex = (
+        re.compile(pattern, re.MULTILINE) if _supports_buffer_search(parsed) else None
+    )
+
+    if len(items) > 0 and items[0] in (
+        (sre_constants.AT, sre_constants.AT_BEGINNING),
+        (sre_constants.AT, sre_constants.AT_BEGINNING_STRING),
+    ):
+        matcher = AnchoredMatcher(pattern, regex, buffer_regex, prefilter)
+        matcher.can_match_empty = parsed.getwidth()[0] == 0
+    else:
+        matcher = RegexMatcher(
+            pattern,
+            regex,
+            buffer_regex,
+            prefilter,
+            can_match_empty=parsed.getwidth()[0] == 0,
+        )
+    if not regex.flags & re.IGNORECASE:
+        matcher.required_literals = _get_required_literals(parsed)
+    return matcher
@@ -1,27 +1,82 @@
+import sys
+import time
+from json.encoder import encode_basestring, encode_basestring_ascii
 from pathlib import Path
 
-from colorama import Fore, Style
-
 from src.line import Line
+from src.matcher import Matcher, highlight_intervals
+
+_is_colorama_initialized = False
+
+
+def _initialize_colorama() -> None:
+    # ANSI escape codes work out of the box everywhere but in the Windows console,
+    # so colorama is only imported when colors are printed there.
+    global _is_colorama_initialized
+    if _is_colorama_initialized:
+        return
+    _is_colorama_initialized = True
+    if sys.platform == "win32":
+        import colorama
+
+        colorama.just_fix_windows_console()
 
 
 class Printer:
     """A class used to print matching lines."""
 
-    MATCHED_TEXT_COLOR = Fore.RED
-    FILENAME_COLOR = Fore.LIGHTMAGENTA_EX
-    SEPARATOR_COLOR = Fore.LIGHTBLUE_EX
-    LINE_NUMBER_COLOR = Fore.LIGHTCYAN_EX
-    DEFAULT_COLOR = Style.RESET_ALL
+    # ANSI escape codes, the same as the ones defined by colorama.
+    MATCHED_TEXT_COLOR = "\033[31m"
+    # Matches of different patterns are told apart by color, when searching for
+    # several patterns.
+    PATTERN_COLORS = (
+        MATCHED_TEXT_COLOR,
+        "\033[32m",
+        "\033[33m",
+        "\033[34m",
+        "\033[35m",
+        "\033[36m",
+    )
+    FILENAME_COLOR = "\033[95m"
+    SEPARATOR_COLOR = "\033[94m"
+    LINE_NUMBER_COLOR = "\033[96m"
+    DEFAULT_COLOR = "\033[0m"
+
+    # Output is buffered and written when the buffer reaches OUTPUT_BUFFER_SIZE
+    # characters or when OUTPUT_FLUSH_INTERVAL seconds passed since the last write.
+    OUTPUT_BUFFER_SIZE = 64 * 1024
+    OUTPUT_FLUSH_INTERVAL = 0.1
 
-    def __init__(self, print_line_number: bool) -> None:
+    def __init__(
+        self,
+        print_line_number: bool,
+        line_buffered: bool | None = None,
+        color: bool = True,
+        matcher: Matcher | None = None,
+    ) -> None:
         """Create a new Printer instance.
 
         Parameters
         ----------
         print_line_number : Indicates whether the line number should be printed for each line.
+        line_buffered : Indicates whether the output should be written after every line.
+            By default, the output is line buffered only if standard output is a terminal.
+        color : Indicates whether matches, file names, line numbers and separators
+            should be colored.
+        matcher : Matcher of the searched pattern. If given, the matches of the
+            matching lines are highlighted with it, rather than from their matching
+            intervals, so the lines only need to tell whether they match.
         """
         self.print_line_number: bool = print_line_number
+        self.color: bool = color
+        self.matcher: Matcher | None = matcher
+        self.line_buffered: bool = (
+            sys.stdout.isatty() if line_buffered is None else line_buffered
+        )
+
+        self._output_chunks: list[str] = []
+        self._output_size: int = 0
+        self._last_flush_time: float = time.monotonic()
 
         self._is_first_print: bool = True  # Used to correctly print the separator.
         self._is_new_file: bool = False  # Used to correctly print the separator.
@@ -29,23 +84,20 @@ class Printer:
         self._previous_line_index: int = -1
 
     def _get_formatted_separator(self) -> str:
+        if not self.color:
+            return "--"
         return self.SEPARATOR_COLOR + "--" + self.DEFAULT_COLOR
 
     def _get_formatted_line(self, line: Line) -> str:
-        output = ""
-        previous_interval_end = 0
-        for interval in line.matching_intervals:
-            if interval.start > 0:
-                output += line.text[previous_interval_end : interval.start]
-            output += (
-                self.MATCHED_TEXT_COLOR
-                + line.text[interval.start : interval.end]
-                + self.DEFAULT_COLOR
+        if not self.color or len(line.matching_intervals) == 0:
+            return line.text
+        if self.matcher is not None:
+            return self.matcher.highlight(
+                line.text, self.PATTERN_COLORS, self.DEFAULT_COLOR
             )
-            previous_interval_end = interval.end
-        if previous_interval_end < len(line.text):
-            output += line.text[previous_interval_end:]
-        return output
+        return highlight_intervals(
+            line.text, line.matching_intervals, self.PATTERN_COLORS, self.DEFAULT_COLOR
+        )
 
     def set_file(self, file: Path) -> None:
         """Set the file to be printed.
@@ -57,12 +109,57 @@ class Printer:
         self._file = file
         self._is_new_file = True
 
+    def _write(self, text: str) -> None:
+        self._output_chunks.append(text)
+        self._output_size += len(text)
+        if (
+            self.line_buffered
+            or self._output_size >= self.OUTPUT_BUFFER_SIZE
+            or time.monotonic() - self._last_flush_time >= self.OUTPUT_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered output to standard output."""
+        if len(self._output_chunks) > 0:
+            if self.color:
+                _initialize_colorama()
+            sys.stdout.write("".join(self._output_chunks))
+            self._output_chunks.clear()
+            self._output_size = 0
+        sys.stdout.flush()
+        self._last_flush_time = time.monotonic()
+
     def print_message(self, message: str) -> None:
         if not self._is_first_print:
-            print(self._get_formatted_separator())
+            self._write(self._get_formatted_separator() + "\n" + message + "\n")
         else:
             self._is_first_print = False
-        print(message)
+            self._write(message + "\n")
+
+    def print_file_name(self) -> None:
+        """Print the name of the file."""
+        if not self.color:
+            self._write(f"{self._file}\n")
+        else:
+            self._write(f"{self.FILENAME_COLOR}{self._file}{self.DEFAULT_COLOR}\n")
+
+    def print_count(self, count: int) -> None:
+        """Print the number of matching lines, preceded by the file name if set.
+
+        Parameters
+        ----------
+        count : Number of matching lines in the file.
+        """
+        if self._file is None:
+            self._write(f"{count}\n")
+        elif not self.color:
+            self._write(f"{self._file}:{count}\n")
+        else:
+            self._write(
+                f"{self.FILENAME_COLOR}{self._file}{self.SEPARATOR_COLOR}:"
+                f"{self.DEFAULT_COLOR}{count}\n"
+            )
 
     def print_line(self, line: Line) -> None:
         """Print the given line.
@@ -71,21 +168,130 @@ class Printer:
         ----------
         line : Line to be printed.
         """
+        output_line = ""
         if (
             self._previous_line_index != -1
             and line.index > self._previous_line_index + 1
         ) or (self._is_new_file and not self._is_first_print):
-            print(self._get_formatted_separator())
+            output_line += self._get_formatted_separator() + "\n"
 
         self._is_first_print = False
         self._is_new_file = False
         self._previous_line_index = line.index
 
-        output_line = ""
+        if not self.color:
+            if self._file is not None:
+                output_line += f"{self._file}:"
+            if self.print_line_number:
+                output_line += f"{line.index + 1}:"
+            self._write(output_line + line.text + "\n")
+            return
+
         if self._file is not None:
             output_line += f"{self.FILENAME_COLOR}{self._file}{self.SEPARATOR_COLOR}:{self.DEFAULT_COLOR}"
         if self.print_line_number:
             output_line += f"{self.LINE_NUMBER_COLOR}{line.index + 1}{self.SEPARATOR_COLOR}:{self.DEFAULT_COLOR}"
         output_line += self._get_formatted_line(line)
 
-        print(output_line)
+        self._write(output_line + "\n")
+
+
+class JsonPrinter(Printer):
+    """A class used to print matching lines as JSON, one object per line.
+
+    The lines of each file are printed between a begin and an end record, as match
+    records for matching lines and context records for context lines. Messages are
+    printed as message records, and a summary record is printed at the end by
+    print_summary. The start and end of the matching intervals are indices of
+    characters in the text of the line.
+    """
+
+    def __init__(self, line_buffered: bool | None = None) -> None:
+        """Create a new JsonPrinter instance.
+
+        Parameters
+        ----------
+        line_buffered : Indicates whether the output should be written after every line.
+            By default, the output is line buffered only if standard output is a terminal.
+        """
+        super().__init__(
+            print_line_number=True, line_buffered=line_buffered, color=False
+        )
+        # The path is encoded once per file. It is escaped to ASCII, since it may
+        # contain surrogates for bytes which are not valid in the file system encoding.
+        self._encoded_file: str = "null"
+        self._is_file_begun: bool = False
+        self._number_of_matching_lines_in_file: int = 0
+        self._number_of_matching_lines: int = 0
+        self._number_of_files_with_matches: int = 0
+        self._start_time: float = time.perf_counter()
+
+    def _end_file(self) -> None:
+        if not self._is_file_begun:
+            return
+        self._write(
+            f'{{"type":"end","data":{{"path":{self._encoded_file},'
+            f'"matched_lines":{self._number_of_matching_lines_in_file}}}}}\n'
+        )
+        if self._number_of_matching_lines_in_file > 0:
+            self._number_of_files_with_matches += 1
+        self._number_of_matching_lines += self._number_of_matching_lines_in_file
+        self._number_of_matching_lines_in_file = 0
+        self._is_file_begun = False
+
+    def set_file(self, file: Path) -> None:
+        """Set the file to be printed, ending the previous one.
+
+        Parameters
+        ----------
+        file : Path of the file to be printed.
+        """
+        self._end_file()
+        super().set_file(file)
+        self._encoded_file = encode_basestring_ascii(str(file))
+
+    def print_message(self, message: str) -> None:
+        # Messages already include the path of the file, if they are about one.
+        self._write(
+            f'{{"type":"message","data":{{"text":{encode_basestring_ascii(message)}}}}}\n'
+        )
+
+    def print_line(self, line: Line) -> None:
+        """Print the given line as a match or context record.
+
+        Parameters
+        ----------
+        line : Line to be printed.
+        """
+        if not self._is_file_begun:
+            self._is_file_begun = True
+            self._write(f'{{"type":"begin","data":{{"path":{self._encoded_file}}}}}\n')
+        offset = "null" if line.offset is None else line.offset
+        if not line.is_match:
+            self._write(
+                f'{{"type":"context","data":{{"path":{self._encoded_file},'
+                f'"line_number":{line.index + 1},"byte_offset":{offset},'
+                f'"text":{encode_basestring(line.text)}}}}}\n'
+            )
+            return
+        self._number_of_matching_lines_in_file += 1
+        submatches = ",".join(
+            f'{{"start":{interval.start},"end":{interval.end},'
+            f'"pattern_index":{interval.pattern_index}}}'
+            for interval in line.matching_intervals
+        )
+        self._write(
+            f'{{"type":"match","data":{{"path":{self._encoded_file},'
+            f'"line_number":{line.index + 1},"byte_offset":{offset},'
+            f'"text":{encode_basestring(line.text)},"submatches":[{submatches}]}}}}\n'
+        )
+
+    def print_summary(self) -> None:
+        """End the last file and print the summary record."""
+        self._end_file()
+        self._write(
+            f'{{"type":"summary","data":{{'
+            f'"matched_lines":{self._number_of_matching_lines},'
+            f'"files_with_matches":{self._number_of_files_with_matches},'
+            f'"elapsed_seconds":{time.perf_counter() - self._start_time:.6f}}}}}\n'
+        )
@@ -1,46 +1,79 @@
-import re
 from collections import deque
-from collections.abc import Generator, Iterable
+from collections.abc import Generator, Iterable, Iterator
 
 from src.line import Interval, Line
-
-
-def _get_matching_intervals(regex: str, line: str) -> list[Interval]:
-    matches = re.finditer(regex, line)
-    return [Interval(match.start(), match.end()) for match in matches]
+from src.matcher import Matcher
 
 
 def find_matching_lines(
-    regex: str,
+    matcher: Matcher,
     lines: Iterable[str],
     number_of_lines_before_match: int,
     number_of_lines_after_match: int,
+    max_count: int | None = None,
+    find_intervals: bool = True,
 ) -> Generator[Line, None, None]:
     """Find matching lines in a given iterable of lines.
 
     Parameters
     ----------
-    regex : Regex pattern to search for.
+    matcher : Matcher for the pattern to search for.
     lines : Iterable of lines to search.
     number_of_lines_before_match : Number of lines to include before a match.
     number_of_lines_after_match : Number of lines to include after a match.
+    max_count : Maximum number of matching lines. Once it is reached, only the
+        lines after the last match are generated and the rest is not searched.
+    find_intervals : Indicates whether the matching intervals of the lines are
+        found. Otherwise, lines are only checked for a match, which is much faster
+        for lines with many matches, and matching lines get a single interval
+        spanning the whole line.
 
     Returns
     -------
     Generator of matching lines.
     """
-    previous_lines: deque[Line] = deque(maxlen=number_of_lines_before_match)
+    if max_count == 0:
+        return
+    # Lines before a match are kept as (text, index) pairs, so a Line is only
+    # created for the ones which are printed.
+    previous_lines: deque[tuple[str, int]] = deque(maxlen=number_of_lines_before_match)
     last_matched_line_index = -1
+    number_of_matching_lines = 0
 
     for i, current_line in enumerate(lines):
-        matching_intervals = _get_matching_intervals(regex, current_line)
         current_line = current_line.rstrip("\r\n")
+        if number_of_matching_lines == max_count:
+            # Only the lines after the last match are left.
+            yield Line(current_line, [], i)
+            if i - last_matched_line_index == number_of_lines_after_match:
+                return
+            continue
+        if find_intervals:
+            matching_intervals = matcher.find_intervals(current_line)
+            is_match = len(matching_intervals) > 0 or (
+                matcher.can_match_empty and matcher.matches(current_line)
+            )
+        else:
+            is_match = matcher.matches(current_line)
+            matching_intervals = _get_whole_line_intervals(current_line, is_match)
 
-        if len(matching_intervals) > 0:
+        if is_match:
             while len(previous_lines) > 0:
-                yield previous_lines.popleft()
-            yield Line(current_line, matching_intervals, i)
+                previous_text, previous_index = previous_lines.popleft()
+                yield Line(previous_text, [], previous_index)
+            yield Line(
+                current_line,
+                matching_intervals,
+                i,
+                has_only_empty_matches=len(matching_intervals) == 0,
+            )
             last_matched_line_index = i
+            number_of_matching_lines += 1
+            if (
+                number_of_matching_lines == max_count
+                and number_of_lines_after_match == 0
+            ):
+                return
         else:
             if (
                 number_of_lines_before_match > 0
@@ -48,7 +81,7 @@ def find_matching_lines(
             ):
                 previous_lines.popleft()
             if len(previous_lines) < number_of_lines_before_match:
-                previous_lines.append(Line(current_line, [], i))
+                previous_lines.append((current_line, i))
             if (
                 last_matched_line_index >= 0
                 and i - last_matched_line_index <= number_of_lines_after_match
@@ -56,3 +89,299 @@ def find_matching_lines(
                 while len(previous_lines) > 0:
                     previous_lines.popleft()
                 yield Line(current_line, [], i)
+
+
+def _get_whole_line_intervals(line: str, is_match: bool) -> list[Interval]:
+    # Used instead of the matching intervals when they are not needed, e.g. when
+    # they are not highlighted. An empty line can only have empty matches.
+    return [Interval(0, len(line))] if is_match and len(line) > 0 else []
+
+
+def count_matching_lines(
+    matcher: Matcher, lines: Iterable[str], max_count: int | None = None
+) -> int:
+    """Count matching lines in a given iterable of lines.
+
+    Parameters
+    ----------
+    matcher : Matcher for the pattern to search for.
+    lines : Iterable of lines to search.
+    max_count : Maximum number of matching lines to count. The rest of the lines
+        is not searched once it is reached.
+
+    Returns
+    -------
+    Number of matching lines.
+    """
+    number_of_matching_lines = 0
+    if max_count == 0:
+        return number_of_matching_lines
+    for line in lines:
+        if matcher.matches(line.rstrip("\r\n")):
+            number_of_matching_lines += 1
+            if number_of_matching_lines == max_count:
+                break
+    return number_of_matching_lines
+
+
+def _get_line_text(
+    block: str | bytes, start: int, end: int, encoding: str, errors: str
+) -> str:
+    text = block[start:end]
+    if isinstance(text, bytes):
+        text = text.decode(encoding, errors)
+    return text.rstrip("\r\n")
+
+
+def find_matching_lines_in_blocks(
+    matcher: Matcher,
+    blocks: Iterable[str] | Iterable[bytes],
+    number_of_lines_before_match: int,
+    number_of_lines_after_match: int,
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    max_count: int | None = None,
+    find_intervals: bool = True,
+) -> Generator[Line, None, None]:
+    """Find matching lines in a given iterable of blocks of text.
+
+    Instead of running the matcher on every line, the matcher searches the whole
+    block and line boundaries are only looked up around the candidate matches.
+    The generated lines are the same as the ones generated by find_matching_lines.
+
+    Parameters
+    ----------
+    matcher : Matcher for the pattern to search for. It must support buffer search
+        for str blocks and bytes search for bytes blocks.
+    blocks : Iterable of blocks to search. Each block must consist of whole lines.
+        Bytes blocks are only decoded for the lines which are generated.
+    number_of_lines_before_match : Number of lines to include before a match.
+    number_of_lines_after_match : Number of lines to include after a match.
+    encoding : Encoding of bytes blocks (only UTF-8 is supported by the matchers).
+    errors : Error handling scheme used when decoding bytes blocks.
+    max_count : Maximum number of matching lines. Once it is reached, only the
+        lines after the last match are generated and the rest is not searched.
+    find_intervals : Indicates whether the matching intervals of the lines are
+        found, like in find_matching_lines.
+
+    Returns
+    -------
+    Generator of matching lines. The lines of bytes blocks have their byte offset.
+    """
+    if max_count == 0:
+        return
+    previous_lines: deque[Line] = deque(maxlen=number_of_lines_before_match)
+    number_of_lines_left_after_match = 0
+    line_index = 0  # Index of the first line which has not been processed yet.
+    number_of_matching_lines = 0
+    block_offset = 0  # Offset of the block from the start of the first one.
+    blocks = iter(blocks)
+
+    for block in blocks:
+        # Offsets are only known in bytes for bytes blocks.
+        if isinstance(block, bytes):
+            newline, search, offset = b"\n", matcher.search_bytes, block_offset
+        else:
+            newline, search, offset = "\n", matcher.search_buffer, None
+        block_length = len(block)
+        cursor = 0  # Start of the first line which has not been processed yet.
+        search_start = 0
+
+        while cursor < block_length:
+            if search_start < block_length:
+                match_start = search(block, search_start)
+            else:
+                match_start = -1
+
+            # An empty match at the end of a block ending with a line terminator
+            # is not on a line.
+            if match_start == block_length and block.endswith(newline):
+                match_start = -1
+
+            if match_start == -1:
+                line_start = block_length
+            else:
+                line_start = block.rfind(newline, 0, match_start) + 1
+                line_end = block.find(newline, match_start)
+                if line_end == -1:
+                    line_end = block_length
+                text = _get_line_text(block, line_start, line_end, encoding, errors)
+                if find_intervals:
+                    matching_intervals = matcher.find_intervals(text)
+                    is_match = len(matching_intervals) > 0 or (
+                        matcher.can_match_empty and matcher.matches(text)
+                    )
+                else:
+                    is_match = matcher.matches(text)
+                    matching_intervals = _get_whole_line_intervals(text, is_match)
+                if not is_match:
+                    search_start = line_end + 1
+                    continue
+
+            # All lines between the cursor and the matching line do not match.
+            number_of_lines = block.count(newline, cursor, line_start)
+            if match_start == -1 and not block.endswith(newline):
+                number_of_lines += 1
+
+            number_of_lines_to_print = min(
+                number_of_lines, number_of_lines_left_after_match
+            )
+            position = cursor
+            for i in range(number_of_lines_to_print):
+                end = block.find(newline, position, line_start)
+                if end == -1:
+                    end = line_start
+                yield Line(
+                    _get_line_text(block, position, end, encoding, errors),
+                    [],
+                    line_index + i,
+                    None if offset is None else offset + position,
+                )
+                position = end + 1
+            number_of_lines_left_after_match -= number_of_lines_to_print
+
+            number_of_lines_to_keep = min(
+                number_of_lines - number_of_lines_to_print,
+                number_of_lines_before_match,
+            )
+            kept_lines = []
+            end = line_start
+            if number_of_lines_to_keep > 0 and block[end - 1 : end] == newline:
+                end -= 1
+            for i in range(number_of_lines_to_keep):
+                start = block.rfind(newline, cursor, end) + 1
+                if start == 0:
+                    start = cursor
+                kept_lines.append(
+                    Line(
+                        _get_line_text(block, start, end, encoding, errors),
+                        [],
+                        line_index + number_of_lines - 1 - i,
+                        None if offset is None else offset + start,
+                    )
+                )
+                end = start - 1
+            previous_lines.extend(reversed(kept_lines))
+            line_index += number_of_lines
+
+            if match_start == -1:
+                break
+
+            while len(previous_lines) > 0:
+                yield previous_lines.popleft()
+            yield Line(
+                text,
+                matching_intervals,
+                line_index,
+                None if offset is None else offset + line_start,
+                len(matching_intervals) == 0,
+            )
+            number_of_lines_left_after_match = number_of_lines_after_match
+            line_index += 1
+            cursor = search_start = line_end + 1
+
+            number_of_matching_lines += 1
+            if number_of_matching_lines == max_count:
+                yield from _get_lines_in_blocks(
+                    block,
+                    cursor,
+                    blocks,
+                    line_index,
+                    block_offset,
+                    number_of_lines_after_match,
+                    encoding,
+                    errors,
+                )
+                return
+
+        block_offset += block_length
+
+
+def _get_lines_in_blocks(
+    block: str | bytes,
+    cursor: int,
+    next_blocks: Iterator[str] | Iterator[bytes],
+    line_index: int,
+    block_offset: int,
+    number_of_lines: int,
+    encoding: str,
+    errors: str,
+) -> Generator[Line, None, None]:
+    # Generates the given number of lines as they are, starting at the cursor.
+    while number_of_lines > 0:
+        is_bytes = isinstance(block, bytes)
+        newline = b"\n" if is_bytes else "\n"
+        while cursor < len(block) and number_of_lines > 0:
+            end = block.find(newline, cursor)
+            if end == -1:
+                end = len(block)
+            yield Line(
+                _get_line_text(block, cursor, end, encoding, errors),
+                [],
+                line_index,
+                block_offset + cursor if is_bytes else None,
+            )
+            line_index += 1
+            number_of_lines -= 1
+            cursor = end + 1
+        block_offset += len(block)
+        block = next(next_blocks, None)
+        if block is None:
+            return
+        cursor = 0
+
+
+def count_matching_lines_in_blocks(
+    matcher: Matcher,
+    blocks: Iterable[str] | Iterable[bytes],
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    max_count: int | None = None,
+) -> int:
+    """Count matching lines in a given iterable of blocks of text.
+
+    Like find_matching_lines_in_blocks, only the lines around the candidate
+    matches are looked at, and no Line objects are created.
+
+    Parameters
+    ----------
+    matcher : Matcher for the pattern to search for. It must support buffer search
+        for str blocks and bytes search for bytes blocks.
+    blocks : Iterable of blocks to search. Each block must consist of whole lines.
+    encoding : Encoding of bytes blocks (only UTF-8 is supported by the matchers).
+    errors : Error handling scheme used when decoding bytes blocks.
+    max_count : Maximum number of matching lines to count. The rest of the blocks
+        is not searched once it is reached.
+
+    Returns
+    -------
+    Number of matching lines.
+    """
+    number_of_matching_lines = 0
+    if max_count == 0:
+        return number_of_matching_lines
+    for block in blocks:
+        if isinstance(block, bytes):
+            newline, search = b"\n", matcher.search_bytes
+        else:
+            newline, search = "\n", matcher.search_buffer
+        block_length = len(block)
+        search_start = 0
+        while search_start < block_length:
+            match_start = search(block, search_start)
+            if match_start == -1 or (
+                match_start == block_length and block.endswith(newline)
+            ):
+                break
+            line_start = block.rfind(newline, 0, match_start) + 1
+            line_end = block.find(newline, match_start)
+            if line_end == -1:
+                line_end = block_length
+            if matcher.matches(
+                _get_line_text(block, line_start, line_end, encoding, errors)
+            ):
+                number_of_matching_lines += 1
+                if number_of_matching_lines == max_count:
+                    return number_of_matching_lines
+            search_start = line_end + 1
+    return number_of_matching_lines
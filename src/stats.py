@@ -0,0 +1,129 @@
+import time
+from collections.abc import Generator, Iterable
+from typing import TextIO, TypeVar
+
+T = TypeVar("T")
+
+# Stages of a search: listing directories, reading files, matching lines and
+# printing the results (which includes everything not done by the other stages).
+STAGES = ("walker", "reader", "matcher", "printer")
+
+
+class Stats:
+    """Counters and time spent in each stage of a search, reported with --stats.
+
+    The stages are generators feeding each other, so time is only attributed to
+    the innermost running stage, and the times of the stages add up to the time
+    of the search.
+
+    Attributes
+    ----------
+    number_of_files : Number of files searched.
+    number_of_bytes : Number of bytes read (characters when reading decoded text).
+    number_of_lines : Number of lines read.
+    number_of_matching_lines : Number of matching lines.
+    wall_times : Wall clock time in seconds spent in each stage.
+    cpu_times : CPU time in seconds of the process spent in each stage.
+    """
+
+    def __init__(self) -> None:
+        """Create a new Stats instance, with all the counters at zero."""
+        self.number_of_files: int = 0
+        self.number_of_bytes: int = 0
+        self.number_of_lines: int = 0
+        self.number_of_matching_lines: int = 0
+        self.wall_times: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.cpu_times: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+
+        self._running_stages: list[str] = []
+        self._last_switch_wall_time: float = 0.0
+        self._last_switch_cpu_time: float = 0.0
+
+    def _switch(self) -> None:
+        wall_time = time.perf_counter()
+        cpu_time = time.process_time()
+        if len(self._running_stages) > 0:
+            stage = self._running_stages[-1]
+            self.wall_times[stage] += wall_time - self._last_switch_wall_time
+            self.cpu_times[stage] += cpu_time - self._last_switch_cpu_time
+        self._last_switch_wall_time = wall_time
+        self._last_switch_cpu_time = cpu_time
+
+    def start(self, stage: str) -> None:
+        """Start a stage, pausing the one which is running.
+
+        Parameters
+        ----------
+        stage : Stage to start, one of STAGES.
+        """
+        self._switch()
+        self._running_stages.append(stage)
+
+    def stop(self) -> None:
+        """Stop the running stage, resuming the one it was started from."""
+        self._switch()
+        self._running_stages.pop()
+
+    def time_iterator(
+        self, stage: str, iterable: Iterable[T]
+    ) -> Generator[T, None, None]:
+        """Attribute the time spent producing the items of an iterable to a stage.
+
+        Parameters
+        ----------
+        stage : Stage of the iterable, one of STAGES.
+        iterable : Iterable to time.
+
+        Returns
+        -------
+        Generator of the items of the iterable.
+        """
+        iterator = iter(iterable)
+        while True:
+            self.start(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.stop()
+            yield item
+
+    def merge(self, other: "Stats") -> None:
+        """Add the counters and times of another search, e.g. of a worker process.
+
+        Parameters
+        ----------
+        other : Stats to add.
+        """
+        self.number_of_files += other.number_of_files
+        self.number_of_bytes += other.number_of_bytes
+        self.number_of_lines += other.number_of_lines
+        self.number_of_matching_lines += other.number_of_matching_lines
+        for stage in STAGES:
+            self.wall_times[stage] += other.wall_times[stage]
+            self.cpu_times[stage] += other.cpu_times[stage]
+
+    def print_report(self, file: TextIO) -> None:
+        """Print the counters and the time spent in each stage.
+
+        Parameters
+        ----------
+        file : File to print to.
+        """
+        print(f"files searched: {self.number_of_files}", file=file)
+        print(f"bytes read: {self.number_of_bytes}", file=file)
+        print(f"lines read: {self.number_of_lines}", file=file)
+        print(f"matching lines: {self.number_of_matching_lines}", file=file)
+        print(f"{'stage':<8} {'wall (s)':>10} {'cpu (s)':>10}", file=file)
+        for stage in STAGES:
+            print(
+                f"{stage:<8} {self.wall_times[stage]:>10.4f} "
+                f"{self.cpu_times[stage]:>10.4f}",
+                file=file,
+            )
+        print(
+            f"{'total':<8} {sum(self.wall_times.values()):>10.4f} "
+            f"{sum(self.cpu_times.values()):>10.4f}",
+            file=file,
+        )
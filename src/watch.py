@@ -0,0 +1,105 @@
+import os
+import struct
+
+# inotify events, see inotify(7).
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+# Events which are not asked for: events were lost, or a watch was removed.
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+class DirectoryWatcher:
+    """Watches directories for changes with inotify (Linux only).
+
+    The watcher is a file descriptor which becomes readable when events are
+    available, so it can be waited for with select.
+    """
+
+    def __init__(self) -> None:
+        """Create a watcher without any watched directories.
+
+        OSError is raised if no inotify instance can be created, and
+        AttributeError if inotify is not available (not on Linux).
+        """
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._get_errno = ctypes.get_errno
+        self._fd: int = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: dict[int, str] = {}
+
+    def fileno(self) -> int:
+        """Get the file descriptor of the watcher.
+
+        Returns
+        -------
+        File descriptor, readable when events are available.
+        """
+        return self._fd
+
+    def add(self, directory: str, events: int) -> None:
+        """Watch a directory.
+
+        OSError is raised if it cannot be watched, e.g. when there are no inotify
+        watches left.
+
+        Parameters
+        ----------
+        directory : Path of the directory to watch.
+        events : Mask of the events to watch for, e.g. IN_CREATE | IN_DELETE.
+        """
+        watch_descriptor = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), events
+        )
+        if watch_descriptor < 0:
+            error = self._get_errno()
+            raise OSError(error, os.strerror(error), directory)
+        self._directories[watch_descriptor] = directory
+
+    def read_events(self) -> list[tuple[str | None, int, str]]:
+        """Read the events which are available, without waiting.
+
+        Returns
+        -------
+        List of (directory, mask, name) tuples, where name is the name of the file
+        in the directory the event is about, or an empty string if the event is
+        about the directory itself. The directory is None for IN_Q_OVERFLOW.
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                return events
+            position = 0
+            while position < len(data):
+                watch_descriptor, mask, _, name_length = _EVENT_HEADER.unpack_from(
+                    data, position
+                )
+                position += _EVENT_HEADER.size
+                name = os.fsdecode(
+                    data[position : position + name_length].rstrip(b"\0")
+                )
+                position += name_length
+                directory = self._directories.get(watch_descriptor)
+                if mask & IN_IGNORED:
+                    self._directories.pop(watch_descriptor, None)
+                events.append((directory, mask, name))
+
+    def close(self) -> None:
+        """Stop watching and close the watcher."""
+        os.close(self._fd)
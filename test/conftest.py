@@ -0,0 +1,5 @@
+import os
+
+# Validate every Interval and Line created in the tests. It must be set before
+# src.line is imported.
+os.environ["GREP_VALIDATE_LINES"] = "1"
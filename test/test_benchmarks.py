@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.corpus import MATCH_WORD, generate_text
+from benchmarks.run import BENCHMARKS, CORPORA, parse_arguments, run_benchmark
+
+
+def test_generate_text_is_deterministic():
+    text = generate_text(1, 1000, 80, 0.1)
+
+    assert text == generate_text(1, 1000, 80, 0.1)
+    assert text != generate_text(2, 1000, 80, 0.1)
+    assert text.count("\n") == 1000
+    assert 0 < text.count(MATCH_WORD) < 1000
+
+
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_run_benchmark(tmp_path: Path, name: str):
+    corpus = CORPORA[BENCHMARKS[name].corpus](tmp_path / "corpus", 0.01)
+
+    result = run_benchmark(name, corpus, repeat=1)
+
+    assert result.name == name
+    assert result.seconds > 0
+    assert result.megabytes_per_second > 0
+
+
+def test_help_lists_benchmarks(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    monkeypatch.setattr("sys.argv", ["run.py", "--help"])
+
+    with pytest.raises(SystemExit) as exit_info:
+        parse_arguments()
+
+    assert exit_info.value.code == 0
+    assert "0.05% of lines match" in capsys.readouterr().out
@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from src.cache import ResultCache
+from src.line import Interval, Line
+
+RESULTS = [
+    Line("before", [], 0, 0),
+    Line("match", [Interval(0, 5, 1)], 1, 7),
+    Line("text", [], 2),
+    Line("", [], 3, has_only_empty_matches=True),
+    "binary file matches",
+    3,
+]
+
+
+def create_old_file(path: Path, text: str) -> Path:
+    # Recently modified files are not cached.
+    path.write_text(text)
+    os.utime(path, (1_000_000_000, 1_000_000_000))
+    return path
+
+
+def test_get_cached_results(tmp_path: Path):
+    file = create_old_file(tmp_path / "file.txt", "match\n")
+    cache = ResultCache(str(tmp_path / "cache"), "query")
+    version = cache.get_file_version(file)
+    assert cache.get(file, version) is None
+
+    cache.put(file, version, RESULTS)
+    cache.close()
+
+    cache = ResultCache(str(tmp_path / "cache"), "query")
+    assert cache.get(file, cache.get_file_version(file)) == RESULTS
+    assert [line.offset for line in cache.get(file, version)[:3]] == [0, 7, None]
+    cache.close()
+    cache = ResultCache(str(tmp_path / "cache"), "other query")
+    assert cache.get(file, version) is None
+    cache.close()
+
+
+def test_get_modified_file(tmp_path: Path):
+    file = create_old_file(tmp_path / "file.txt", "match\n")
+    cache = ResultCache(str(tmp_path / "cache"), "query")
+    cache.put(file, cache.get_file_version(file), RESULTS)
+
+    # The size and modification time do not change, but the change time does.
+    file.write_text("other\n")
+    os.utime(file, (1_000_000_000, 1_000_000_000))
+
+    assert cache.get(file, cache.get_file_version(file)) is None
+    cache.close()
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        pytest.param("missing.txt", id="missing"),
+        pytest.param("recent.txt", id="recently_modified"),
+    ],
+)
+def test_get_file_version_not_cached(tmp_path: Path, name: str):
+    (tmp_path / "recent.txt").write_text("match\n")
+    cache = ResultCache(str(tmp_path / "cache"), "query")
+
+    assert cache.get_file_version(tmp_path / name) is None
+    cache.close()
+
+
+def test_evict_least_recently_used(tmp_path: Path):
+    files = [create_old_file(tmp_path / f"file{i}.txt", "match\n") for i in range(3)]
+    cache = ResultCache(str(tmp_path / "cache"), "query")
+    for file in files:
+        cache.put(file, cache.get_file_version(file), [Line("x" * 100, [], 0)])
+    cache.close()
+
+    # Results are evicted when the cache is closed, starting with the ones which
+    # were used the longest time ago.
+    cache = ResultCache(str(tmp_path / "cache"), "query", max_size=150)
+    cache._time += 1
+    cache.get(files[0], cache.get_file_version(files[0]))
+    cache.close()
+    cache = ResultCache(str(tmp_path / "cache"), "query", max_size=150)
+    cached_files = [
+        file
+        for file in files
+        if cache.get(file, cache.get_file_version(file)) is not None
+    ]
+    cache.close()
+
+    assert cached_files == [files[0]]
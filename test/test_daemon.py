@@ -0,0 +1,136 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from src.daemon import forward
+
+ROOT_DIRECTORY = Path(__file__).parent.parent
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="the daemon uses Unix domain sockets"
+)
+
+
+def is_listening(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path) -> Generator[str, None, None]:
+    socket_path = str(tmp_path / "grepd.sock")
+    daemon = subprocess.Popen(
+        [sys.executable, "-m", "src.main", "daemon", "start", "--socket", socket_path],
+        cwd=ROOT_DIRECTORY,
+    )
+    # The socket is created before the daemon listens on it, so it is only ready
+    # once a connection succeeds.
+    deadline = time.monotonic() + 10
+    while not is_listening(socket_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield socket_path
+    daemon.send_signal(signal.SIGINT)
+    assert daemon.wait(timeout=10) == 0
+    assert not os.path.exists(socket_path)
+
+
+def test_forward_without_daemon(tmp_path: Path):
+    assert forward(str(tmp_path / "grepd.sock"), ["test", "file.txt"]) is None
+
+
+@pytest.mark.parametrize(
+    "arguments, expected_exit_status, expected_output",
+    [
+        pytest.param(
+            ["-n", "--color", "never", "test", "test_file.txt"],
+            0,
+            "1:test\n--\n3:test\n",
+            id="match",
+        ),
+        pytest.param(
+            ["--color", "never", "missing", "test_file.txt"], 1, "", id="no_match"
+        ),
+        pytest.param(["-A"], 2, "", id="usage_error"),
+    ],
+)
+def test_forward(
+    socket_path: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capfd: pytest.CaptureFixture[str],
+    arguments: list[str],
+    expected_exit_status: int,
+    expected_output: str,
+):
+    (tmp_path / "test_file.txt").write_text("test\nnot a match\ntest")
+    # The search runs in the working directory of the client.
+    monkeypatch.chdir(tmp_path)
+
+    exit_status = forward(socket_path, arguments)
+
+    # The daemon writes to the standard streams of the client.
+    captured = capfd.readouterr()
+    assert exit_status == expected_exit_status
+    assert captured.out == expected_output
+    if expected_exit_status == 2:
+        assert "usage:" in captured.err
+
+
+def test_forward_recursive_search_after_change(
+    socket_path: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capfd: pytest.CaptureFixture[str],
+):
+    directory = tmp_path / "directory"
+    directory.mkdir()
+    (directory / "test_file1.txt").write_text("test\n")
+    monkeypatch.chdir(tmp_path)
+    arguments = ["-r", "-c", "test", "directory"]
+
+    assert forward(socket_path, arguments) == 0
+    assert capfd.readouterr().out == f"{Path('directory/test_file1.txt')}:1\n"
+
+    # The listing of the directory kept by the daemon is out of date.
+    (directory / "test_file2.txt").write_text("test\ntest\n")
+    assert forward(socket_path, arguments) == 0
+    assert sorted(capfd.readouterr().out.splitlines()) == [
+        f"{Path('directory/test_file1.txt')}:1",
+        f"{Path('directory/test_file2.txt')}:2",
+    ]
+
+
+def test_forwarded_search_imports(socket_path: str, tmp_path: Path):
+    (tmp_path / "test_file.txt").write_text("test\n")
+
+    # -X importtime reports every imported module on standard error.
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.main", "test"]
+        + [str(tmp_path / "test_file.txt")],
+        cwd=ROOT_DIRECTORY,
+        env=dict(os.environ, GREPD_SOCKET=socket_path),
+        capture_output=True,
+        text=True,
+    )
+    imported_modules = {
+        line.split("|")[-1].strip()
+        for line in process.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+    # The arguments are only parsed by the daemon.
+    assert process.stdout == "test\n"
+    assert "src.daemon" in imported_modules
+    assert "argparse" not in imported_modules
+    assert "src.grep" not in imported_modules
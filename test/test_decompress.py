@@ -0,0 +1,73 @@
+import bz2
+import gzip
+import io
+import lzma
+import sys
+
+import pytest
+
+from src.decompress import DecompressionError, get_compression_format, open_decompressed
+
+DATA = b"first line\nsecond line\n" * 1000
+
+
+@pytest.mark.parametrize(
+    "data, expected_format",
+    [
+        pytest.param(gzip.compress(DATA), "gzip", id="gzip"),
+        pytest.param(bz2.compress(DATA), "bzip2", id="bzip2"),
+        pytest.param(lzma.compress(DATA), "xz", id="xz"),
+        pytest.param(b"\x28\xb5\x2f\xfd", "zstd", id="zstd"),
+        pytest.param(DATA, None, id="not_compressed"),
+        pytest.param(b"", None, id="empty"),
+    ],
+)
+def test_get_compression_format(data: bytes, expected_format: str | None):
+    file = io.BufferedReader(io.BytesIO(data))
+
+    assert get_compression_format(file) == expected_format
+    # Nothing is consumed.
+    assert file.read() == data
+
+
+@pytest.mark.parametrize(
+    "compress",
+    [
+        pytest.param(gzip.compress, id="gzip"),
+        pytest.param(bz2.compress, id="bzip2"),
+        pytest.param(lzma.compress, id="xz"),
+    ],
+)
+def test_open_decompressed(compress):
+    file = io.BufferedReader(io.BytesIO(compress(DATA)))
+
+    decompressed_file = open_decompressed(file, 1024)
+
+    assert decompressed_file.peek(10)[:10] == DATA[:10]
+    assert decompressed_file.read() == DATA
+    # The decompressed data cannot be memory mapped.
+    with pytest.raises(io.UnsupportedOperation):
+        decompressed_file.fileno()
+
+
+def test_open_decompressed_not_compressed():
+    file = io.BufferedReader(io.BytesIO(DATA))
+
+    assert open_decompressed(file, 1024) is file
+
+
+def test_open_decompressed_invalid_data():
+    file = io.BufferedReader(io.BytesIO(gzip.compress(DATA)[:100]))
+
+    decompressed_file = open_decompressed(file, 1024)
+
+    with pytest.raises(DecompressionError, match="invalid compressed data"):
+        decompressed_file.read()
+
+
+def test_open_decompressed_zstd_not_installed(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    file = io.BufferedReader(io.BytesIO(b"\x28\xb5\x2f\xfd"))
+
+    with pytest.raises(DecompressionError, match="install zstandard"):
+        open_decompressed(file, 1024)
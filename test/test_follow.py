@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import src.follow
+from src.follow import follow_lines
+from src.grep import grep
+from src.matcher import create_matcher
+from src.search import find_matching_lines
+
+
+def _append(path: Path, text: str):
+    with open(path, "a") as file:
+        file.write(text)
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def waiter(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch):
+    if request.param == "polling":
+
+        def raise_error(path: str):
+            raise OSError
+
+        monkeypatch.setattr(src.follow, "_InotifyWaiter", raise_error)
+    return request.param
+
+
+def test_follow_lines_generates_appended_lines(tmp_path: Path, waiter: str):
+    path = tmp_path / "log.txt"
+    path.write_text("a\nb\n")
+    lines = follow_lines(str(path), "utf-8")
+
+    assert [next(lines), next(lines)] == ["a", "b"]
+    _append(path, "c\nd")
+    assert next(lines) == "c"
+    # The incomplete line is only generated once it is terminated.
+    _append(path, "e\n")
+    assert next(lines) == "de"
+    lines.close()
+
+
+def test_follow_lines_reads_truncated_file_from_start(tmp_path: Path, waiter: str):
+    path = tmp_path / "log.txt"
+    path.write_text("first\nsecond\n")
+    lines = follow_lines(str(path), "utf-8")
+    assert [next(lines), next(lines)] == ["first", "second"]
+
+    path.write_text("new\n")
+    assert next(lines) == "new"
+    lines.close()
+
+
+def test_follow_lines_follows_rotated_file(tmp_path: Path, waiter: str):
+    path = tmp_path / "log.txt"
+    path.write_text("old\n")
+    lines = follow_lines(str(path), "utf-8")
+    assert next(lines) == "old"
+
+    # The lines written to the old file before it is replaced are not lost.
+    _append(path, "last")
+    os.rename(path, tmp_path / "log.txt.1")
+    path.write_text("new\n")
+    assert [next(lines), next(lines)] == ["last", "new"]
+    _append(path, "appended\n")
+    assert next(lines) == "appended"
+    lines.close()
+
+
+def test_follow_lines_stops(tmp_path: Path):
+    path = tmp_path / "log.txt"
+    path.write_text("a\nb")
+
+    assert list(follow_lines(str(path), "utf-8", should_stop=lambda: True)) == [
+        "a",
+        "b",
+    ]
+
+
+def test_find_matching_lines_keeps_context_across_reads(tmp_path: Path):
+    path = tmp_path / "log.txt"
+    path.write_text("before\n")
+    lines = follow_lines(str(path), "utf-8")
+    results = find_matching_lines(create_matcher("match"), lines, 1, 1)
+
+    _append(path, "match\n")
+    assert [next(results).text, next(results).text] == ["before", "match"]
+    _append(path, "after\nignored\n")
+    assert next(results).text == "after"
+    results.close()
+
+
+def test_grep_follow_stops_at_max_count(
+    tmp_path: Path, capsys: pytest.CaptureFixture, waiter: str
+):
+    path = tmp_path / "log.txt"
+    path.write_text("a\n")
+
+    def write_lines():
+        time.sleep(0.1)
+        _append(path, "b\nmatch\n")
+
+    writer = threading.Thread(target=write_lines)
+    writer.start()
+    has_match = grep(
+        "match", [str(path)], False, True, 0, 0, color="never", max_count=1, follow=True
+    )
+    writer.join()
+
+    assert has_match
+    assert capsys.readouterr().out == "3:match\n"
+
+
+@pytest.mark.parametrize(
+    "files, recursive, message",
+    [
+        pytest.param(
+            ["a", "b"], False, "Only one file can be followed!", id="two_files"
+        ),
+        pytest.param(["a"], True, "Only one file can be followed!", id="recursive"),
+        pytest.param(["missing"], False, "missing: file does not exist", id="missing"),
+    ],
+)
+def test_grep_follow_errors(
+    files: list[str], recursive: bool, message: str, capsys: pytest.CaptureFixture
+):
+    assert not grep("a", files, recursive, False, 0, 0, follow=True)
+    assert capsys.readouterr().out == f"{message}\n"
@@ -1,10 +1,33 @@
+import asyncio
+import errno
+import gzip
+import json
+import lzma
+import mmap
+import os
+import threading
+from collections.abc import Generator
+from contextlib import aclosing
 from io import StringIO
 from pathlib import Path
 
 import pytest
 
-from src.grep import grep
+from src.grep import (
+    DirectoryListingCache,
+    Match,
+    Message,
+    SearchOptions,
+    _read_files_ahead,
+    agrep,
+    build_index,
+    grep,
+    search,
+)
+from src.index import TrigramIndex
+from src.line import Interval
 from src.printer import Printer
+from src.stats import Stats
 
 
 def test_grep_single_file(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
@@ -236,3 +259,899 @@ def test_grep_print_lines_before_and_after_match(
         f"not a match 4\n"
         f"not a match 5\n"
     )
+
+
+def test_grep_non_ascii_file(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("zażółć\r\nnot a match\nżółw", encoding="utf-8")
+
+    grep(
+        pattern="żół",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        f"{Printer.LINE_NUMBER_COLOR}1{Printer.SEPARATOR_COLOR}:{Printer.DEFAULT_COLOR}"
+        f"za{Printer.MATCHED_TEXT_COLOR}żół{Printer.DEFAULT_COLOR}ć\n"
+        f"{Printer.SEPARATOR_COLOR}--{Printer.DEFAULT_COLOR}\n"
+        f"{Printer.LINE_NUMBER_COLOR}3{Printer.SEPARATOR_COLOR}:{Printer.DEFAULT_COLOR}"
+        f"{Printer.MATCHED_TEXT_COLOR}żół{Printer.DEFAULT_COLOR}w\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        pytest.param("foo", id="literal_bytes_blocks"),
+        pytest.param("[fg][op][op]", id="regex_text_blocks"),
+        pytest.param("[fg][op](?! )[op]", id="regex_lines"),
+        pytest.param("[fo]+$", id="regex_line_end_anchor"),
+    ],
+)
+def test_grep_carriage_return(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], pattern: str
+):
+    # Only "\n" ends a line, however the file is read.
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_bytes(b"a\rfoo\r\nbar foo\n")
+
+    grep(
+        pattern=pattern,
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        color="never",
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == "1:a\rfoo\n2:bar foo\n"
+
+
+def test_grep_unmappable_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    # Like the files of sysfs, which look like regular files.
+    def fail_to_map(*args, **kwargs):
+        raise OSError(errno.ENODEV, "No such device")
+
+    monkeypatch.setattr(mmap, "mmap", fail_to_map)
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("not a match\ntest\n")
+
+    grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        color="never",
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == "2:test\n"
+
+
+def test_grep_empty_file(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("")
+
+    grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == ""
+
+
+@pytest.mark.parametrize(
+    "pattern,output_mode,expected_output",
+    [
+        pytest.param("^$", "lines", "2:\n", id="empty_line"),
+        pytest.param("^$", "count", "1\n", id="empty_line_count"),
+        pytest.param("", "lines", "1:a\n2:\n3:b\n", id="empty_pattern"),
+        pytest.param("x*", "lines", "1:a\n2:\n3:b\n", id="repeat"),
+        pytest.param("x*", "count", "3\n", id="repeat_count"),
+    ],
+)
+def test_grep_empty_match(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    pattern: str,
+    output_mode: str,
+    expected_output: str,
+):
+    # A line matches even if the pattern only matches an empty string in it.
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("a\n\nb\n")
+
+    result = grep(
+        pattern=pattern,
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        color="never",
+        output_mode=output_mode,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == expected_output
+    assert result
+
+
+@pytest.mark.parametrize(
+    "patterns",
+    [
+        pytest.param(["error", "warning"], id="literals"),
+        pytest.param([r"err\w+", "warn(ing)?"], id="regexes"),
+        pytest.param([r"(e)rror", r"w(a)rn\w+"], id="separate_regexes"),
+    ],
+)
+def test_grep_multiple_patterns(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], patterns: list[str]
+):
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("an error\nnot a match\na warning\n")
+
+    grep(
+        pattern=patterns,
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        f"an {Printer.PATTERN_COLORS[0]}error{Printer.DEFAULT_COLOR}\n"
+        f"{Printer.SEPARATOR_COLOR}--{Printer.DEFAULT_COLOR}\n"
+        f"a {Printer.PATTERN_COLORS[1]}warning{Printer.DEFAULT_COLOR}\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "color,is_terminal,expected_output",
+    [
+        pytest.param(
+            "always",
+            False,
+            f"{Printer.MATCHED_TEXT_COLOR}test{Printer.DEFAULT_COLOR}\n",
+            id="always",
+        ),
+        pytest.param("never", True, "test\n", id="never"),
+        pytest.param("auto", False, "test\n", id="auto_not_terminal"),
+        pytest.param(
+            "auto",
+            True,
+            f"{Printer.MATCHED_TEXT_COLOR}test{Printer.DEFAULT_COLOR}\n",
+            id="auto_terminal",
+        ),
+    ],
+)
+def test_grep_color(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+    color: str,
+    is_terminal: bool,
+    expected_output: str,
+):
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("test\nnot a match")
+    monkeypatch.setattr("sys.stdout.isatty", lambda: is_terminal)
+
+    grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        color=color,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == expected_output
+
+
+@pytest.mark.parametrize(
+    "output_mode,max_count,expected_output,expected_result",
+    [
+        pytest.param("count", None, "{0}:2\n{1}:0\n", True, id="count"),
+        pytest.param("count", 1, "{0}:1\n{1}:0\n", True, id="count_max_count"),
+        pytest.param(
+            "files_with_matches", None, "{0}\n", True, id="files_with_matches"
+        ),
+        pytest.param(
+            "files_without_match", None, "{1}\n", True, id="files_without_match"
+        ),
+        pytest.param("quiet", None, "", True, id="quiet"),
+        pytest.param("quiet", 0, "", False, id="quiet_max_count_zero"),
+        pytest.param("lines", 1, "{0}:test 1\n", True, id="lines_max_count"),
+    ],
+)
+@pytest.mark.parametrize("number_of_jobs", [1, 2])
+def test_grep_output_modes(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    output_mode: str,
+    max_count: int | None,
+    expected_output: str,
+    expected_result: bool,
+    number_of_jobs: int,
+):
+    temp_file1 = tmp_path / "test_file1.txt"
+    temp_file1.write_text("test 1\nnot a match\ntest 2")
+    temp_file2 = tmp_path / "test_file2.txt"
+    temp_file2.write_text("not a match")
+
+    result = grep(
+        pattern="test",
+        files=[str(temp_file1), str(temp_file2)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        number_of_jobs=number_of_jobs,
+        color="never",
+        output_mode=output_mode,
+        max_count=max_count,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == expected_output.format(temp_file1, temp_file2)
+    assert result == expected_result
+
+
+def test_grep_stdin_count(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    monkeypatch.setattr("sys.stdin", StringIO("test\nnot a match\ntest"))
+
+    result = grep(
+        pattern="test",
+        files=[],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        color="never",
+        output_mode="count",
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == "2\n"
+    assert result
+
+
+def test_grep_binary_file_count(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    temp_file = tmp_path / "test_file.bin"
+    temp_file.write_bytes(b"test\0\ntest\n")
+
+    grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        color="never",
+        output_mode="count",
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == "2\n"
+
+
+@pytest.mark.parametrize("output_mode", ["lines", "count"])
+@pytest.mark.parametrize("number_of_jobs", [1, 2])
+def test_grep_stats(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    output_mode: str,
+    number_of_jobs: int,
+):
+    (tmp_path / "test_file1.txt").write_text("test\nnot a match\ntest")
+    (tmp_path / "test_file2.txt").write_text("test\n")
+    stats = Stats()
+
+    grep(
+        pattern="test",
+        files=[str(tmp_path)],
+        recursive=True,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        number_of_jobs=number_of_jobs,
+        output_mode=output_mode,
+        stats=stats,
+    )
+
+    assert stats.number_of_files == 2
+    assert stats.number_of_bytes == 26
+    assert stats.number_of_lines == 4
+    assert stats.number_of_matching_lines == 3
+    assert stats._running_stages == []
+
+
+@pytest.mark.parametrize("preserve_file_order", [True, False])
+def test_grep_multiple_files_in_parallel(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], preserve_file_order: bool
+):
+    files = []
+    for i in range(10):
+        temp_file = tmp_path / f"test_file{i}.txt"
+        temp_file.write_text(f"test {i}\nnot a match\ntest {i}")
+        files.append(str(temp_file))
+    files.append("nonexistent_file")
+
+    grep(
+        pattern="test",
+        files=files,
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+    )
+    serial_output = capsys.readouterr().out
+
+    grep(
+        pattern="test",
+        files=files,
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        number_of_jobs=3,
+        preserve_file_order=preserve_file_order,
+    )
+    parallel_output = capsys.readouterr().out
+
+    if preserve_file_order:
+        assert parallel_output == serial_output
+    else:
+        assert sorted(parallel_output.splitlines()) == sorted(
+            serial_output.splitlines()
+        )
+
+
+@pytest.mark.parametrize("number_of_walker_threads", [1, 4])
+def test_grep_recursive_nested_directories(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    number_of_walker_threads: int,
+):
+    expected_lines = []
+    for i in range(5):
+        directory = tmp_path.joinpath(*[f"dir{j}" for j in range(i)])
+        directory.mkdir(parents=True, exist_ok=True)
+        temp_file = directory / "test_file.txt"
+        temp_file.write_text("test\nnot a match")
+        expected_lines.append(
+            f"{Printer.FILENAME_COLOR}{temp_file}{Printer.SEPARATOR_COLOR}:{Printer.DEFAULT_COLOR}"
+            f"{Printer.MATCHED_TEXT_COLOR}test{Printer.DEFAULT_COLOR}"
+        )
+    # A symlink loop must not be followed more than once.
+    (tmp_path / "dir0" / "loop").symlink_to(tmp_path, target_is_directory=True)
+
+    grep(
+        pattern="test",
+        files=[str(tmp_path)],
+        recursive=True,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        number_of_walker_threads=number_of_walker_threads,
+    )
+
+    captured = capsys.readouterr()
+    output_lines = [
+        line
+        for line in captured.out.splitlines()
+        if line != f"{Printer.SEPARATOR_COLOR}--{Printer.DEFAULT_COLOR}"
+    ]
+    assert sorted(output_lines) == sorted(expected_lines)
+
+
+@pytest.mark.parametrize("use_ignore_files", [True, False])
+def test_grep_recursive_ignore_files(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], use_ignore_files: bool
+):
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "test_file.txt").write_text("test")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "test_file.txt").write_text("test")
+    (tmp_path / "test_file.log").write_text("test")
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("test")
+
+    grep(
+        pattern="test",
+        files=[str(tmp_path)],
+        recursive=True,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        use_ignore_files=use_ignore_files,
+    )
+
+    captured = capsys.readouterr()
+    output_lines = [
+        line
+        for line in captured.out.splitlines()
+        if line != f"{Printer.SEPARATOR_COLOR}--{Printer.DEFAULT_COLOR}"
+    ]
+    assert len(output_lines) == (1 if use_ignore_files else 4)
+    if use_ignore_files:
+        assert output_lines[0].startswith(f"{Printer.FILENAME_COLOR}{temp_file}")
+
+
+@pytest.mark.parametrize(
+    "binary_files,expected_output",
+    [
+        pytest.param("binary", "{file}: file is binary\n", id="binary"),
+        pytest.param("skip", "", id="skip"),
+        pytest.param(
+            "text",
+            f"{Printer.MATCHED_TEXT_COLOR}test{Printer.DEFAULT_COLOR}\0\n",
+            id="text",
+        ),
+        pytest.param("match", "{file}: binary file matches\n", id="match"),
+    ],
+)
+def test_grep_binary_files(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    binary_files: str,
+    expected_output: str,
+):
+    temp_file = tmp_path / "test_file.bin"
+    temp_file.write_bytes(b"test\0\nnot a match\n")
+
+    grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        binary_files=binary_files,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == expected_output.format(file=temp_file)
+
+
+def test_grep_binary_file_without_match(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    temp_file = tmp_path / "test_file.bin"
+    temp_file.write_bytes(b"\0\xff")
+
+    grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        binary_files="match",
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == ""
+
+
+def test_grep_recursive_use_index(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    temp_file1 = tmp_path / "test_file1.txt"
+    temp_file1.write_text("test")
+    temp_file2 = tmp_path / "test_file2.txt"
+    temp_file2.write_text("not a match")
+    build_index(str(tmp_path))
+    # Files changed after building the index are still searched.
+    temp_file3 = tmp_path / "test_file3.txt"
+    temp_file3.write_text("test")
+    capsys.readouterr()
+
+    grep(
+        pattern="t.st",
+        files=[str(tmp_path)],
+        recursive=True,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        use_index=True,
+    )
+
+    captured = capsys.readouterr()
+    assert sorted(captured.out.splitlines()) == sorted(
+        [
+            f"{Printer.FILENAME_COLOR}{temp_file1}{Printer.SEPARATOR_COLOR}:{Printer.DEFAULT_COLOR}"
+            f"{Printer.MATCHED_TEXT_COLOR}test{Printer.DEFAULT_COLOR}",
+            f"{Printer.SEPARATOR_COLOR}--{Printer.DEFAULT_COLOR}",
+            f"{Printer.FILENAME_COLOR}{temp_file3}{Printer.SEPARATOR_COLOR}:{Printer.DEFAULT_COLOR}"
+            f"{Printer.MATCHED_TEXT_COLOR}test{Printer.DEFAULT_COLOR}",
+        ]
+    )
+
+
+def test_grep_recursive_use_index_search_zip(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+):
+    temp_file = tmp_path / "test_file.gz"
+    temp_file.write_bytes(gzip.compress(b"test\n"))
+    build_index(str(tmp_path))
+    capsys.readouterr()
+    # The index has the trigrams of the data on disk, which may filter out the
+    # compressed files matching once decompressed.
+    monkeypatch.setattr(
+        TrigramIndex, "filter_candidate_files", lambda self, files, literals: []
+    )
+
+    grep(
+        pattern="test",
+        files=[str(tmp_path)],
+        recursive=True,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        use_index=True,
+        search_zip=True,
+        color="never",
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == f"{temp_file}:test\n"
+
+
+def test_grep_recursive_use_index_without_index(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    grep(
+        pattern="test",
+        files=[str(tmp_path)],
+        recursive=True,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        use_index=True,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        f"{tmp_path}: index does not exist, build it with: "
+        f"python -m src.main index build {tmp_path}\n"
+    )
+
+
+@pytest.mark.parametrize("number_of_jobs", [1, 2])
+def test_grep_search_zip(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], number_of_jobs: int
+):
+    data = b"not a match\n" * 10000 + b"test\nnot a match\ntest 2\n"
+    temp_file1 = tmp_path / "test_file.gz"
+    temp_file1.write_bytes(gzip.compress(data))
+    temp_file2 = tmp_path / "test_file.xz"
+    temp_file2.write_bytes(lzma.compress(data))
+    temp_file3 = tmp_path / "test_file.txt"
+    temp_file3.write_bytes(data)
+
+    result = grep(
+        pattern="test",
+        files=[str(temp_file1), str(temp_file2), str(temp_file3)],
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        number_of_jobs=number_of_jobs,
+        color="never",
+        search_zip=True,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "{0}:10001:test\n--\n{0}:10003:test 2\n--\n"
+        "{1}:10001:test\n--\n{1}:10003:test 2\n--\n"
+        "{2}:10001:test\n--\n{2}:10003:test 2\n"
+    ).format(temp_file1, temp_file2, temp_file3)
+    assert result
+
+
+def test_grep_compressed_file_without_search_zip(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    temp_file = tmp_path / "test_file.gz"
+    temp_file.write_bytes(gzip.compress(b"test\n"))
+
+    result = grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        color="never",
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == f"{temp_file}: file is binary\n"
+    assert not result
+
+
+@pytest.mark.parametrize("number_of_files", [1, 2, 10])
+def test_read_files_ahead(tmp_path: Path, number_of_files: int):
+    files = [tmp_path / f"test_file{i}.txt" for i in range(5)]
+    for file in files:
+        file.write_text("test")
+    # Files which do not exist are generated too.
+    files.append(tmp_path / "missing.txt")
+
+    assert list(_read_files_ahead(files, number_of_files, 1024)) == files
+
+
+def _collect_agrep_results(*args) -> list[Match | Message]:
+    async def collect() -> list[Match | Message]:
+        return [result async for result in agrep(*args)]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize(
+    "search_function",
+    [
+        pytest.param(lambda *args: list(search(*args)), id="search"),
+        pytest.param(_collect_agrep_results, id="agrep"),
+    ],
+)
+@pytest.mark.parametrize(
+    "options",
+    [
+        pytest.param(SearchOptions(number_of_lines_after_match=1), id="default"),
+        pytest.param(
+            SearchOptions(number_of_lines_after_match=1, number_of_files_read_ahead=0),
+            id="no_read_ahead",
+        ),
+        pytest.param(
+            SearchOptions(number_of_lines_after_match=1, number_of_jobs=2),
+            id="parallel",
+        ),
+    ],
+)
+def test_search(tmp_path: Path, search_function, options: SearchOptions):
+    files = [tmp_path / f"test_file{i}.txt" for i in range(5)]
+    for i, file in enumerate(files):
+        file.write_text(f"not a match\ntëst {i}\nafter\nnot a match")
+    missing_file = tmp_path / "missing.txt"
+
+    results = search_function(
+        "tëst", [str(file) for file in files] + [missing_file], options
+    )
+
+    assert results == [
+        result
+        for i, file in enumerate(files)
+        for result in [
+            Match(file, 2, 12, f"tëst {i}", [Interval(0, 4)]),
+            Match(file, 3, 20, "after", []),
+        ]
+    ] + [Message(missing_file, f"{missing_file}: file does not exist")]
+    assert not results[0].is_context
+    assert results[1].is_context
+
+
+@pytest.mark.parametrize(
+    "search_function",
+    [
+        pytest.param(lambda *args: list(search(*args)), id="search"),
+        pytest.param(_collect_agrep_results, id="agrep"),
+    ],
+)
+def test_search_recursive(tmp_path: Path, search_function):
+    (tmp_path / "test_file.txt").write_text("test\nnot a match")
+    missing_directory = tmp_path / "missing"
+
+    assert search_function("test", [tmp_path], SearchOptions(recursive=True)) == [
+        Match(tmp_path / "test_file.txt", 1, 0, "test", [Interval(0, 4)])
+    ]
+    assert search_function(
+        "test", [missing_directory], SearchOptions(recursive=True)
+    ) == [
+        Message(
+            None,
+            f"{missing_directory}: directory does not exist or is not a directory",
+        )
+    ]
+
+
+def test_search_stdin(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("sys.stdin", StringIO("not a match\ntest\n"))
+
+    assert list(search("test", [])) == [Match(None, 2, None, "test", [Interval(0, 4)])]
+
+
+def test_agrep_stops_early(tmp_path: Path):
+    files = [tmp_path / f"test_file{i}.txt" for i in range(20)]
+    for file in files:
+        file.write_text("test")
+
+    async def get_first_result() -> Match | Message:
+        async for result in agrep("test", files):
+            return result
+
+    assert asyncio.run(get_first_result()).path == files[0]
+
+
+def test_agrep_lists_files_in_thread(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    files = [tmp_path / f"test_file{i}.txt" for i in range(20)]
+    for file in files:
+        file.write_text("test")
+    listing_threads = []
+    closed = threading.Event()
+
+    def generate_files() -> Generator[Path, None, None]:
+        try:
+            yield from files
+        finally:
+            closed.set()
+
+    def get_files_to_search(*args) -> Generator[Path, None, None]:
+        listing_threads.append(threading.get_ident())
+        return generate_files()
+
+    monkeypatch.setattr("src.grep._get_files_to_search", get_files_to_search)
+
+    async def get_first_result() -> Match | Message:
+        async with aclosing(agrep("test", files)) as results:
+            async for result in results:
+                return result
+
+    assert asyncio.run(get_first_result()).path == files[0]
+    # The files are listed without blocking the event loop, and the listing is
+    # stopped with the search.
+    assert listing_threads != [threading.get_ident()]
+    assert closed.wait(timeout=5)
+
+
+def test_grep_json(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    temp_file = tmp_path / "test_file.txt"
+    temp_file.write_text("not a match\ntest\n")
+
+    result = grep(
+        pattern="test",
+        files=[str(temp_file)],
+        recursive=False,
+        print_line_number=False,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        print_json=True,
+    )
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["type"] for record in records] == [
+        "begin",
+        "match",
+        "end",
+        "summary",
+    ]
+    assert records[1]["data"] == {
+        "path": str(temp_file),
+        "line_number": 2,
+        "byte_offset": 12,
+        "text": "test",
+        "submatches": [{"start": 0, "end": 4, "pattern_index": 0}],
+    }
+    assert result
+
+
+@pytest.mark.parametrize("number_of_jobs", [1, 2])
+@pytest.mark.parametrize(
+    "output_mode, expected_output",
+    [
+        pytest.param(
+            "lines",
+            "{0}:1:test\n--\n{0}:3:test\n--\n{1}:1:test\n",
+            id="lines",
+        ),
+        pytest.param("count", "{0}:2\n{1}:1\n", id="count"),
+    ],
+)
+def test_grep_cache_directory(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    number_of_jobs: int,
+    output_mode: str,
+    expected_output: str,
+):
+    files = [tmp_path / "test_file1.txt", tmp_path / "test_file2.txt"]
+    files[0].write_text("test\nnot a match\ntest")
+    files[1].write_text("test\n")
+    # Recently modified files are not cached.
+    for file in files:
+        os.utime(file, (1_000_000_000, 1_000_000_000))
+    expected_output = expected_output.format(*files)
+
+    for expected_number_of_files in [2, 0]:
+        stats = Stats()
+        result = grep(
+            pattern="test",
+            files=[str(file) for file in files],
+            recursive=False,
+            print_line_number=True,
+            number_of_lines_before_match=0,
+            number_of_lines_after_match=0,
+            number_of_jobs=number_of_jobs,
+            color="never",
+            output_mode=output_mode,
+            stats=stats,
+            cache_directory=str(tmp_path / "cache"),
+        )
+
+        # The files are only searched the first time.
+        assert stats.number_of_files == expected_number_of_files
+        assert capsys.readouterr().out == expected_output
+        assert result
+
+    # Files are searched again once they are modified.
+    files[1].write_text("test\ntest\n")
+    os.utime(files[1], (1_000_000_000, 1_000_000_000))
+    stats = Stats()
+    grep(
+        pattern="test",
+        files=[str(file) for file in files],
+        recursive=False,
+        print_line_number=True,
+        number_of_lines_before_match=0,
+        number_of_lines_after_match=0,
+        number_of_jobs=number_of_jobs,
+        color="never",
+        output_mode="count",
+        stats=stats,
+        cache_directory=str(tmp_path / "cache"),
+    )
+
+    assert stats.number_of_files == (1 if output_mode == "count" else 2)
+    assert capsys.readouterr().out == f"{files[0]}:2\n{files[1]}:2\n"
+
+
+def test_directory_listing_cache(tmp_path: Path):
+    (tmp_path / "test_file1.txt").write_text("test\n")
+    (tmp_path / "directory").mkdir()
+    (tmp_path / "directory" / "test_file2.txt").write_text("test\n")
+    cache = DirectoryListingCache()
+
+    files = list(cache.get_files(tmp_path, 1, True))
+    assert sorted(files) == [
+        str(tmp_path / "directory" / "test_file2.txt"),
+        str(tmp_path / "test_file1.txt"),
+    ]
+    # The listing is kept until one of the directories changes.
+    assert cache.get_files(tmp_path, 1, True) == files
+    (tmp_path / "directory" / "test_file2.txt").write_text("changed\n")
+    assert cache.get_files(tmp_path, 1, True) == files
+
+    (tmp_path / "directory" / "test_file3.txt").write_text("test\n")
+    assert len(list(cache.get_files(tmp_path, 1, True))) == 3
+    (tmp_path / ".gitignore").write_text("directory\n")
+    assert len(list(cache.get_files(tmp_path, 1, True))) == 2
+    # Ignore files are the only files whose content changes the listing.
+    (tmp_path / ".gitignore").write_text("test_file1.txt\n")
+    assert len(list(cache.get_files(tmp_path, 1, True))) == 3
+    # Listings are cached separately when ignore files are not used.
+    assert len(list(cache.get_files(tmp_path, 1, False))) == 4
+    cache.close()
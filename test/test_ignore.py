@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from src.ignore import IgnoreRules, load_ignore_rules
+
+
+def create_ignore_rules(
+    directory: Path, file_contents: dict[str, str], parent: IgnoreRules | None = None
+) -> IgnoreRules | None:
+    for file_name, content in file_contents.items():
+        (directory / file_name).write_text(content)
+    return load_ignore_rules(str(directory), os.listdir(directory), parent)
+
+
+@pytest.mark.parametrize(
+    "rules,path,is_directory,expected_result",
+    [
+        pytest.param("*.log", "a.log", False, True, id="glob"),
+        pytest.param("*.log", "sub/dir/a.log", False, True, id="glob_at_any_depth"),
+        pytest.param("*.log", "a.txt", False, False, id="glob_no_match"),
+        pytest.param("/a.log", "sub/a.log", False, False, id="anchored"),
+        pytest.param("sub/*.log", "sub/a.log", False, True, id="relative_path"),
+        pytest.param("sub/*.log", "sub/x/a.log", False, False, id="star_no_slash"),
+        pytest.param("**/x/*.log", "a/b/x/a.log", False, True, id="double_star"),
+        pytest.param("build/", "build", True, True, id="directory_only"),
+        pytest.param("build/", "build", False, False, id="directory_only_file"),
+        pytest.param("file?.[ch]", "file1.c", False, True, id="character_class"),
+        pytest.param("file[!ab]", "filea", False, False, id="negated_class"),
+        pytest.param("*.log\n!keep.log", "keep.log", False, False, id="negation"),
+        pytest.param("!keep.log\n*.log", "keep.log", False, True, id="last_rule_wins"),
+        pytest.param("# *.log\n\nb.log", "a.log", False, False, id="comment"),
+        pytest.param(r"\#a.log", "#a.log", False, True, id="escaped_hash"),
+    ],
+)
+def test_is_ignored(
+    tmp_path: Path, rules: str, path: str, is_directory: bool, expected_result: bool
+):
+    ignore_rules = create_ignore_rules(tmp_path, {".gitignore": rules})
+
+    assert (
+        ignore_rules.is_ignored(os.path.join(tmp_path, path), is_directory)
+        == expected_result
+    )
+
+
+def test_is_ignored_file_precedence(tmp_path: Path):
+    ignore_rules = create_ignore_rules(
+        tmp_path,
+        {".gitignore": "*.log", ".ignore": "!a.log", ".grepignore": "b.log"},
+    )
+
+    assert not ignore_rules.is_ignored(os.path.join(tmp_path, "a.log"), False)
+    assert ignore_rules.is_ignored(os.path.join(tmp_path, "b.log"), False)
+    assert ignore_rules.is_ignored(os.path.join(tmp_path, "c.log"), False)
+
+
+def test_is_ignored_nested_directory_precedence(tmp_path: Path):
+    subdirectory = tmp_path / "sub"
+    subdirectory.mkdir()
+    parent_rules = create_ignore_rules(tmp_path, {".gitignore": "*.log\n!c.log"})
+    ignore_rules = create_ignore_rules(
+        subdirectory, {".gitignore": "!a.log\nc.log"}, parent_rules
+    )
+
+    assert not ignore_rules.is_ignored(os.path.join(subdirectory, "a.log"), False)
+    assert ignore_rules.is_ignored(os.path.join(subdirectory, "b.log"), False)
+    assert ignore_rules.is_ignored(os.path.join(subdirectory, "c.log"), False)
+    assert not parent_rules.is_ignored(os.path.join(tmp_path, "c.log"), False)
+
+
+def test_load_ignore_rules_without_ignore_files(tmp_path: Path):
+    parent_rules = create_ignore_rules(tmp_path, {".gitignore": "*.log"})
+    subdirectory = tmp_path / "sub"
+    subdirectory.mkdir()
+
+    assert create_ignore_rules(subdirectory, {}, parent_rules) is parent_rules
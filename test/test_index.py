@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from src.index import TrigramIndex, get_trigrams
+
+
+def test_get_trigrams():
+    assert get_trigrams(["test", "ab", "żó"]) == {
+        b"tes",
+        b"est",
+        "ż".encode() + "ó".encode()[:1],
+        "ż".encode()[1:] + "ó".encode(),
+    }
+
+
+@pytest.fixture
+def index_directory(tmp_path: Path) -> Path:
+    (tmp_path / "file1.txt").write_text("ERROR: connection timeout\n")
+    (tmp_path / "file2.txt").write_text("INFO: all good\n")
+    (tmp_path / "file3.bin").write_bytes(b"\0ERROR timeout")
+    return tmp_path
+
+
+def get_files(directory: Path) -> list[str]:
+    return sorted(
+        str(path) for path in directory.iterdir() if path.name != ".grepindex"
+    )
+
+
+@pytest.mark.parametrize(
+    "literals,expected_files",
+    [
+        pytest.param(["ERROR", "timeout"], ["file1.txt", "file3.bin"], id="match"),
+        pytest.param(["missing"], ["file3.bin"], id="no_match"),
+        pytest.param(["ab"], ["file1.txt", "file2.txt", "file3.bin"], id="too_short"),
+        pytest.param([], ["file1.txt", "file2.txt", "file3.bin"], id="no_literals"),
+    ],
+)
+def test_filter_candidate_files(
+    index_directory: Path, literals: list[str], expected_files: list[str]
+):
+    index = TrigramIndex(str(index_directory))
+    assert index.update(get_files(index_directory)) == (3, 3, 0)
+
+    candidate_files = index.filter_candidate_files(get_files(index_directory), literals)
+
+    assert [Path(file).name for file in candidate_files] == expected_files
+    index.close()
+
+
+def test_update(index_directory: Path):
+    index = TrigramIndex(str(index_directory))
+    index.update(get_files(index_directory))
+
+    assert index.update(get_files(index_directory)) == (3, 0, 0)
+
+    os.remove(index_directory / "file1.txt")
+    (index_directory / "file2.txt").write_text("ERROR: timeout again\n")
+    (index_directory / "file4.txt").write_text("ERROR: timeout\n")
+
+    assert index.update(get_files(index_directory)) == (3, 2, 1)
+    candidate_files = index.filter_candidate_files(
+        get_files(index_directory), ["timeout"]
+    )
+    assert [Path(file).name for file in candidate_files] == [
+        "file2.txt",
+        "file3.bin",
+        "file4.txt",
+    ]
+    index.close()
+
+
+def test_filter_candidate_files_out_of_date(index_directory: Path):
+    index = TrigramIndex(str(index_directory))
+    index.update(get_files(index_directory))
+
+    file2 = index_directory / "file2.txt"
+    file2.write_text("ERROR: timeout\n")
+    os.utime(file2, ns=(0, 0))
+    (index_directory / "file4.txt").write_text("not indexed yet")
+
+    candidate_files = index.filter_candidate_files(
+        get_files(index_directory), ["timeout"]
+    )
+    assert [Path(file).name for file in candidate_files] == [
+        "file1.txt",
+        "file2.txt",
+        "file3.bin",
+        "file4.txt",
+    ]
+    index.close()
@@ -81,3 +81,12 @@ def test_line_validation_success():
     assert line.text == "test"
     assert line.matching_intervals == [Interval(0, 1)]
     assert line.index == 0
+
+
+def test_line_offset_validation_fail():
+    with pytest.raises(ValueError, match="Offset must be non-negative!"):
+        Line("test", [], 0, -1)
+
+
+def test_line_offset_not_compared():
+    assert Line("test", [], 0, 10) == Line("test", [], 0)
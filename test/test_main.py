@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.grep import READ_AHEAD_FILES
+from src.main import parse_arguments
+
+ROOT_DIRECTORY = Path(__file__).parent.parent
+
+# Modules which are slow to import and not needed to run a simple search.
+SLOW_MODULES = [
+    "asyncio",
+    "colorama",
+    "concurrent.futures",
+    "ctypes",
+    "multiprocessing",
+    "sqlite3",
+]
+
+
+def get_imported_modules(arguments: list[str], socket_path: str) -> set[str]:
+    # -X importtime reports every imported module on standard error.
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.main"] + arguments,
+        cwd=ROOT_DIRECTORY,
+        env=dict(os.environ, GREPD_SOCKET=socket_path),
+        capture_output=True,
+        text=True,
+    )
+    return {
+        line.split("|")[-1].strip()
+        for line in process.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+
+@pytest.mark.parametrize(
+    "arguments, expected_search_modules",
+    [
+        pytest.param(["--help"], False, id="help"),
+        pytest.param(["--no-daemon", "test"], True, id="search"),
+        # The daemon is not running, so the search is run by the process.
+        pytest.param(["test"], True, id="search_without_daemon"),
+    ],
+)
+def test_startup_imports(
+    tmp_path: Path, arguments: list[str], expected_search_modules: bool
+):
+    test_file = tmp_path / "test_file.txt"
+    test_file.write_text("test\n")
+
+    imported_modules = get_imported_modules(
+        arguments + [str(test_file)], str(tmp_path / "grepd.sock")
+    )
+
+    assert ("src.grep" in imported_modules) == expected_search_modules
+    assert ("src.matcher" in imported_modules) == expected_search_modules
+    assert sorted(imported_modules.intersection(SLOW_MODULES)) == []
+
+
+def test_help_shows_read_ahead_default():
+    process = subprocess.run(
+        [sys.executable, "-m", "src.main", "--help"],
+        cwd=ROOT_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert f"(default: {READ_AHEAD_FILES}," in process.stdout
+
+
+@pytest.mark.parametrize(
+    "arguments, expected_error",
+    [
+        pytest.param(
+            ["--json", "-c", "test"], "--json cannot be used with", id="json_count"
+        ),
+        pytest.param(
+            ["--follow", "-c", "test", "file"],
+            "--follow cannot be used with",
+            id="follow_count",
+        ),
+        pytest.param(
+            ["--follow", "-l", "test", "file"],
+            "--follow cannot be used with",
+            id="follow_files_with_matches",
+        ),
+        pytest.param(
+            ["--follow", "-L", "test", "file"],
+            "--follow cannot be used with",
+            id="follow_files_without_match",
+        ),
+    ],
+)
+def test_parse_arguments_rejects_combinations(
+    capsys: pytest.CaptureFixture[str], arguments: list[str], expected_error: str
+):
+    with pytest.raises(SystemExit) as exit_info:
+        parse_arguments(arguments)
+
+    assert exit_info.value.code == 2
+    assert expected_error in capsys.readouterr().err
+
+
+def test_parse_arguments_follow_quiet():
+    # Quiet mode stops at the first match, so it can follow a file.
+    assert parse_arguments(["--follow", "-q", "test", "file"]).follow
@@ -0,0 +1,327 @@
+import pytest
+
+from src.line import Interval
+from src.matcher import (
+    AnchoredMatcher,
+    CombinedMatcher,
+    LiteralSetMatcher,
+    RegexSetMatcher,
+    LiteralMatcher,
+    LiteralPrefilter,
+    RegexMatcher,
+    create_matcher,
+    highlight_intervals,
+)
+
+
+@pytest.mark.parametrize(
+    "pattern,expected_type",
+    [
+        pytest.param("test", LiteralMatcher, id="literal"),
+        pytest.param(r"a\.b", LiteralMatcher, id="escaped_literal"),
+        pytest.param("(?i)test", RegexMatcher, id="ignore_case_literal"),
+        pytest.param("^test", AnchoredMatcher, id="anchored"),
+        pytest.param(r"\Atest", AnchoredMatcher, id="anchored_string_start"),
+        pytest.param("te.t", RegexMatcher, id="regex"),
+        pytest.param("^a|b", RegexMatcher, id="anchored_alternative"),
+        pytest.param("", RegexMatcher, id="empty"),
+        pytest.param(["test"], LiteralMatcher, id="single_pattern"),
+        pytest.param(["foo", "bar"], LiteralSetMatcher, id="literal_set"),
+        pytest.param(["foo", r"ba\w"], RegexSetMatcher, id="regex_set"),
+        pytest.param([r"(a)\1", "b"], CombinedMatcher, id="backreference_set"),
+        pytest.param(["(?i)a", "b"], CombinedMatcher, id="global_flags_set"),
+        pytest.param([], RegexMatcher, id="empty_set"),
+    ],
+)
+def test_create_matcher_strategy(pattern: str | list[str], expected_type: type):
+    assert isinstance(create_matcher(pattern), expected_type)
+
+
+def test_anchored_matches_without_intervals(monkeypatch: pytest.MonkeyPatch):
+    matcher = create_matcher("^te")
+
+    def fail(line: str) -> list[Interval]:
+        raise AssertionError("Intervals were found to check for a match")
+
+    monkeypatch.setattr(matcher, "find_intervals", fail)
+
+    assert matcher.matches("test")
+    assert not matcher.matches("ate")
+
+
+def test_create_matcher_is_cached():
+    assert create_matcher("te.t") is create_matcher("te.t")
+    assert create_matcher(["foo", "bar"]) is create_matcher(("foo", "bar"))
+    assert create_matcher(["foo", "bar"]) is not create_matcher(["bar", "foo"])
+
+
+@pytest.mark.parametrize(
+    "pattern,line,expected_intervals",
+    [
+        pytest.param(
+            "test", "test and test", [Interval(0, 4), Interval(9, 13)], id="literal"
+        ),
+        pytest.param(
+            "aa", "aaaa", [Interval(0, 2), Interval(2, 4)], id="literal_non_overlapping"
+        ),
+        pytest.param(r"a\.b", "a.b axb", [Interval(0, 3)], id="escaped_literal"),
+        pytest.param("^te", "test te", [Interval(0, 2)], id="anchored"),
+        pytest.param("^te", "ate", [], id="anchored_no_match"),
+        pytest.param("^x*", "xab", [Interval(0, 1)], id="anchored_repeat"),
+        pytest.param("^x*", "ab", [], id="anchored_empty_match"),
+        pytest.param(r"t\w", "test", [Interval(0, 2)], id="regex"),
+        pytest.param(
+            r"\d+",
+            "a1b22c333",
+            [Interval(1, 2), Interval(3, 5), Interval(6, 9)],
+            id="regex_multiple",
+        ),
+        pytest.param("x*", "axxb", [Interval(1, 3)], id="empty_matches_skipped"),
+        pytest.param("", "test", [], id="empty_pattern"),
+        pytest.param(
+            "(x|" + "a" * 2000 + "|" + "b" * 2000 + ")",
+            "x" + "b" * 2000,
+            [Interval(0, 1), Interval(1, 2001)],
+            id="long_alternatives",
+        ),
+    ],
+)
+def test_find_intervals(pattern: str, line: str, expected_intervals: list[Interval]):
+    matcher = create_matcher(pattern)
+
+    assert matcher.find_intervals(line) == expected_intervals
+    if not matcher.can_match_empty:
+        assert matcher.matches(line) == (len(expected_intervals) > 0)
+
+
+@pytest.mark.parametrize(
+    "pattern,expected_result",
+    [
+        pytest.param("test", True, id="literal"),
+        pytest.param("^te.t$", True, id="line_anchors"),
+        pytest.param(r"^\w", True, id="line_start_anchor"),
+        # $ does not match before the "\r" of a "\r\n" in a buffer.
+        pytest.param(r"\w$", False, id="line_end_anchor"),
+        pytest.param(r"\A\w", False, id="string_start_anchor"),
+        pytest.param(r"\w\Z", False, id="string_end_anchor"),
+        pytest.param(r"\w(?! )", False, id="negative_lookahead"),
+        pytest.param(r"(?<!a)\w", False, id="negative_lookbehind"),
+        pytest.param(r"\Atest", True, id="string_start_anchor_with_prefilter"),
+        pytest.param("(?<!a)test", True, id="negative_lookbehind_with_prefilter"),
+    ],
+)
+def test_supports_buffer_search(pattern: str, expected_result: bool):
+    assert create_matcher(pattern).supports_buffer_search == expected_result
+
+
+@pytest.mark.parametrize(
+    "pattern,buffer,start,expected_result",
+    [
+        pytest.param("test", "a\nb test", 0, 4, id="literal"),
+        pytest.param("test", "a\nb test", 5, -1, id="literal_after_start"),
+        pytest.param("^b", "a\nb test", 0, 2, id="line_start_anchor"),
+        pytest.param("a$", "a\nb test", 0, 0, id="line_end_anchor"),
+        pytest.param("x", "a\nb test", 0, -1, id="no_match"),
+        pytest.param("(?<!a)te", "a\nb test", 0, 4, id="prefilter"),
+        pytest.param("foo|te", "a\nb test", 0, 4, id="prefilter_alternation"),
+    ],
+)
+def test_search_buffer(pattern: str, buffer: str, start: int, expected_result: int):
+    assert create_matcher(pattern).search_buffer(buffer, start) == expected_result
+
+
+@pytest.mark.parametrize(
+    "pattern,expected_literals",
+    [
+        pytest.param("test", ["test"], id="literal"),
+        pytest.param(r"a\.b", ["a.b"], id="escaped_literal"),
+        pytest.param("ERROR.*timeout", ["ERROR", "timeout"], id="multiple_literals"),
+        pytest.param(r"user_id=\d+", ["user_id="], id="literal_prefix"),
+        pytest.param("(foo)+bar?", ["foo", "ba"], id="groups_and_repeats"),
+        pytest.param("x(?:ab)*y", ["x", "y"], id="optional_repeat"),
+        pytest.param("a|b", [], id="alternation"),
+        pytest.param("(?i)abc", [], id="ignore_case"),
+        pytest.param("(?i:ab)cd", ["cd"], id="scoped_ignore_case"),
+    ],
+)
+def test_required_literals(pattern: str, expected_literals: list[str]):
+    assert create_matcher(pattern).required_literals == expected_literals
+
+
+@pytest.mark.parametrize(
+    "pattern,expected_literals",
+    [
+        pytest.param("ERROR.*timeout", ["timeout"], id="longest_literal"),
+        pytest.param(r"user_id=\d+", ["user_id="], id="literal_prefix"),
+        pytest.param("foo|barbaz", ["foo", "barbaz"], id="alternation"),
+        pytest.param(r"(foo|bar)\d", ["foo", "bar"], id="alternation_in_group"),
+        pytest.param(r"(foo|\d)x", ["x"], id="alternation_without_literal"),
+        pytest.param(r"\d+", None, id="no_literals"),
+        pytest.param("(?i)error", None, id="ignore_case"),
+    ],
+)
+def test_prefilter_literals(pattern: str, expected_literals: list[str] | None):
+    prefilter = create_matcher(pattern)._prefilter
+
+    if expected_literals is None:
+        assert prefilter is None
+    else:
+        assert prefilter.literals == expected_literals
+
+
+@pytest.mark.parametrize(
+    "literals,line,expected_position",
+    [
+        pytest.param(["ab"], "xxab", 2, id="single_literal"),
+        pytest.param(["ab", "abc", "b"], "xxabc", 2, id="shared_prefix"),
+        pytest.param(["a.b", "c"], "axb c", 4, id="escaped_characters"),
+        pytest.param(["é", "x"], "aéx", 1, id="non_ascii"),
+        pytest.param(["ab", "cd"], "xyz", -1, id="no_match"),
+        # Deeper than the recursion limit.
+        pytest.param(["a" * 2000, "b" * 2000], "x" + "b" * 2000, 1, id="long"),
+        pytest.param(
+            ["a" * length for length in range(1, 200)],
+            "xaa",
+            1,
+            id="nested_prefixes",
+        ),
+    ],
+)
+def test_literal_prefilter(literals: list[str], line: str, expected_position: int):
+    prefilter = LiteralPrefilter(literals)
+
+    assert prefilter.matches(line) == (expected_position != -1)
+    assert prefilter.search_buffer(line, 0) == expected_position
+    expected_byte_position = (
+        -1 if expected_position == -1 else len(line[:expected_position].encode())
+    )
+    assert prefilter.search_bytes(line.encode(), 0) == expected_byte_position
+
+
+@pytest.mark.parametrize(
+    "patterns,line,expected_intervals",
+    [
+        pytest.param(
+            ["foo", "foobar", "bar"],
+            "foobar bar",
+            [Interval(0, 6, 1), Interval(7, 10, 2)],
+            id="literals_longest_wins",
+        ),
+        pytest.param(
+            ["a.b", "ab"],
+            "a.b ab",
+            [Interval(0, 3, 0), Interval(4, 6, 1)],
+            id="escaped_literals",
+        ),
+        # Deeper than the recursion limit.
+        pytest.param(
+            ["a" * 2000, "b" * 2000],
+            "b" * 2000 + "a" * 2000,
+            [Interval(0, 2000, 1), Interval(2000, 4000, 0)],
+            id="long_literals",
+        ),
+        pytest.param(
+            ["a" * length for length in range(1, 200)] + ["b"],
+            "aaab",
+            [Interval(0, 3, 2), Interval(3, 4, 199)],
+            id="nested_prefix_literals",
+        ),
+        pytest.param(["x", "x"], "x", [Interval(0, 1, 0)], id="duplicate_literals"),
+        pytest.param(
+            [r"\d+", "[a-z]+"],
+            "ab12",
+            [Interval(0, 2, 1), Interval(2, 4, 0)],
+            id="regexes",
+        ),
+        pytest.param(
+            [r"(?P<x>a)b", "c"],
+            "abc",
+            [Interval(0, 2, 0), Interval(2, 3, 1)],
+            id="named_group",
+        ),
+        pytest.param(
+            [r"(a)\1", "aab"],
+            "aab",
+            [Interval(0, 3, 1)],
+            id="separate_regexes_longest_wins",
+        ),
+        pytest.param(["", "a"], "bab", [Interval(1, 2, 1)], id="empty_pattern"),
+        pytest.param([], "test", [], id="no_patterns"),
+    ],
+)
+def test_find_intervals_of_pattern_set(
+    patterns: list[str], line: str, expected_intervals: list[Interval]
+):
+    matcher = create_matcher(patterns)
+
+    assert matcher.find_intervals(line) == expected_intervals
+    if not matcher.can_match_empty:
+        assert matcher.matches(line) == (len(expected_intervals) > 0)
+
+
+@pytest.mark.parametrize(
+    "patterns,line,expected_result",
+    [
+        pytest.param("", "test", True, id="empty_pattern"),
+        pytest.param("^$", "", True, id="empty_line"),
+        pytest.param("^$", "a", False, id="empty_line_no_match"),
+        pytest.param("x*", "ab", True, id="repeat"),
+        pytest.param("^x*", "ab", True, id="anchored_repeat"),
+        pytest.param(["", "b"], "c", True, id="literal_set"),
+        pytest.param([r"(a)\1", "^$"], "", True, id="regex_set"),
+        pytest.param([r"(a)\1", "^$"], "b", False, id="regex_set_no_match"),
+    ],
+)
+def test_matches_empty_match(
+    patterns: str | list[str], line: str, expected_result: bool
+):
+    # A line can match with an empty match only, which is not a matching interval.
+    matcher = create_matcher(patterns)
+
+    assert matcher.can_match_empty
+    assert matcher.find_intervals(line) == []
+    assert matcher.matches(line) == expected_result
+
+
+@pytest.mark.parametrize(
+    "pattern,line,expected_result",
+    [
+        pytest.param("ab", "xabab", "x[0ab][0ab]", id="literal"),
+        pytest.param(r"\d", "a1b22", "a[01]b[02][02]", id="regex"),
+        pytest.param("^a", "aa", "[0a]a", id="anchored"),
+        pytest.param("a*", "baab", "b[0aa]b", id="empty_matches"),
+        pytest.param(["a", "bc"], "abcd", "[0a][1bc]d", id="literals"),
+        pytest.param([r"\d", "^a"], "a1", "[1a][01]", id="regexes"),
+        pytest.param([r"(x)\1", "y"], "xxy", "[0xx][1y]", id="separate_regexes"),
+        pytest.param(["a"] * 3 + ["b"], "ab", "[0a][0b]", id="reused_colors"),
+        pytest.param("test", "no match", "no match", id="no_match"),
+    ],
+)
+def test_highlight(pattern: str | list[str], line: str, expected_result: str):
+    matcher = create_matcher(pattern)
+    colors = ("[0", "[1", "[2")
+
+    assert matcher.highlight(line, colors, "]") == expected_result
+    assert (
+        highlight_intervals(line, matcher.find_intervals(line), colors, "]")
+        == expected_result
+    )
+
+
+@pytest.mark.parametrize(
+    "patterns,buffer,expected_result",
+    [
+        pytest.param(["foo", "te"], "a\nb test", 4, id="literals"),
+        pytest.param([r"t\w", "^b"], "a\nb test", 2, id="regexes"),
+        pytest.param([r"(x)\1", "es"], "a\nb test", 5, id="separate_regexes"),
+        pytest.param(["foo", "x"], "a\nb test", -1, id="no_match"),
+    ],
+)
+def test_search_buffer_of_pattern_set(
+    patterns: list[str], buffer: str, expected_result: int
+):
+    matcher = create_matcher(patterns)
+
+    assert matcher.search_buffer(buffer, 0) == expected_result
+    if matcher.supports_bytes_search:
+        assert matcher.search_bytes(buffer.encode(), 0) == expected_result
@@ -1,9 +1,11 @@
+import json
 from pathlib import Path
 
 import pytest
 
 from src.line import Interval, Line
-from src.printer import Printer
+from src.matcher import create_matcher
+from src.printer import JsonPrinter, Printer
 
 
 @pytest.mark.parametrize(
@@ -50,6 +52,12 @@ from src.printer import Printer
             f"{Printer.MATCHED_TEXT_COLOR}test{Printer.DEFAULT_COLOR}\n",
             id="matches_in_non_consecutive_lines",
         ),
+        pytest.param(
+            [Line("ab", [Interval(0, 1, 0), Interval(1, 2, 1)], 0)],
+            f"{Printer.PATTERN_COLORS[0]}a{Printer.DEFAULT_COLOR}"
+            f"{Printer.PATTERN_COLORS[1]}b{Printer.DEFAULT_COLOR}\n",
+            id="matches_of_multiple_patterns",
+        ),
     ],
 )
 def test_print_line(
@@ -61,6 +69,7 @@ def test_print_line(
 
     for line in lines:
         printer.print_line(line)
+    printer.flush()
 
     captured = capsys.readouterr()
     assert captured.out == expected_output
@@ -71,6 +80,7 @@ def test_print_line_with_line_number(capsys: pytest.CaptureFixture[str]):
     line = Line("test", [Interval(0, 4)], 0)
 
     printer.print_line(line)
+    printer.flush()
 
     captured = capsys.readouterr()
     assert captured.out == (
@@ -79,12 +89,30 @@ def test_print_line_with_line_number(capsys: pytest.CaptureFixture[str]):
     )
 
 
+def test_print_line_highlighted_by_matcher(capsys: pytest.CaptureFixture[str]):
+    printer = Printer(print_line_number=False, matcher=create_matcher(r"\d"))
+    # The interval of the matching line only tells that it matches.
+    lines = [Line("a1b2", [Interval(0, 4)], 0), Line("c3", [], 1)]
+
+    for line in lines:
+        printer.print_line(line)
+    printer.flush()
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        f"a{Printer.MATCHED_TEXT_COLOR}1{Printer.DEFAULT_COLOR}"
+        f"b{Printer.MATCHED_TEXT_COLOR}2{Printer.DEFAULT_COLOR}\n"
+        "c3\n"
+    )
+
+
 def test_print_line_with_filename(capsys: pytest.CaptureFixture[str]):
     printer = Printer(print_line_number=False)
     printer.set_file(Path("test"))
     line = Line("test", [Interval(0, 4)], 0)
 
     printer.print_line(line)
+    printer.flush()
 
     captured = capsys.readouterr()
     assert captured.out == (
@@ -102,6 +130,7 @@ def test_print_line_with_filename_multiple_files(capsys: pytest.CaptureFixture[s
     printer.print_line(line1)
     printer.set_file(Path("test2"))
     printer.print_line(line2)
+    printer.flush()
 
     captured = capsys.readouterr()
     assert captured.out == (
@@ -119,6 +148,7 @@ def test_print_line_with_filename_and_line_number(capsys: pytest.CaptureFixture[
     line = Line("test", [Interval(0, 4)], 0)
 
     printer.print_line(line)
+    printer.flush()
 
     captured = capsys.readouterr()
     assert captured.out == (
@@ -134,9 +164,140 @@ def test_print_message(capsys: pytest.CaptureFixture[str]):
 
     printer.print_message(message)
     printer.print_message(message)
+    printer.flush()
 
     captured = capsys.readouterr()
     assert (
         captured.out
         == f"{message}\n{Printer.SEPARATOR_COLOR}--{Printer.DEFAULT_COLOR}\n{message}\n"
     )
+
+
+def test_print_line_buffered_output(capsys: pytest.CaptureFixture[str]):
+    printer = Printer(print_line_number=False, line_buffered=False)
+    printer.OUTPUT_FLUSH_INTERVAL = float("inf")
+
+    printer.print_line(Line("test", [], 0))
+
+    assert capsys.readouterr().out == ""
+    printer.flush()
+    assert capsys.readouterr().out == "test\n"
+
+
+def test_print_line_buffer_size_exceeded(capsys: pytest.CaptureFixture[str]):
+    printer = Printer(print_line_number=False, line_buffered=False)
+    printer.OUTPUT_BUFFER_SIZE = 10
+    printer.OUTPUT_FLUSH_INTERVAL = float("inf")
+
+    printer.print_line(Line("test", [], 0))
+    assert capsys.readouterr().out == ""
+    printer.print_line(Line("test", [], 1))
+    assert capsys.readouterr().out == "test\ntest\n"
+
+
+def test_print_line_line_buffered(capsys: pytest.CaptureFixture[str]):
+    printer = Printer(print_line_number=False, line_buffered=True)
+
+    printer.print_line(Line("test", [], 0))
+
+    assert capsys.readouterr().out == "test\n"
+
+
+def test_print_without_color(capsys: pytest.CaptureFixture[str]):
+    printer = Printer(print_line_number=True, color=False)
+
+    printer.set_file(Path("test"))
+    printer.print_line(Line("a test", [Interval(2, 6)], 0))
+    printer.print_line(Line("test", [Interval(0, 4)], 2))
+    printer.print_message("message")
+    printer.flush()
+
+    captured = capsys.readouterr()
+    assert captured.out == "test:1:a test\n--\ntest:3:test\n--\nmessage\n"
+
+
+def test_print_count(capsys: pytest.CaptureFixture[str]):
+    printer = Printer(print_line_number=False)
+
+    printer.print_count(1)
+    printer.set_file(Path("test"))
+    printer.print_count(2)
+    printer.flush()
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "1\n"
+        f"{Printer.FILENAME_COLOR}test{Printer.SEPARATOR_COLOR}:{Printer.DEFAULT_COLOR}2\n"
+    )
+
+
+def test_print_file_name(capsys: pytest.CaptureFixture[str]):
+    printer = Printer(print_line_number=False)
+
+    printer.set_file(Path("test"))
+    printer.print_file_name()
+    printer.flush()
+
+    captured = capsys.readouterr()
+    assert captured.out == f"{Printer.FILENAME_COLOR}test{Printer.DEFAULT_COLOR}\n"
+
+
+def test_json_printer(capsys: pytest.CaptureFixture[str]):
+    printer = JsonPrinter()
+
+    printer.set_file(Path("first"))
+    printer.print_line(Line('a "tëst"', [Interval(3, 7, 1)], 0, 0))
+    printer.print_line(Line("context", [], 1))
+    printer.set_file(Path("second"))
+    printer.print_message("second: file is binary")
+    printer.set_file(Path("third\udcff"))
+    printer.print_line(Line("test test", [Interval(0, 4), Interval(5, 9)], 2, 30))
+    printer.print_summary()
+    printer.flush()
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records[-1]["type"] == "summary"
+    assert records[-1]["data"].pop("elapsed_seconds") >= 0
+    assert records == [
+        {"type": "begin", "data": {"path": "first"}},
+        {
+            "type": "match",
+            "data": {
+                "path": "first",
+                "line_number": 1,
+                "byte_offset": 0,
+                "text": 'a "tëst"',
+                "submatches": [{"start": 3, "end": 7, "pattern_index": 1}],
+            },
+        },
+        {
+            "type": "context",
+            "data": {
+                "path": "first",
+                "line_number": 2,
+                "byte_offset": None,
+                "text": "context",
+            },
+        },
+        {"type": "end", "data": {"path": "first", "matched_lines": 1}},
+        {"type": "message", "data": {"text": "second: file is binary"}},
+        {"type": "begin", "data": {"path": "third\udcff"}},
+        {
+            "type": "match",
+            "data": {
+                "path": "third\udcff",
+                "line_number": 3,
+                "byte_offset": 30,
+                "text": "test test",
+                "submatches": [
+                    {"start": 0, "end": 4, "pattern_index": 0},
+                    {"start": 5, "end": 9, "pattern_index": 0},
+                ],
+            },
+        },
+        {"type": "end", "data": {"path": "third\udcff", "matched_lines": 1}},
+        {
+            "type": "summary",
+            "data": {"matched_lines": 2, "files_with_matches": 2},
+        },
+    ]
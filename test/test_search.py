@@ -3,7 +3,13 @@ from typing import Iterable
 import pytest
 
 from src.line import Interval, Line
-from src.search import find_matching_lines
+from src.matcher import create_matcher
+from src.search import (
+    count_matching_lines,
+    count_matching_lines_in_blocks,
+    find_matching_lines,
+    find_matching_lines_in_blocks,
+)
 
 
 def compare_iterator_with_expected_output(
@@ -43,6 +49,17 @@ def compare_iterator_with_expected_output(
             ],
             id="multiple_matches",
         ),
+        pytest.param(
+            "^$",
+            ["test", "", "not a match"],
+            0,
+            1,
+            [
+                Line("", [], 1, has_only_empty_matches=True),
+                Line("not a match", [], 2),
+            ],
+            id="empty_match",
+        ),
         pytest.param(
             "test",
             ["test", "not a match", "test test", "test and !test! and some more test"],
@@ -213,7 +230,7 @@ def test_find_matching_lines(
     expected_result: list[Line],
 ):
     generator = find_matching_lines(
-        regex=regex,
+        matcher=create_matcher(regex),
         lines=lines,
         number_of_lines_before_match=number_of_lines_before_match,
         number_of_lines_after_match=number_of_lines_after_match,
@@ -223,3 +240,220 @@ def test_find_matching_lines(
         generator,
         expected_result,
     )
+
+
+@pytest.mark.parametrize(
+    "regex",
+    ["test", "^test", r"match \d$", r"t\w+", "test|^not", r"3\nnot", "^x*", "x*"],
+)
+@pytest.mark.parametrize(
+    "number_of_lines_before_match,number_of_lines_after_match",
+    [(0, 0), (1, 0), (0, 2), (2, 1), (3, 3)],
+)
+@pytest.mark.parametrize("lines_per_block", [1, 2, 3, 100])
+def test_find_matching_lines_in_blocks(
+    regex: str,
+    number_of_lines_before_match: int,
+    number_of_lines_after_match: int,
+    lines_per_block: int,
+):
+    lines = [
+        "not a match 1\n",
+        "test\n",
+        "not a match 2\n",
+        "not a match 3\n",
+        "test2 test3\n",
+        "not a match 4\n",
+        "not a match 5\n",
+        "\n",
+        "not a match 6\n",
+        "not a match 7\n",
+        "test",
+    ]
+    blocks = [
+        "".join(lines[i : i + lines_per_block])
+        for i in range(0, len(lines), lines_per_block)
+    ]
+    matcher = create_matcher(regex)
+
+    expected_result = list(
+        find_matching_lines(
+            matcher=matcher,
+            lines=lines,
+            number_of_lines_before_match=number_of_lines_before_match,
+            number_of_lines_after_match=number_of_lines_after_match,
+        )
+    )
+    generator = find_matching_lines_in_blocks(
+        matcher=matcher,
+        blocks=blocks,
+        number_of_lines_before_match=number_of_lines_before_match,
+        number_of_lines_after_match=number_of_lines_after_match,
+    )
+
+    compare_iterator_with_expected_output(generator, expected_result)
+
+
+@pytest.mark.parametrize(
+    "number_of_lines_before_match,number_of_lines_after_match,max_count",
+    [(0, 0, None), (2, 3, None), (1, 2, 1)],
+)
+@pytest.mark.parametrize("lines_per_block", [1, 2, 100])
+def test_find_matching_lines_in_blocks_byte_offsets(
+    number_of_lines_before_match: int,
+    number_of_lines_after_match: int,
+    max_count: int | None,
+    lines_per_block: int,
+):
+    lines = [
+        "not a match 1\n".encode(),
+        "tëst\n".encode(),
+        "not a match 2\r\n".encode(),
+        "tëst 2\n".encode(),
+        "not a match 3\n".encode(),
+        "not a match 4\n".encode(),
+    ]
+    blocks = [
+        b"".join(lines[i : i + lines_per_block])
+        for i in range(0, len(lines), lines_per_block)
+    ]
+    line_offsets = [sum(len(line) for line in lines[:i]) for i in range(len(lines))]
+
+    result = list(
+        find_matching_lines_in_blocks(
+            matcher=create_matcher("tëst"),
+            blocks=blocks,
+            number_of_lines_before_match=number_of_lines_before_match,
+            number_of_lines_after_match=number_of_lines_after_match,
+            max_count=max_count,
+        )
+    )
+
+    assert len(result) > 0
+    assert [line.offset for line in result] == [
+        line_offsets[line.index] for line in result
+    ]
+
+
+MAX_COUNT_LINES = [
+    "test 1\n",
+    "not a match 1\n",
+    "test 2\n",
+    "test 3\n",
+    "not a match 2",
+]
+
+
+@pytest.mark.parametrize(
+    "max_count,number_of_lines_after_match,expected_result",
+    [
+        pytest.param(0, 0, [], id="zero"),
+        pytest.param(1, 0, [Line("test 1", [Interval(0, 4)], 0)], id="one"),
+        pytest.param(
+            2,
+            2,
+            [
+                Line("test 1", [Interval(0, 4)], 0),
+                Line("not a match 1", [], 1),
+                Line("test 2", [Interval(0, 4)], 2),
+                Line("test 3", [], 3),
+                Line("not a match 2", [], 4),
+            ],
+            id="lines_after_last_match_are_context",
+        ),
+        pytest.param(
+            10,
+            0,
+            [
+                Line("test 1", [Interval(0, 4)], 0),
+                Line("test 2", [Interval(0, 4)], 2),
+                Line("test 3", [Interval(0, 4)], 3),
+            ],
+            id="not_reached",
+        ),
+    ],
+)
+@pytest.mark.parametrize("lines_per_block", [None, 1, 2, 100])
+def test_find_matching_lines_max_count(
+    max_count: int,
+    number_of_lines_after_match: int,
+    expected_result: list[Line],
+    lines_per_block: int | None,
+):
+    matcher = create_matcher("test")
+    if lines_per_block is None:
+        generator = find_matching_lines(
+            matcher, MAX_COUNT_LINES, 0, number_of_lines_after_match, max_count
+        )
+    else:
+        blocks = [
+            "".join(MAX_COUNT_LINES[i : i + lines_per_block])
+            for i in range(0, len(MAX_COUNT_LINES), lines_per_block)
+        ]
+        generator = find_matching_lines_in_blocks(
+            matcher, blocks, 0, number_of_lines_after_match, max_count=max_count
+        )
+
+    compare_iterator_with_expected_output(generator, expected_result)
+
+
+@pytest.mark.parametrize("lines_per_block", [None, 1, 100])
+def test_find_matching_lines_without_intervals(lines_per_block: int | None):
+    lines = ["a1b2c3\n", "no digit\n", "4\n"]
+    matcher = create_matcher(r"\d")
+    if lines_per_block is None:
+        generator = find_matching_lines(matcher, lines, 1, 0, find_intervals=False)
+    else:
+        blocks = [
+            "".join(lines[i : i + lines_per_block])
+            for i in range(0, len(lines), lines_per_block)
+        ]
+        generator = find_matching_lines_in_blocks(
+            matcher, blocks, 1, 0, find_intervals=False
+        )
+
+    # Matching lines get a single interval spanning the whole line.
+    compare_iterator_with_expected_output(
+        generator,
+        [
+            Line("a1b2c3", [Interval(0, 6)], 0),
+            Line("no digit", [], 1),
+            Line("4", [Interval(0, 1)], 2),
+        ],
+    )
+
+
+def test_find_matching_lines_max_count_stops_reading():
+    def generate_lines():
+        yield "test\n"
+        raise AssertionError("Lines after the last match were read")
+
+    generator = find_matching_lines(create_matcher("test"), generate_lines(), 0, 0, 1)
+
+    assert list(generator) == [Line("test", [Interval(0, 4)], 0)]
+
+
+@pytest.mark.parametrize(
+    "regex,max_count,expected_count",
+    [
+        pytest.param("test", None, 3, id="all"),
+        pytest.param("test", 2, 2, id="max_count"),
+        pytest.param("test", 0, 0, id="zero_max_count"),
+        pytest.param(r"\d$", None, 5, id="regex"),
+        pytest.param("missing", None, 0, id="no_match"),
+        pytest.param("x*", None, 5, id="empty_match"),
+    ],
+)
+def test_count_matching_lines(regex: str, max_count: int | None, expected_count: int):
+    matcher = create_matcher(regex)
+    blocks = ["".join(MAX_COUNT_LINES[:2]), "".join(MAX_COUNT_LINES[2:])]
+
+    assert count_matching_lines(matcher, MAX_COUNT_LINES, max_count) == expected_count
+    if matcher.supports_buffer_search:
+        assert count_matching_lines_in_blocks(matcher, blocks, max_count=max_count) == (
+            expected_count
+        )
+    if matcher.supports_bytes_search:
+        assert count_matching_lines_in_blocks(
+            matcher, [block.encode() for block in blocks], max_count=max_count
+        ) == (expected_count)
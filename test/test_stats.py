@@ -0,0 +1,66 @@
+import io
+
+import pytest
+
+from src.stats import STAGES, Stats
+
+
+def test_time_iterator_attributes_time_to_innermost_stage(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    clock = iter(range(100))
+    monkeypatch.setattr("time.perf_counter", lambda: next(clock))
+    monkeypatch.setattr("time.process_time", lambda: 0)
+    stats = Stats()
+
+    items = stats.time_iterator("reader", [1, 2])
+    assert list(stats.time_iterator("matcher", items)) == [1, 2]
+
+    # Each of the 3 calls of the matcher (the last one ends the iteration) runs
+    # the reader in between, and every clock reading is one second later.
+    assert stats.wall_times["matcher"] == 6
+    assert stats.wall_times["reader"] == 3
+    assert stats.wall_times["walker"] == stats.wall_times["printer"] == 0
+
+
+def test_time_iterator_stops_stage_on_exception():
+    def generate_items():
+        yield 1
+        raise ValueError
+
+    stats = Stats()
+    stats.start("printer")
+
+    with pytest.raises(ValueError):
+        list(stats.time_iterator("reader", generate_items()))
+    stats.stop()
+
+    assert stats._running_stages == []
+
+
+def test_merge():
+    stats = Stats()
+    other_stats = Stats()
+    other_stats.number_of_files = 2
+    other_stats.number_of_matching_lines = 3
+    other_stats.wall_times["matcher"] = 1.5
+
+    stats.merge(other_stats)
+    stats.merge(other_stats)
+
+    assert stats.number_of_files == 4
+    assert stats.number_of_matching_lines == 6
+    assert stats.wall_times["matcher"] == 3.0
+
+
+def test_print_report():
+    stats = Stats()
+    stats.number_of_files = 1
+    output = io.StringIO()
+
+    stats.print_report(output)
+
+    report = output.getvalue()
+    assert "files searched: 1\n" in report
+    for stage in STAGES:
+        assert f"\n{stage} " in report